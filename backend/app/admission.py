@@ -0,0 +1,308 @@
+# app/admission.py
+"""
+Admission control for /upload.
+
+Every upload used to start processing the moment it arrived, so a fax burst
+put all of them into OCR at once, competing for CPU and memory until the
+container ran out of memory or requests hit the client's 120 s timeout.
+The controller sits in front of upload_file (an HTTP middleware, so a
+rejected upload's body is never read):
+
+- at most UPLOAD_CONCURRENCY uploads per worker are processed at once;
+- further uploads wait in a queue of at most ADMISSION_QUEUE_SIZE;
+- an upload arriving at a full queue is answered 429 immediately, one that
+  waited ADMISSION_QUEUE_TIMEOUT seconds without a slot 503; both carry a
+  Retry-After estimated from recent processing times and the queue ahead.
+
+Within admitted uploads, stages can be limited further (stage_slot, with
+ADMISSION_STAGE_LIMITS such as "ocr=2,llm=4"): an upload waits for a slot
+before it starts that stage, so the memory-heavy OCR stage does not run for
+every admitted document at once while cheaper stages keep going.
+
+Both queues are priority-aware (app/priority.py): waiting uploads are kept
+per class and the next one is picked by weighted fair share
+(PRIORITY_WEIGHTS, e.g. urgent=8, interactive=4, bulk=1), so under
+contention urgent work gets most of the OCR and LLM capacity while bulk
+still progresses. A waiter older than PRIORITY_MAX_WAIT goes next whatever
+its class (starvation protection), and when the admission queue is full an
+arriving upload displaces the newest waiter of a lower class, which gets
+the 429 instead.
+
+Active/queued uploads, stage occupancy, queue waits and rejections by
+reason and class, and upload latency by class are exported as Prometheus
+metrics and summarized under "admission" in /health. Limits are per web
+worker process.
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+
+from .config import (
+    ADMISSION_QUEUE_SIZE,
+    ADMISSION_QUEUE_TIMEOUT,
+    ADMISSION_STAGE_LIMITS,
+    PRIORITY_MAX_WAIT,
+    UPLOAD_CONCURRENCY,
+)
+from .priority import PRIORITY_CLASSES, WEIGHTS, get_priority
+from . import metrics
+from app.log import logger
+
+# Bounds of the Retry-After estimate (seconds)
+RETRY_AFTER_MIN = 1
+RETRY_AFTER_MAX = 120
+# Weight of the newest sample in the processing-time average
+SERVICE_TIME_ALPHA = 0.2
+
+
+class Rejected(Exception):
+    """An upload was not admitted; answer with `status_code` and Retry-After."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class FairQueue:
+    """Waiters per priority class, dequeued by weighted fair share.
+
+    Stride scheduling: each class has a pass value that grows by 1/weight
+    per dequeue, and the non-empty class whose next pass is lowest goes next
+    (so with weights 8:1, eight urgent waiters go before one bulk waiter).
+    A class that was idle restarts at the current pass, so it cannot bank
+    credit. A head waiter older than `max_wait` seconds overrides the share.
+    """
+
+    def __init__(self, weights: Dict[str, float], max_wait: float):
+        self.weights = weights
+        self.max_wait = max_wait
+        self._queues: Dict[str, deque] = {name: deque() for name in weights}
+        self._pass = {name: 0.0 for name in weights}
+        self._now_pass = 0.0
+
+    def __len__(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def depth(self) -> Dict[str, int]:
+        return {name: len(q) for name, q in self._queues.items()}
+
+    def push(self, priority: str, item: Any):
+        queue = self._queues[priority]
+        if not queue:
+            self._pass[priority] = max(self._pass[priority], self._now_pass)
+        queue.append((item, time.monotonic()))
+
+    def remove(self, priority: str, item: Any) -> bool:
+        queue = self._queues[priority]
+        for entry in queue:
+            if entry[0] is item:
+                queue.remove(entry)
+                return True
+        return False
+
+    def pop(self) -> Tuple[str, Any]:
+        """(priority, item) of the waiter to serve next; IndexError if empty."""
+        waiting = [name for name, q in self._queues.items() if q]
+        if not waiting:
+            raise IndexError("pop from an empty FairQueue")
+        now = time.monotonic()
+        overdue = [name for name in waiting if now - self._queues[name][0][1] >= self.max_wait]
+        if overdue:
+            priority = min(overdue, key=lambda name: self._queues[name][0][1])
+        else:
+            priority = min(waiting, key=lambda name: (
+                self._pass[name] + 1 / self.weights[name], PRIORITY_CLASSES.index(name)
+            ))
+        self._now_pass = self._pass[priority]
+        self._pass[priority] += 1 / self.weights[priority]
+        return priority, self._queues[priority].popleft()[0]
+
+    def pop_newest_below(self, priority: str) -> Optional[Tuple[str, Any]]:
+        """Take the newest waiter of the lowest class ranked below `priority`."""
+        rank = PRIORITY_CLASSES.index(priority)
+        for name in reversed(PRIORITY_CLASSES[rank + 1:]):
+            if self._queues[name]:
+                return name, self._queues[name].pop()[0]
+        return None
+
+
+class AdmissionController:
+    """Concurrency limit plus bounded priority wait queue, on one event loop."""
+
+    def __init__(self, max_active: int, max_queue: int, queue_timeout: float,
+                 max_wait: float = PRIORITY_MAX_WAIT):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters = FairQueue(WEIGHTS, max_wait)
+        self._service_time = 1.0
+        self.rejected = {"queue_full": 0, "queue_timeout": 0, "displaced": 0}
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Seconds until a new upload would likely be admitted."""
+        ahead = self.queued + 1
+        estimate = self._service_time * ahead / max(1, self.max_active)
+        return int(min(RETRY_AFTER_MAX, max(RETRY_AFTER_MIN, math.ceil(estimate))))
+
+    def _reject(self, status_code: int, reason: str, priority: str, message: str) -> Rejected:
+        self.rejected[reason] += 1
+        metrics.ADMISSION_REJECTIONS.labels(reason=reason, priority=priority).inc()
+        retry_after = self.retry_after()
+        logger.warning(
+            f"Upload rejected ({reason}, {priority}): {self.active} active, {self.queued} queued, "
+            f"Retry-After {retry_after}s"
+        )
+        return Rejected(status_code, reason, retry_after, message)
+
+    async def acquire(self, priority: Optional[str] = None):
+        """Wait for a processing slot, or raise Rejected."""
+        priority = priority or get_priority()
+        if self.active < self.max_active and not self._waiters:
+            self.active += 1
+            metrics.ADMISSION_ACTIVE.inc()
+            metrics.ADMISSION_WAIT_SECONDS.labels(priority=priority).observe(0)
+            return
+        if self.queued >= self.max_queue:
+            displaced = self._waiters.pop_newest_below(priority)
+            if displaced is None:
+                raise self._reject(429, "queue_full", priority, "Server busy: upload queue is full")
+            displaced_priority, displaced_waiter = displaced
+            if not displaced_waiter.done():
+                displaced_waiter.set_exception(self._reject(
+                    429, "displaced", displaced_priority, "Server busy: displaced by a higher-priority upload"
+                ))
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.push(priority, waiter)
+        metrics.ADMISSION_QUEUED.labels(priority=priority).inc()
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except BaseException as exc:
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                # The slot was handed over just as we gave up; pass it on
+                self.release()
+            else:
+                self._waiters.remove(priority, waiter)
+            if isinstance(exc, asyncio.TimeoutError):
+                raise self._reject(503, "queue_timeout", priority, "Server busy: timed out waiting in the upload queue")
+            raise
+        finally:
+            metrics.ADMISSION_QUEUED.labels(priority=priority).dec()
+            metrics.ADMISSION_WAIT_SECONDS.labels(priority=priority).observe(time.perf_counter() - start)
+
+    def release(self, service_time: Optional[float] = None):
+        """Free a slot: hand it to the next waiter by priority, if any."""
+        if service_time is not None:
+            self._service_time += SERVICE_TIME_ALPHA * (service_time - self._service_time)
+        while self._waiters:
+            _, waiter = self._waiters.pop()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+        metrics.ADMISSION_ACTIVE.dec()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "max_active": self.max_active,
+            "queued": self.queued,
+            "queued_by_priority": self._waiters.depth(),
+            "max_queue": self.max_queue,
+            "avg_service_s": round(self._service_time, 3),
+            "rejected": dict(self.rejected),
+            "stages": {name: limiter.stats() for name, limiter in _stage_limiters.items()},
+        }
+
+
+# -------------------------
+# Stage limits
+# -------------------------
+class StageLimiter:
+    """Blocking limit on admitted uploads in one stage (pipeline threads).
+
+    A freed slot is handed directly to the next waiter by priority.
+    """
+
+    def __init__(self, name: str, limit: int, max_wait: float = PRIORITY_MAX_WAIT):
+        self.name = name
+        self.limit = limit
+        self.active = 0
+        self._waiters = FairQueue(WEIGHTS, max_wait)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, priority: Optional[str] = None):
+        priority = priority or get_priority()
+        start = time.perf_counter()
+        with self._lock:
+            if self.active < self.limit and not self._waiters:
+                self.active += 1
+                handed_over = None
+            else:
+                handed_over = threading.Event()
+                self._waiters.push(priority, handed_over)
+        if handed_over is not None:
+            waiting = metrics.ADMISSION_STAGE_WAITING.labels(stage=self.name)
+            waiting.inc()
+            try:
+                handed_over.wait()
+            finally:
+                waiting.dec()
+        metrics.ADMISSION_STAGE_WAIT_SECONDS.labels(stage=self.name, priority=priority).observe(
+            time.perf_counter() - start
+        )
+        metrics.ADMISSION_STAGE_ACTIVE.labels(stage=self.name).inc()
+        try:
+            yield
+        finally:
+            metrics.ADMISSION_STAGE_ACTIVE.labels(stage=self.name).dec()
+            with self._lock:
+                if self._waiters:
+                    self._waiters.pop()[1].set()
+                else:
+                    self.active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"active": self.active, "limit": self.limit, "waiting": self._waiters.depth()}
+
+
+_stage_limiters: Dict[str, StageLimiter] = {
+    stage: StageLimiter(stage, limit) for stage, limit in ADMISSION_STAGE_LIMITS.items() if limit > 0
+}
+
+
+@contextmanager
+def stage_slot(stage: str):
+    """Hold a slot of `stage` (no-op for stages without a limit)."""
+    limiter = _stage_limiters.get(stage)
+    if limiter is None:
+        yield
+        return
+    with limiter.slot():
+        yield
+
+
+# -------------------------
+# Shared instance
+# -------------------------
+_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController(UPLOAD_CONCURRENCY, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT)
+    return _controller
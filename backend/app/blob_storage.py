@@ -0,0 +1,276 @@
+# app/blob_storage.py
+"""
+Azure Blob Storage access and background archival of uploads.
+
+Uploads are archived by a BlobArchiver: the file is linked into a local
+spool directory and uploaded by a small worker pool with retries, so request
+processing (which works on the local temp copy) never waits for Azure.
+Spooled files survive a process restart and are re-queued on startup.
+Every web worker shares the spool: a file is uploaded under an flock on it,
+so when several workers resume (or spool the same document) at once, each
+file is uploaded by one of them and the others skip it.
+
+For local testing, set AZURE_STORAGE_CONNECTION_STRING to
+"UseDevelopmentStorage=true" to target Azurite, or to "file:///some/dir" to
+use the filesystem stand-in (LocalBlobContainer).
+"""
+import fcntl
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict
+
+from .config import (
+    AZURE_STORAGE_CONNECTION_STRING,
+    AZURE_BLOB_CONTAINER,
+    BLOB_SPOOL_DIR,
+    BLOB_UPLOAD_WORKERS,
+    BLOB_UPLOAD_MAX_RETRIES,
+    BLOB_UPLOAD_RETRY_DELAY,
+)
+from app.log import logger
+from . import metrics
+
+LOCAL_BLOB_PREFIX = "file://"
+
+# Lazy import Azure SDK (only when needed)
+_blob_service_client = None
+_container_client = None
+_archiver = None
+
+
+class _LocalBlobClient:
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+
+class LocalBlobContainer:
+    """
+    Filesystem stand-in for an Azure ContainerClient (the subset used here),
+    for running blob mode without Azure or Azurite.
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def upload_blob(self, name: str, data, overwrite: bool = False):
+        target = self.root / name
+        if target.exists() and not overwrite:
+            raise FileExistsError(f"Blob already exists: {name}")
+        tmp = target.with_name(target.name + ".part")
+        with open(tmp, "wb") as f:
+            if isinstance(data, (bytes, bytearray, memoryview)):
+                f.write(data)
+            else:
+                shutil.copyfileobj(data, f)
+        os.replace(tmp, target)
+
+    def get_blob_client(self, name: str):
+        return _LocalBlobClient(self.root / name)
+
+    def delete_blob(self, name: str):
+        (self.root / name).unlink()
+
+    def list_blob_names(self):
+        return sorted(p.name for p in self.root.iterdir() if not p.name.endswith(".part"))
+
+
+def get_blob_service_client():
+    """Get or create Azure Blob Service Client (lazy initialization)."""
+    global _blob_service_client
+    if _blob_service_client is None:
+        try:
+            from azure.storage.blob import BlobServiceClient
+            _blob_service_client = BlobServiceClient.from_connection_string(
+                AZURE_STORAGE_CONNECTION_STRING
+            )
+            logger.info("Azure Blob Service Client initialized")
+        except ImportError:
+            raise RuntimeError(
+                "azure-storage-blob is not installed. "
+                "Install with: pip install azure-storage-blob"
+            )
+        except Exception as e:
+            logger.error(f"Failed to initialize Blob Service Client: {e}")
+            raise
+    return _blob_service_client
+
+
+def get_blob_container_client():
+    """Get the uploads container (Azure, Azurite or the filesystem stand-in)."""
+    global _container_client
+    if _container_client is None:
+        if (AZURE_STORAGE_CONNECTION_STRING or "").startswith(LOCAL_BLOB_PREFIX):
+            root = AZURE_STORAGE_CONNECTION_STRING[len(LOCAL_BLOB_PREFIX):]
+            _container_client = LocalBlobContainer(os.path.join(root, AZURE_BLOB_CONTAINER))
+            logger.info(f"Using local blob stand-in at {root}")
+        else:
+            _container_client = get_blob_service_client().get_container_client(AZURE_BLOB_CONTAINER)
+    return _container_client
+
+
+class BlobArchiver:
+    """
+    Background, retrying uploader backed by a durable local spool directory.
+    """
+
+    def __init__(
+        self,
+        spool_dir: Path = BLOB_SPOOL_DIR,
+        workers: int = BLOB_UPLOAD_WORKERS,
+        max_retries: int = BLOB_UPLOAD_MAX_RETRIES,
+        retry_delay: float = BLOB_UPLOAD_RETRY_DELAY,
+        container_factory=get_blob_container_client,
+    ):
+        self.spool_dir = Path(spool_dir)
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.container_factory = container_factory
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="blob")
+        self._lock = threading.Lock()
+        self._stats = {"pending": 0, "uploaded": 0, "deduplicated": 0, "skipped": 0, "failed": 0, "retries": 0}
+
+    def submit(self, path: Path, blob_name: str):
+        """
+        Spool `path` under `blob_name` and queue it for upload.
+
+        The spool entry is a hard link when possible (no data copy), so the
+        caller is free to delete `path` right away.
+        """
+        spooled = self.spool_dir / blob_name
+        try:
+            os.link(path, spooled)
+        except FileExistsError:
+            pass
+        except OSError:
+            shutil.copyfile(path, spooled)
+        self._enqueue(spooled)
+
+    def submit_bytes(self, data, blob_name: str):
+        """
+        Queue in-memory content for upload under `blob_name`.
+        
+        The spool file is written by the worker thread, so the request
+        itself does no disk I/O.
+        """
+        data = bytes(data)
+        with self._lock:
+            self._stats["pending"] += 1
+        metrics.track_task("blob", self._executor.submit(self._spool_and_upload, data, blob_name))
+
+    def resume(self) -> int:
+        """Re-queue files left in the spool by a previous process."""
+        leftovers = [
+            p for p in self.spool_dir.iterdir()
+            if p.is_file() and not p.name.startswith(".")
+        ]
+        for spooled in leftovers:
+            self._enqueue(spooled)
+        if leftovers:
+            logger.info(f"Re-queued {len(leftovers)} spooled uploads for blob archival")
+        return len(leftovers)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting work; with wait=True, drain queued uploads first."""
+        self._executor.shutdown(wait=wait)
+
+    def _enqueue(self, spooled: Path):
+        with self._lock:
+            self._stats["pending"] += 1
+        metrics.track_task("blob", self._executor.submit(self._upload, spooled))
+
+    def _spool_and_upload(self, data: bytes, blob_name: str):
+        spooled = self.spool_dir / blob_name
+        try:
+            if not spooled.exists():
+                tmp = spooled.with_name(f".{blob_name}.part")
+                tmp.write_bytes(data)
+                os.replace(tmp, spooled)
+        except Exception as e:
+            logger.error(f"Failed to spool {blob_name} for blob archival: {e}")
+            with self._lock:
+                self._stats["pending"] -= 1
+                self._stats["failed"] += 1
+            return
+        self._upload(spooled)
+
+    def _upload(self, spooled: Path):
+        blob_name = spooled.name
+        outcome = "failed"
+        fd = None
+        try:
+            try:
+                fd = os.open(spooled, os.O_RDONLY)
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                # Archived and unlinked by another process before we got the lock
+                archived = os.stat(spooled).st_ino != os.fstat(fd).st_ino
+            except (BlockingIOError, FileNotFoundError):
+                archived = True
+            if archived:
+                outcome = "skipped"
+                logger.debug(f"Blob {blob_name} is archived by another worker; skipping")
+                return
+            for attempt in range(1, self.max_retries + 1):
+                try:
+                    container = self.container_factory()
+                    # Content-addressed names: an existing blob is the same document
+                    if container.get_blob_client(blob_name).exists():
+                        spooled.unlink()
+                        outcome = "deduplicated"
+                        metrics.CACHE_EVENTS.labels(cache="blob_archive", result="hit").inc()
+                        logger.info(f"Blob {blob_name} already archived; skipping upload")
+                        return
+                    with open(spooled, "rb") as f:
+                        container.upload_blob(blob_name, f, overwrite=True)
+                    spooled.unlink()
+                    outcome = "uploaded"
+                    metrics.CACHE_EVENTS.labels(cache="blob_archive", result="miss").inc()
+                    logger.info(f"Archived {blob_name} to blob storage (attempt {attempt})")
+                    return
+                except FileNotFoundError:
+                    logger.warning(f"Spooled file {spooled} disappeared; skipping")
+                    return
+                except Exception as e:
+                    if attempt == self.max_retries:
+                        logger.error(f"Blob archival failed for {blob_name} after {attempt} attempts: {e} (kept in spool)")
+                        return
+                    with self._lock:
+                        self._stats["retries"] += 1
+                    metrics.RETRIES.labels(operation="blob_upload").inc()
+                    delay = self.retry_delay * (2 ** (attempt - 1))
+                    logger.warning(f"Blob upload of {blob_name} failed ({e}); retrying in {delay:.1f}s")
+                    time.sleep(delay)
+        finally:
+            if fd is not None:
+                os.close(fd)
+            with self._lock:
+                self._stats["pending"] -= 1
+                self._stats[outcome] += 1
+
+
+def get_blob_archiver() -> BlobArchiver:
+    """Get or create the process-wide blob archiver."""
+    global _archiver
+    if _archiver is None:
+        _archiver = BlobArchiver()
+        logger.info(f"Blob archiver started (spool: {_archiver.spool_dir})")
+    return _archiver
+
+
+def shutdown_blob_archiver(wait: bool = True):
+    """Drain and stop the blob archiver if it was started."""
+    if _archiver is not None:
+        _archiver.shutdown(wait=wait)
@@ -41,6 +41,26 @@ class ReferralClassifier:
         r'consultation\s+request',
     ]
     
+    # Urgency markers ("URGENT", "STAT", ...); a marked referral is scheduled
+    # ahead of routine work (see app/priority.py)
+    URGENT_PATTERNS = [
+        r'(?<!non-)(?<!non )(?<!not )\burgent(?:ly)?\b',
+        r'\bstat\b',
+        r'\basap\b',
+        r'\bemergency\s+referral\b',
+    ]
+    
+    # Core referral fields; used to decide whether enough of the referral
+    # form has been captured (e.g. to stop OCR on long packets early)
+    FIELD_PATTERNS = {
+        'patient_name': r'(?:patient(?:\s+name)?|full\s+name)\s*[:\-]\s*\S',
+        'date_of_birth': r'\b(?:d\.?o\.?b\.?|date\s+of\s+birth|birth\s*date)\b',
+        'referral_to': r'\b(?:referr(?:al|ed)\s+to|refer\s+to)\b',
+        'referring_from': r'\b(?:referring\s+(?:from|physician|doctor|provider|facility)|referr(?:al|ed)\s+from)\b',
+        'reason_for_referral': r'\breason\s+for\s+(?:referral|consultation)\b',
+        'diagnoses': r'\bdiagnos(?:is|es)\b',
+    }
+    
     def __init__(self, threshold_strong: int = 1, threshold_total: int = 10):
         """
         Initialize classifier with thresholds.
@@ -66,6 +86,7 @@ class ReferralClassifier:
                 - score: int
                 - details: dict with keyword counts
                 - reason: str explaining the classification
+                - urgent: bool, the text carries an URGENT/STAT marker
         """
         if not text or len(text.strip()) < 50:
             return {
@@ -73,7 +94,8 @@ class ReferralClassifier:
                 'confidence': 0.0,
                 'score': 0,
                 'details': {},
-                'reason': 'Insufficient text content'
+                'reason': 'Insufficient text content',
+                'urgent': False
             }
         
         text_lower = text.lower()
@@ -83,6 +105,7 @@ class ReferralClassifier:
         medical_count = self._count_keywords(text_lower, self.MEDICAL_KEYWORDS)
         admin_count = self._count_keywords(text_lower, self.ADMIN_KEYWORDS)
         pattern_count = self._count_patterns(text_lower, self.REFERRAL_PATTERNS)
+        urgent = self.is_urgent(text_lower)
         
         # Calculate scores
         # Strong keywords are worth 10 points each
@@ -126,7 +149,7 @@ class ReferralClassifier:
         
         logger.info(
             f"Classification result: is_referral={is_referral}, "
-            f"confidence={confidence:.2f}, score={score}, details={details}"
+            f"confidence={confidence:.2f}, score={score}, urgent={urgent}, details={details}"
         )
         
         return {
@@ -134,9 +157,39 @@ class ReferralClassifier:
             'confidence': round(confidence, 2),
             'score': score,
             'details': details,
-            'reason': reason
+            'reason': reason,
+            'urgent': urgent
+        }
+    
+    def field_coverage(self, text: str) -> Dict:
+        """
+        Check which core referral fields are labelled in the text.
+        
+        Args:
+            text: Extracted text (may be a partial document)
+            
+        Returns:
+            Dict with:
+                - coverage: float (0-1), fraction of FIELD_PATTERNS found
+                - found: list of field names present
+                - missing: list of field names absent
+        """
+        text_lower = (text or "").lower()
+        found = [
+            name for name, pattern in self.FIELD_PATTERNS.items()
+            if re.search(pattern, text_lower)
+        ]
+        missing = [name for name in self.FIELD_PATTERNS if name not in found]
+        return {
+            'coverage': round(len(found) / len(self.FIELD_PATTERNS), 2),
+            'found': found,
+            'missing': missing
         }
     
+    def is_urgent(self, text: str) -> bool:
+        """True if the text carries an URGENT/STAT marker."""
+        return self._count_patterns((text or "").lower(), self.URGENT_PATTERNS) > 0
+    
     def _count_keywords(self, text: str, keywords: List[str]) -> int:
         """Count occurrences of keywords in text."""
         count = 0
@@ -169,4 +222,16 @@ def classify_document(text: str) -> Dict:
         Classification result dictionary
     """
     classifier = ReferralClassifier()
-    return classifier.classify(text)
\ No newline at end of file
+    return classifier.classify(text)
+
+
+def is_referral_captured(text: str, min_coverage: float) -> bool:
+    """
+    Return True once the text reads as a referral and contains at least
+    `min_coverage` of the core referral fields.
+    """
+    classifier = ReferralClassifier()
+    coverage = classifier.field_coverage(text)
+    if coverage['coverage'] < min_coverage:
+        return False
+    return classifier.classify(text)['is_referral']
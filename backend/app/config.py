@@ -30,26 +30,96 @@ if USE_BLOB_STORAGE:
     
     # Local temp directory for processing
     UPLOAD_DIR = Path("/tmp/uploads")
-    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    
+    # Background blob archival: durable spool + retrying worker pool
+    BLOB_SPOOL_DIR = Path(os.getenv('BLOB_SPOOL_DIR', '/tmp/blob_spool'))
+    BLOB_UPLOAD_WORKERS = int(os.getenv('BLOB_UPLOAD_WORKERS', '2'))
+    BLOB_UPLOAD_MAX_RETRIES = int(os.getenv('BLOB_UPLOAD_MAX_RETRIES', '5'))
+    BLOB_UPLOAD_RETRY_DELAY = float(os.getenv('BLOB_UPLOAD_RETRY_DELAY', '1.0'))
 else:
     # Local filesystem for development
     upload_dir_env = os.getenv('UPLOAD_DIR', str(BASE_DIR / 'uploads'))
     UPLOAD_DIR = Path(upload_dir_env)
-    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
     
     AZURE_STORAGE_CONNECTION_STRING = None
     AZURE_BLOB_CONTAINER = None
+    BLOB_SPOOL_DIR = None
+    BLOB_UPLOAD_WORKERS = 0
+    BLOB_UPLOAD_MAX_RETRIES = 0
+    BLOB_UPLOAD_RETRY_DELAY = 0.0
 
 # ========== OCR CONFIGURATION ==========
 MAX_PAGES = int(os.getenv('MAX_PAGES', '8'))
 TESSERACT_CMD = os.getenv('TESSERACT_CMD', '/usr/bin/tesseract').strip()
 
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+# Per-run OCR tracing (see app/run_trace.py): events kept per run / finished runs kept
+RUN_TRACE_MAX_EVENTS = int(os.getenv('RUN_TRACE_MAX_EVENTS', '200'))
+RUN_TRACE_MAX_RUNS = int(os.getenv('RUN_TRACE_MAX_RUNS', '50'))
+
+# Early-exit OCR: stop once the referral form has been captured
+EARLY_EXIT_ENABLED = os.getenv('EARLY_EXIT_ENABLED', 'false').lower() == 'true'
+EARLY_EXIT_MIN_PAGES = int(os.getenv('EARLY_EXIT_MIN_PAGES', '1'))
+EARLY_EXIT_MAX_PAGES = int(os.getenv('EARLY_EXIT_MAX_PAGES', str(MAX_PAGES)))
+EARLY_EXIT_MIN_COVERAGE = float(os.getenv('EARLY_EXIT_MIN_COVERAGE', '0.8'))
+# Pages read and queued ahead of the one being checked; each is up to one
+# page rasterized and OCR'd for nothing when the stop fires
+EARLY_EXIT_PREFETCH = max(0, int(os.getenv('EARLY_EXIT_PREFETCH', '1')))
+
+# Known sender form layouts (JSON templates, see app/form_templates.py)
+FORM_TEMPLATES_ENABLED = os.getenv('FORM_TEMPLATES_ENABLED', 'true').lower() == 'true'
+FORM_TEMPLATE_DIR = Path(os.getenv('FORM_TEMPLATE_DIR', str(BASE_DIR / 'form_templates')))
+
+# Pre-OCR page filtering: skip blank separator pages and repeated pages
+PAGE_FILTER_ENABLED = os.getenv('PAGE_FILTER_ENABLED', 'true').lower() == 'true'
+BLANK_PAGE_INK_THRESHOLD = float(os.getenv('BLANK_PAGE_INK_THRESHOLD', '0.0001'))
+# Duplicate skipping drops pages, so it stays off until validated on real faxes.
+# A page is a duplicate when its dHash is within MAX_DISTANCE bits (of 1024)
+# of an earlier page AND no 32 px block of the two differs by more than
+# MAX_BLOCK_DIFF of its pixels (a changed word differs by ~0.13, fax speckle ~0.02)
+DUPLICATE_PAGE_FILTER_ENABLED = os.getenv('DUPLICATE_PAGE_FILTER_ENABLED', 'false').lower() == 'true'
+DUPLICATE_PAGE_MAX_DISTANCE = int(os.getenv('DUPLICATE_PAGE_MAX_DISTANCE', '64'))
+DUPLICATE_PAGE_MAX_BLOCK_DIFF = float(os.getenv('DUPLICATE_PAGE_MAX_BLOCK_DIFF', '0.05'))
+
 # ========== AZURE OPENAI CONFIGURATION ==========
 AZURE_OPENAI_ENDPOINT = os.getenv('AZURE_OPENAI_ENDPOINT', '').strip()
 AZURE_OPENAI_API_KEY = os.getenv('AZURE_OPENAI_API_KEY', '').strip()
 AZURE_OPENAI_DEPLOYMENT = os.getenv('AZURE_OPENAI_DEPLOYMENT', '').strip()
 AZURE_OPENAI_API_VERSION = os.getenv('AZURE_OPENAI_API_VERSION', '2024-02-15-preview').strip()
 
+# LLM backend (see app/gpt_client.py): live (Azure), record (Azure, saving
+# responses to LLM_FIXTURE_DIR), replay (recorded responses, no network, see
+# app/llm_fixtures.py) or stub (fixed output, the default with
+# AZURE_OPENAI_API_KEY=skip)
+LLM_MODE = os.getenv(
+    'LLM_MODE', 'stub' if AZURE_OPENAI_API_KEY.lower() == 'skip' else 'live'
+).strip().lower()
+LLM_FIXTURE_DIR = Path(os.getenv('LLM_FIXTURE_DIR', str(BASE_DIR / 'llm_fixtures')))
+# LLM_MODE=record calls Azure and saves each response as a fixture, with
+# names, contact details and dates replaced by placeholders unless disabled
+LLM_RECORD_SCRUB_PHI = os.getenv('LLM_RECORD_SCRUB_PHI', 'true').lower() == 'true'
+# What a fixture is keyed on: "document" (the uploaded file's SHA-256 and the
+# schema version, so a recording replays under any OCR/page settings) or
+# "prompt" (the exact prompt text, so any change to it misses)
+LLM_FIXTURE_KEY = os.getenv('LLM_FIXTURE_KEY', 'document').strip().lower()
+# Replay fault injection: delay per call (ms, or "recorded" for the latency
+# measured when recording), share of calls that fail, and the RNG seed
+LLM_REPLAY_LATENCY = os.getenv('LLM_REPLAY_LATENCY', '0').strip().lower()
+LLM_REPLAY_FAILURE_RATE = float(os.getenv('LLM_REPLAY_FAILURE_RATE', '0'))
+LLM_REPLAY_SEED = os.getenv('LLM_REPLAY_SEED')
+
+# Ask the model for a JSON object (response_format=json_object) and stream
+# the answer, parsing and validating fields as they arrive (app/json_stream.py)
+LLM_JSON_MODE = os.getenv('LLM_JSON_MODE', 'true').lower() == 'true'
+LLM_STREAM = os.getenv('LLM_STREAM', 'true').lower() == 'true'
+# An answer cut off at max_tokens keeps its complete fields; with this on,
+# the missing ones are asked for in one follow-up request
+LLM_RESUME_TRUNCATED = os.getenv('LLM_RESUME_TRUNCATED', 'true').lower() == 'true'
+
+# Delay added by the stub in place of the Azure round trip (benchmarks, load tests)
+LLM_STUB_LATENCY_MS = float(os.getenv('LLM_STUB_LATENCY_MS', '0'))
+
 # Validate required Azure OpenAI config in production
 if ENVIRONMENT == "azure":
     required_fields = {
@@ -90,9 +160,101 @@ LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO' if not DEBUG else 'DEBUG')
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 
 # ========== FILE PROCESSING CONFIGURATION ==========
-MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+MAX_FILE_SIZE = int(os.getenv('MAX_FILE_SIZE', str(50 * 1024 * 1024)))  # 50MB
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', str(1024 * 1024)))  # 1MB
+# TXT/DOCX/image uploads up to this size are extracted from memory (0 = always use disk)
+IN_MEMORY_UPLOAD_MAX_BYTES = int(os.getenv('IN_MEMORY_UPLOAD_MAX_BYTES', str(1024 * 1024)))  # 1MB
 TEMP_DIR = Path("/tmp") if ENVIRONMENT == "azure" else Path(BASE_DIR / "temp")
-TEMP_DIR.mkdir(parents=True, exist_ok=True)
+# Directories under UPLOAD_DIR / TEMP_DIR are created by whatever first writes
+# to them (content store, timing store, profiles), not when config is imported
+
+# Content store (app/content_store.py): job references older than this are
+# left by a crashed worker and collected, with the objects only they held.
+# Must be well above the longest job (WORKER_TIMEOUT). Checked at startup
+# and then at most every CONTENT_STORE_GC_INTERVAL seconds per worker.
+CONTENT_STORE_REF_MAX_AGE = float(os.getenv('CONTENT_STORE_REF_MAX_AGE', '3600'))
+CONTENT_STORE_GC_INTERVAL = float(os.getenv('CONTENT_STORE_GC_INTERVAL', '600'))
+
+# Per-job stage timings (SQLite, see app/timings.py)
+TIMINGS_DB_PATH = Path(os.getenv('TIMINGS_DB_PATH', str(TEMP_DIR / 'timings.db')))
+TIMINGS_MAX_ROWS = int(os.getenv('TIMINGS_MAX_ROWS', '10000'))
+
+# Opt-in /upload profiling (X-Profile header or sampling, see app/profiling.py)
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'false').lower() == 'true'
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILE_DIR = Path(os.getenv('PROFILE_DIR', str(TEMP_DIR / 'profiles')))
+PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', '200'))
+
+# OpenTelemetry tracing (see app/tracing.py); exporter: file | otlp | console
+TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'false').lower() == 'true'
+TRACING_EXPORTER = os.getenv('TRACING_EXPORTER', 'file').strip().lower()
+TRACE_FILE = Path(os.getenv('TRACE_FILE', str(BASE_DIR / 'logs' / 'traces.jsonl')))
+TRACING_SERVICE_NAME = os.getenv('OTEL_SERVICE_NAME', 'medical-referral-extractor')
+
+# ========== STARTUP ==========
+# What to load before the first request (see app/warmup.py): comma-separated
+# pdf, tiff, image, docx, llm, templates, or "all"; empty loads everything
+# on first use instead
+WARMUP = [t.strip().lower() for t in os.getenv('WARMUP', '').split(',') if t.strip()]
+
+# ========== SERVING ==========
+# Production mode: gunicorn with uvicorn workers (see gunicorn.conf.py)
+SERVE_BIND = os.getenv('SERVE_BIND', '0.0.0.0:8000').strip()
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', str(min(4, os.cpu_count() or 1))))
+# Seconds a stopping worker gets to finish in-flight uploads, and the
+# silence after which a stuck worker is killed and replaced
+GRACEFUL_TIMEOUT = int(os.getenv('GRACEFUL_TIMEOUT', '120'))
+WORKER_TIMEOUT = int(os.getenv('WORKER_TIMEOUT', '180'))
+# Uploads one web worker processes at once; the pipeline runs on threads,
+# so the worker keeps accepting and answering requests meanwhile
+UPLOAD_CONCURRENCY = int(os.getenv('UPLOAD_CONCURRENCY', '4'))
+# Import the app once in the master and fork workers from it (WARMUP still runs per worker)
+SERVE_PRELOAD = os.getenv('SERVE_PRELOAD', 'true').lower() == 'true'
+
+# Machine-wide OCR pool shared by all workers (see app/ocr_pool.py):
+# at most OCR_POOL_SIZE Tesseract processes at once; 0 = no shared limit
+OCR_POOL_SIZE = int(os.getenv('OCR_POOL_SIZE', str(os.cpu_count() or 1)))
+OCR_POOL_DIR = Path(os.getenv('OCR_POOL_DIR', str(TEMP_DIR / 'ocr_pool')))
+
+# ========== ADMISSION CONTROL ==========
+# Per web worker (see app/admission.py): uploads beyond UPLOAD_CONCURRENCY
+# wait in a queue of ADMISSION_QUEUE_SIZE; a full queue answers 429 and a
+# wait longer than ADMISSION_QUEUE_TIMEOUT seconds 503, both with Retry-After
+ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'true').lower() == 'true'
+ADMISSION_QUEUE_SIZE = int(os.getenv('ADMISSION_QUEUE_SIZE', '16'))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '30'))
+# Admitted uploads in a stage at once, e.g. "ocr=2,llm=4" (unlisted: no limit)
+ADMISSION_STAGE_LIMITS = {
+    stage.strip().lower(): int(limit)
+    for stage, _, limit in (
+        part.partition('=') for part in os.getenv('ADMISSION_STAGE_LIMITS', 'ocr=2').split(',')
+    )
+    if stage.strip() and limit.strip()
+}
+
+# Priority classes (see app/priority.py): urgent, interactive, bulk. Waiting
+# uploads are served by weighted fair share; one waiting PRIORITY_MAX_WAIT
+# seconds goes next regardless of class
+PRIORITY_DEFAULT = os.getenv('PRIORITY_DEFAULT', 'interactive').strip().lower()
+PRIORITY_WEIGHTS = {
+    name.strip().lower(): float(weight)
+    for name, _, weight in (
+        part.partition('=') for part in os.getenv('PRIORITY_WEIGHTS', 'urgent=8,interactive=4,bulk=1').split(',')
+    )
+    if name.strip() and weight.strip()
+}
+for _name, _weight in PRIORITY_WEIGHTS.items():
+    if not _weight > 0:
+        raise ValueError(f"PRIORITY_WEIGHTS: weight for {_name!r} must be > 0, got {_weight}")
+PRIORITY_MAX_WAIT = float(os.getenv('PRIORITY_MAX_WAIT', '20'))
+# Classes a client may pick with the X-Priority header; anything else gets
+# PRIORITY_DEFAULT, so only the classifier escalates to urgent. A request
+# carrying X-Priority-Token equal to PRIORITY_HEADER_TOKEN (set it on a
+# trusted gateway) may pick any class.
+PRIORITY_HEADER_CLASSES = [
+    c.strip().lower() for c in os.getenv('PRIORITY_HEADER_CLASSES', 'interactive,bulk').split(',') if c.strip()
+]
+PRIORITY_HEADER_TOKEN = os.getenv('PRIORITY_HEADER_TOKEN', '')
 
 # ========== VALIDATION ==========
 if __name__ == "__main__":
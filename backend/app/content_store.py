@@ -0,0 +1,166 @@
+# app/content_store.py
+"""
+Content-addressed local store for uploaded documents.
+
+Each unique document is stored once as objects/<sha256>.<ext>. Every job
+using it holds a reference (an empty marker file refs/<sha256>/<job_id>);
+releasing the last reference deletes the object. The SHA-256 also names the
+archived blob, so identical resubmissions are written and archived once and
+give later stages a stable key for caching.
+
+Add/release run under an flock on the store, so several worker processes can
+share one store safely.
+
+A worker that crashes mid-job never releases its references. collect_stale
+drops references older than CONTENT_STORE_REF_MAX_AGE (far longer than any
+job), objects left without references and abandoned .part files; it runs
+when a worker starts and then periodically from add().
+"""
+import fcntl
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Tuple
+
+from .config import CONTENT_STORE_GC_INTERVAL, CONTENT_STORE_REF_MAX_AGE, UPLOAD_DIR
+from app.log import logger
+
+
+class ContentStore:
+
+    def __init__(self, root: Path, ref_max_age: float = CONTENT_STORE_REF_MAX_AGE,
+                 gc_interval: float = CONTENT_STORE_GC_INTERVAL):
+        self.root = Path(root)
+        self.ref_max_age = ref_max_age
+        self.gc_interval = gc_interval
+        self._next_gc = time.monotonic() + gc_interval
+        self.objects_dir = self.root / "objects"
+        self.refs_dir = self.root / "refs"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.refs_dir.mkdir(parents=True, exist_ok=True)
+        self._lock_path = self.root / ".lock"
+
+    @contextmanager
+    def _locked(self):
+        with open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def object_name(sha256: str, ext: str) -> str:
+        return f"{sha256}.{ext}"
+
+    def object_path(self, object_name: str) -> Path:
+        return self.objects_dir / object_name
+
+    def add(self, tmp_path: Path, sha256: str, ext: str, job_id: str) -> Tuple[Path, bool]:
+        """
+        Move a freshly written upload into the store and reference it from `job_id`.
+
+        If the content is already stored the temp file is discarded.
+
+        Returns:
+            tuple: (object_path, is_new)
+        """
+        if time.monotonic() >= self._next_gc:
+            self.collect_stale()
+        name = self.object_name(sha256, ext)
+        path = self.object_path(name)
+        with self._locked():
+            refs = self.refs_dir / name
+            refs.mkdir(exist_ok=True)
+            (refs / job_id).touch()
+            is_new = not path.exists()
+            if is_new:
+                os.replace(tmp_path, path)
+            else:
+                os.remove(tmp_path)
+        logger.info(f"Content store {'added' if is_new else 'deduplicated'} {name} (job_id={job_id})")
+        return path, is_new
+
+    def release(self, path: Path, job_id: str) -> bool:
+        """
+        Drop `job_id`'s reference to the object at `path`; delete the object
+        once nothing references it.
+
+        Returns:
+            True if the object was deleted
+        """
+        name = Path(path).name
+        refs = self.refs_dir / name
+        with self._locked():
+            try:
+                (refs / job_id).unlink()
+            except FileNotFoundError:
+                pass
+            try:
+                refs.rmdir()
+            except OSError:
+                # Still referenced by other jobs (or already collected)
+                return False
+            try:
+                self.object_path(name).unlink()
+            except FileNotFoundError:
+                pass
+        logger.debug(f"Content store collected {name}")
+        return True
+
+    def collect_stale(self, max_age: Optional[float] = None) -> Tuple[int, int]:
+        """
+        Drop references older than `max_age` seconds (default ref_max_age) and
+        delete objects nothing references any more.
+
+        Returns:
+            tuple: (references dropped, objects deleted)
+        """
+        self._next_gc = time.monotonic() + self.gc_interval
+        cutoff = time.time() - (self.ref_max_age if max_age is None else max_age)
+        dropped = deleted = 0
+        with self._locked():
+            for refs in self.refs_dir.iterdir():
+                for marker in refs.iterdir():
+                    if marker.stat().st_mtime < cutoff:
+                        marker.unlink()
+                        dropped += 1
+                try:
+                    refs.rmdir()
+                except OSError:
+                    continue
+                try:
+                    self.object_path(refs.name).unlink()
+                    deleted += 1
+                except FileNotFoundError:
+                    pass
+            # Objects whose refs were removed before a crash, and partial uploads
+            for path in [*self.objects_dir.iterdir(), *self.root.glob("*.part")]:
+                orphaned = path.suffix == ".part" or not (self.refs_dir / path.name).exists()
+                if orphaned and path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    deleted += 1
+        if dropped or deleted:
+            logger.warning(f"Content store collected {dropped} stale references and {deleted} orphaned files")
+        return dropped, deleted
+
+    def references(self, object_name: str) -> int:
+        """Number of live job references to an object."""
+        refs = self.refs_dir / object_name
+        return len(os.listdir(refs)) if refs.is_dir() else 0
+
+    def contains(self, path: Path) -> bool:
+        """True if `path` is an object in this store."""
+        return Path(path).resolve().parent == self.objects_dir.resolve()
+
+
+_store: Optional[ContentStore] = None
+
+
+def get_content_store() -> ContentStore:
+    """Get or create the process-wide content store under UPLOAD_DIR."""
+    global _store
+    if _store is None:
+        _store = ContentStore(UPLOAD_DIR)
+    return _store
@@ -0,0 +1,372 @@
+# app/form_templates.py
+"""
+Form template registry for referrals from senders with fixed form layouts.
+
+A template identifies a known form by words in its header band (and,
+optionally, where those words sit on the page) and lists the page regions
+holding each field. For a matched form only those regions are OCR'd and the
+values are mapped straight into the ReferralExtraction structure, bypassing
+full-page OCR and the LLM.
+
+Templates are JSON files in FORM_TEMPLATE_DIR. They can be written by hand
+or learned from a filled sample with:
+
+    python -m app.form_templates learn <name> <sample.pdf> \
+        --header "PATIENT REFERRAL FORM" \
+        --label "Full Name:=patient.full_name" --label "Date of birth:=patient.date_of_birth"
+"""
+import argparse
+import itertools
+import json
+import re
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from app.log import logger
+from .config import FORM_TEMPLATE_DIR, FORM_TEMPLATES_ENABLED
+from .schemas import OCRDocument, PageOCR
+from .text_extractor import get_ocr_executor, iter_pdf_pages, iter_tiff_frames
+from . import metrics
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# Share of the page height treated as the header band
+HEADER_BAND = 0.18
+
+# Max distance (in page fractions) between a header anchor and its position
+# in the template for the layout fingerprint to match
+ANCHOR_TOLERANCE = 0.05
+
+Box = Tuple[float, float, float, float]
+
+
+class HeaderAnchor(BaseModel):
+    text: str
+    x: float
+    y: float
+
+
+class FieldRegion(BaseModel):
+    field: str = Field(..., description="Dotted path into ReferralExtraction, e.g. patient.full_name")
+    page: int = 1
+    box: Box = Field(..., description="(left, top, right, bottom) as fractions of the page size")
+    kind: str = Field("text", description="text | list | bool")
+
+
+class FormTemplate(BaseModel):
+    name: str
+    header_keywords: List[str]
+    header_anchors: List[HeaderAnchor] = []
+    regions: List[FieldRegion]
+
+    @property
+    def page_count(self) -> int:
+        return max((region.page for region in self.regions), default=1)
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", re.sub(r"[^a-z0-9 ]", " ", text.lower())).strip()
+
+
+# -------------------------------------------------------------------------
+# REGISTRY
+# -------------------------------------------------------------------------
+_templates: Optional[List[FormTemplate]] = None
+
+
+def load_templates(reload: bool = False) -> List[FormTemplate]:
+    """Load (and cache) all templates from FORM_TEMPLATE_DIR."""
+    global _templates
+    if _templates is None or reload:
+        templates = []
+        template_dir = Path(FORM_TEMPLATE_DIR)
+        if template_dir.is_dir():
+            for path in sorted(template_dir.glob("*.json")):
+                try:
+                    templates.append(FormTemplate.parse_obj(json.loads(path.read_text(encoding="utf-8"))))
+                except Exception as e:
+                    logger.warning(f"Ignoring invalid form template {path}: {e}")
+        _templates = templates
+        logger.info(f"Loaded {len(templates)} form templates from {template_dir}")
+    return _templates
+
+
+def save_template(template: FormTemplate) -> Path:
+    """Write a template to FORM_TEMPLATE_DIR and refresh the registry."""
+    template_dir = Path(FORM_TEMPLATE_DIR)
+    template_dir.mkdir(parents=True, exist_ok=True)
+    path = template_dir / f"{_normalize(template.name).replace(' ', '_')}.json"
+    path.write_text(json.dumps(template.dict(), indent=2), encoding="utf-8")
+    load_templates(reload=True)
+    return path
+
+
+# -------------------------------------------------------------------------
+# MATCHING
+# -------------------------------------------------------------------------
+def read_header(img: "Image.Image") -> List[HeaderAnchor]:
+    """OCR only the header band of a page and return its words with positions."""
+    import pytesseract
+
+    band = img.crop((0, 0, img.width, int(img.height * HEADER_BAND)))
+    data = pytesseract.image_to_data(band, output_type=pytesseract.Output.DICT)
+    words = []
+    for i, text in enumerate(data.get("text", [])):
+        if not (text or "").strip():
+            continue
+        words.append(HeaderAnchor(
+            text=text.strip(),
+            x=data["left"][i] / img.width,
+            y=data["top"][i] / img.height,
+        ))
+    return words
+
+
+def _anchors_match(template: FormTemplate, words: List[HeaderAnchor]) -> bool:
+    """Check the template's header anchors appear at the expected positions."""
+    for anchor in template.header_anchors:
+        target = _normalize(anchor.text)
+        if not any(
+            _normalize(word.text) == target
+            and abs(word.x - anchor.x) <= ANCHOR_TOLERANCE
+            and abs(word.y - anchor.y) <= ANCHOR_TOLERANCE
+            for word in words
+        ):
+            return False
+    return True
+
+
+def match_template(words: List[HeaderAnchor], templates: List[FormTemplate]) -> Optional[FormTemplate]:
+    """
+    Pick the template whose header keywords all occur in the header text and
+    whose layout fingerprint (header anchor positions) agrees. Templates with
+    more keywords win ties.
+    """
+    header_text = _normalize(" ".join(word.text for word in words))
+    candidates = [
+        template for template in templates
+        if all(_normalize(keyword) in header_text for keyword in template.header_keywords)
+        and _anchors_match(template, words)
+    ]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda t: (len(t.header_keywords), len(t.header_anchors)))
+
+
+# -------------------------------------------------------------------------
+# REGION OCR
+# -------------------------------------------------------------------------
+def _crop(img: "Image.Image", box: Box) -> "Image.Image":
+    left, top, right, bottom = box
+    return img.crop((
+        int(left * img.width),
+        int(top * img.height),
+        int(right * img.width),
+        int(bottom * img.height),
+    ))
+
+
+def _region_value(text: str, kind: str) -> Any:
+    text = text.strip()
+    if kind == "list":
+        items = [re.sub(r"^\s*(?:[-*•]|\d+[.)])\s*", "", line).strip() for line in text.splitlines()]
+        return [item for item in items if item]
+    if kind == "bool":
+        answer = _normalize(text)
+        if answer.startswith(("yes", "y ", "true")) or answer == "y":
+            return True
+        if answer.startswith(("no", "n ", "false")) or answer == "n":
+            return False
+        return None
+    return text or None
+
+
+def _set_path(data: Dict[str, Any], path: str, value: Any):
+    keys = path.split(".")
+    current = data
+    for key in keys[:-1]:
+        current = current.setdefault(key, {})
+    current[keys[-1]] = value
+
+
+def extract_regions(pages: List["Image.Image"], template: FormTemplate) -> Tuple[Dict[str, Any], str]:
+    """
+    OCR the template's field regions and build the extraction dict.
+
+    Returns:
+        (extracted, region_text) where region_text is the labelled OCR text
+        of every region, for logging and text stats.
+    """
+    import pytesseract
+
+    executor = get_ocr_executor()
+    jobs = []
+    for region in template.regions:
+        if region.page > len(pages):
+            continue
+        crop = _crop(pages[region.page - 1], region.box)
+        psm = 6 if region.kind == "list" else 7
+        future = executor.submit(pytesseract.image_to_string, crop, config=f"--psm {psm}")
+        jobs.append((region, metrics.track_task("ocr", future)))
+
+    extracted: Dict[str, Any] = {}
+    lines = []
+    for region, future in jobs:
+        text = future.result()
+        _set_path(extracted, region.field, _region_value(text, region.kind))
+        lines.append(f"{region.field}: {text.strip()}")
+    return extracted, "\n".join(lines)
+
+
+def _iter_pages(file_path: str, dpi: int = 300) -> Iterator["Image.Image"]:
+    if file_path.lower().endswith(".pdf"):
+        return iter_pdf_pages(file_path, dpi=dpi)
+    return iter_tiff_frames(file_path)
+
+
+def extract_with_form_template(file_path: str, dpi: int = 300) -> Optional[Dict[str, Any]]:
+    """
+    Try to extract a PDF/TIFF referral with a known form template.
+
+    Only the first page's header band is OCR'd for matching. Returns None
+    when templates are disabled, none are registered or none matches;
+    otherwise:
+        {
+            "template": str,
+            "extracted": dict,   # ReferralExtraction-shaped
+            "raw_text": str      # OCR text of the field regions
+        }
+    """
+    if not FORM_TEMPLATES_ENABLED:
+        return None
+    templates = load_templates()
+    if not templates:
+        return None
+
+    pages_iter = _iter_pages(file_path, dpi=dpi)
+    first_page = next(pages_iter, None)
+    if first_page is None:
+        return None
+
+    template = match_template(read_header(first_page), templates)
+    if template is None:
+        logger.info("No form template matched; using full-page OCR")
+        return None
+
+    logger.info(f"Matched form template '{template.name}'")
+    pages = [first_page] + list(itertools.islice(pages_iter, template.page_count - 1))
+    extracted, region_text = extract_regions(pages, template)
+    extracted.setdefault("document_meta", {})["pages"] = len(pages)
+    return {
+        "template": template.name,
+        "extracted": extracted,
+        "raw_text": region_text,
+    }
+
+
+# -------------------------------------------------------------------------
+# LEARNING FROM A SAMPLE
+# -------------------------------------------------------------------------
+def _find_label(page: PageOCR, label: str) -> Optional[Tuple[Any, int, int]]:
+    """Find the OCR line containing `label`; return (line, first word index, last word index)."""
+    label_words = _normalize(label).split()
+    for block in page.blocks:
+        for line in block.lines:
+            words = [_normalize(w.text) for w in line.words]
+            for start in range(len(words) - len(label_words) + 1):
+                if words[start:start + len(label_words)] == label_words:
+                    return line, start, start + len(label_words) - 1
+    return None
+
+
+def learn_template(
+    name: str,
+    ocr_doc: OCRDocument,
+    labels: Dict[str, str],
+    header_keywords: List[str],
+) -> FormTemplate:
+    """
+    Build a template from the OCR boxes of a filled sample (ocr.pdf_to_ocr).
+
+    Each value region spans from just right of its label to the next label on
+    the same line (or the right margin), one line high. Header anchors record
+    where the header keywords sit on page 1, as the layout fingerprint.
+    """
+    hits = []
+    for label, field in labels.items():
+        for page in ocr_doc.pages:
+            hit = _find_label(page, label)
+            if hit:
+                hits.append((page, field) + hit)
+                break
+        else:
+            logger.warning(f"Label '{label}' not found in sample; skipping")
+
+    # Left edge of every label, per line, to bound the value regions
+    label_lefts: Dict[int, List[float]] = {}
+    for page, _, line, first, _ in hits:
+        label_lefts.setdefault(id(line), []).append(line.words[first].left / page.width)
+
+    regions = []
+    for page, field, line, _, last in hits:
+        last_word = line.words[last]
+        left = (last_word.left + last_word.width) / page.width + 0.005
+        next_lefts = [x for x in label_lefts[id(line)] if x > left]
+        right = min(next_lefts) - 0.005 if next_lefts else 0.97
+        top = (last_word.top - 0.25 * last_word.height) / page.height
+        bottom = (last_word.top + 1.25 * last_word.height) / page.height
+        regions.append(FieldRegion(
+            field=field,
+            page=page.page_number,
+            box=(round(left, 4), round(max(0.0, top), 4), round(right, 4), round(min(1.0, bottom), 4)),
+        ))
+
+    anchors = []
+    first_page = ocr_doc.pages[0]
+    keyword_words = {w for keyword in header_keywords for w in _normalize(keyword).split()}
+    for block in first_page.blocks:
+        for line in block.lines:
+            for word in line.words:
+                if word.top / first_page.height > HEADER_BAND:
+                    continue
+                if _normalize(word.text) in keyword_words:
+                    anchors.append(HeaderAnchor(
+                        text=word.text,
+                        x=round(word.left / first_page.width, 4),
+                        y=round(word.top / first_page.height, 4),
+                    ))
+                    keyword_words.discard(_normalize(word.text))
+
+    return FormTemplate(name=name, header_keywords=header_keywords, header_anchors=anchors, regions=regions)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Manage referral form templates")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    learn = sub.add_parser("learn", help="Learn a template from a filled sample PDF")
+    learn.add_argument("name")
+    learn.add_argument("sample")
+    learn.add_argument("--header", action="append", required=True, help="Header text identifying the form")
+    learn.add_argument("--label", action="append", required=True, help='"Label text=field.path"')
+    sub.add_parser("list", help="List registered templates")
+
+    args = parser.parse_args(argv)
+    if args.command == "list":
+        for template in load_templates():
+            print(f"{template.name}: {len(template.regions)} regions, header={template.header_keywords}")
+        return
+
+    from .ocr import pdf_to_ocr
+    labels = dict(item.split("=", 1) for item in args.label)
+    ocr_doc = pdf_to_ocr(args.sample)
+    template = learn_template(args.name, ocr_doc, labels, args.header)
+    path = save_template(template)
+    print(f"Saved template '{template.name}' with {len(template.regions)} regions to {path}")
+
+
+if __name__ == "__main__":
+    main()
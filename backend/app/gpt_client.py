@@ -1,19 +1,42 @@
 # app/gpt_client.py (updated version)
-import json
-import re
-from typing import Any, Dict
+import time
+from typing import Any, Callable, Dict, Optional
 from .config import (
     AZURE_OPENAI_ENDPOINT,
     AZURE_OPENAI_API_KEY,
     AZURE_OPENAI_DEPLOYMENT,
     AZURE_OPENAI_API_VERSION,
+    LLM_JSON_MODE,
+    LLM_MODE,
+    LLM_RESUME_TRUNCATED,
+    LLM_STREAM,
+    LLM_STUB_LATENCY_MS,
 )
-from .json_schema import JSON_SCHEMA
+from .json_schema import schema_text
+from .json_stream import JSONStream
+from .schemas import field_error
+from . import metrics
+from .tracing import tracer
+from app.log import logger
+
+SKIP_MODE = LLM_MODE == "stub"
+# Token usage in streamed responses (stream_options) needs api-version 2024-09-01 or later
+STREAM_USAGE = AZURE_OPENAI_API_VERSION[:10] >= "2024-09-01"
+
+
+def _record_usage(span, prompt_tokens: int, completion_tokens: int):
+    metrics.LLM_TOKENS.labels(kind="prompt").inc(prompt_tokens or 0)
+    metrics.LLM_TOKENS.labels(kind="completion").inc(completion_tokens or 0)
+    span.set_attribute("gen_ai.usage.input_tokens", prompt_tokens or 0)
+    span.set_attribute("gen_ai.usage.output_tokens", completion_tokens or 0)
 
-SKIP_MODE = AZURE_OPENAI_API_KEY.lower() == "skip"
 
 if SKIP_MODE:
-    def extract_referral_from_text(raw_text: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+    def extract_referral_from_text(raw_text: str, schema: Dict[str, Any],
+                                   report: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        # Deterministic stand-in for the Azure call; same output for any input
+        if LLM_STUB_LATENCY_MS > 0:
+            time.sleep(LLM_STUB_LATENCY_MS / 1000)
         return {
             "document_meta": {"title": "Unknown (stub)", "date": None, "pages": 1},
             "referral": {},
@@ -29,70 +52,151 @@ if SKIP_MODE:
             "position": None,
             "file_number": None
         }
+elif LLM_MODE == "replay":
+    from . import llm_fixtures
+
+    def call_azure(system_prompt: str, user_prompt: str, max_tokens: int = 2000, temperature: float = 0.0,
+                   on_delta: Optional[Callable[[str], None]] = None) -> str:
+        """Return the recorded response for this request (see app/llm_fixtures.py)."""
+        key = llm_fixtures.call_key(system_prompt, user_prompt, max_tokens, temperature)
+        with tracer.start_as_current_span("call_azure", attributes={
+            "gen_ai.system": "replay",
+            "llm.fixture": key,
+        }) as span:
+            fixture = llm_fixtures.load_fixture(key)
+            try:
+                if on_delta is not None and LLM_STREAM:
+                    for chunk in llm_fixtures.stream_response(fixture):
+                        on_delta(chunk)
+                else:
+                    llm_fixtures.simulate_call(fixture)
+                    if on_delta is not None:
+                        on_delta(fixture["response"])
+            except llm_fixtures.InjectedFailure:
+                metrics.ERRORS.labels(stage="call_azure").inc()
+                raise
+            usage = fixture.get("usage") or {}
+            _record_usage(span, usage.get("prompt_tokens"), usage.get("completion_tokens"))
+        return fixture["response"]
 else:
-    try:
-        from openai import AzureOpenAI
-        from openai import OpenAIError
-    except Exception as e:
-        raise RuntimeError("openai package required") from e
+    if LLM_MODE == "record":
+        from . import llm_fixtures
 
-    client = AzureOpenAI(
-        azure_endpoint=AZURE_OPENAI_ENDPOINT,
-        api_key=AZURE_OPENAI_API_KEY,
-        api_version=AZURE_OPENAI_API_VERSION,
-    )
+    # The openai SDK takes most of a second to import; it is loaded with the
+    # client on the first call (or by the "llm" warm-up, see app/warmup.py)
+    _client = None
 
-    def call_azure(system_prompt: str, user_prompt: str, max_tokens: int = 2000, temperature: float = 0.0) -> str:
-        """Call Azure OpenAI with system and user prompts."""
-        try:
-            resp = client.chat.completions.create(
-                model=AZURE_OPENAI_DEPLOYMENT,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                max_tokens=max_tokens,
-                temperature=temperature,
+    def get_client():
+        """Get or create the Azure OpenAI client."""
+        global _client
+        if _client is None:
+            try:
+                from openai import AzureOpenAI
+            except Exception as e:
+                raise RuntimeError("openai package required") from e
+            _client = AzureOpenAI(
+                azure_endpoint=AZURE_OPENAI_ENDPOINT,
+                api_key=AZURE_OPENAI_API_KEY,
+                api_version=AZURE_OPENAI_API_VERSION,
             )
-        except OpenAIError as e:
-            raise RuntimeError(f"Azure OpenAI request failed: {e}")
-        
-        try:
-            content = resp.choices[0].message.content
-        except Exception as e:
-            raise RuntimeError(f"Unexpected Azure response: {e}")
-        
-        return content
+        return _client
 
-    def parse_json_output(raw: str) -> Any:
-        """Extract and parse JSON from LLM response."""
-        raw = raw.strip()
-        
-        # Try direct parsing
-        try:
-            return json.loads(raw)
-        except Exception:
-            pass
-        
-        # Try extracting JSON object
-        m = re.search(r"\{(?:.|\n)*\}", raw)
-        if m:
+    def call_azure(system_prompt: str, user_prompt: str, max_tokens: int = 2000, temperature: float = 0.0,
+                   on_delta: Optional[Callable[[str], None]] = None) -> str:
+        """
+        Call Azure OpenAI with system and user prompts.
+
+        In JSON mode the model is held to a single JSON object. With
+        `on_delta`, the response is streamed (LLM_STREAM) and each piece of
+        content is passed to it as it arrives; the full content is returned
+        either way.
+        """
+        client = get_client()
+        from openai import OpenAIError
+
+        stream = LLM_STREAM and on_delta is not None
+        options: Dict[str, Any] = {}
+        if LLM_JSON_MODE:
+            options["response_format"] = {"type": "json_object"}
+        if stream:
+            options["stream"] = True
+            if STREAM_USAGE:
+                options["stream_options"] = {"include_usage": True}
+
+        start = time.perf_counter()
+        with tracer.start_as_current_span("call_azure", attributes={
+            "gen_ai.system": "az.ai.openai",
+            "gen_ai.request.model": AZURE_OPENAI_DEPLOYMENT,
+            "gen_ai.request.max_tokens": max_tokens,
+            "llm.stream": stream,
+        }) as span:
             try:
-                return json.loads(m.group(0))
-            except Exception:
-                pass
+                resp = client.chat.completions.create(
+                    model=AZURE_OPENAI_DEPLOYMENT,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt},
+                    ],
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    **options,
+                )
+                if stream:
+                    parts, usage = [], None
+                    for event in resp:
+                        usage = getattr(event, "usage", None) or usage
+                        # Azure leads with a chunk without choices (content filter results)
+                        for choice in event.choices:
+                            delta = choice.delta.content if choice.delta else None
+                            if delta:
+                                parts.append(delta)
+                                on_delta(delta)
+                    content = "".join(parts)
+                else:
+                    usage = getattr(resp, "usage", None)
+            except OpenAIError as e:
+                metrics.ERRORS.labels(stage="call_azure").inc()
+                raise RuntimeError(f"Azure OpenAI request failed: {e}")
+            
+            if usage is not None:
+                _record_usage(span, usage.prompt_tokens, usage.completion_tokens)
         
-        # Try extracting JSON array
-        m = re.search(r"\[(?:.|\n)*\]", raw)
-        if m:
+        if not stream:
             try:
-                return json.loads(m.group(0))
-            except Exception:
-                pass
+                content = resp.choices[0].message.content
+            except Exception as e:
+                raise RuntimeError(f"Unexpected Azure response: {e}")
+            if on_delta is not None:
+                on_delta(content)
         
-        raise ValueError(f"Could not parse JSON from model output. Raw: {raw[:500]}")
+        if LLM_MODE == "record":
+            llm_fixtures.record(
+                system_prompt, user_prompt, max_tokens, temperature, content,
+                {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens} if usage else None,
+                (time.perf_counter() - start) * 1000,
+            )
+        
+        return content
+
+if not SKIP_MODE:
+    class FieldCheck:
+        """JSONStream on_field: validates each top-level field as it arrives and times the first."""
+
+        def __init__(self):
+            self.start = time.perf_counter()
+            self.first_field_s: Optional[float] = None
 
-    def extract_referral_from_text(raw_text: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+        def __call__(self, name: str, value: Any):
+            if self.first_field_s is None:
+                self.first_field_s = time.perf_counter() - self.start
+                metrics.LLM_FIRST_FIELD_SECONDS.observe(self.first_field_s)
+            error = field_error(name, value)
+            if error:
+                metrics.LLM_INVALID_FIELDS.labels(field=name).inc()
+                logger.warning(f"LLM field {name!r} failed validation on arrival: {error}")
+
+    def extract_referral_from_text(raw_text: str, schema: Dict[str, Any],
+                                   report: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Extract medical referral information from raw text using LLM.
         
@@ -100,6 +204,10 @@ else:
         1. Takes ANY text (from PDF, image, Word, etc.)
         2. Asks LLM to intelligently extract medical referral data
         3. Returns structured JSON matching the schema
+
+        If the answer was cut off, `report` (when given) gets "llm_truncated":
+        how it was completed and the schema fields still missing. Raises
+        ValueError if nothing of a cut-off answer could be recovered.
         """
         
         system_prompt = """You are a medical document analysis expert specialized in extracting referral information.
@@ -124,22 +232,58 @@ Medical referral documents typically contain:
 - Contact information for both facilities
 """
 
-        user_prompt = f"""Analyze this document and extract medical referral information according to the schema below.
+        def build_user_prompt(schema: Dict[str, Any]) -> str:
+            return f"""Analyze this document and extract medical referral information according to the schema below.
 
 SCHEMA:
-{json.dumps(schema, indent=2)}
+{schema_text(schema)}
 
 DOCUMENT TEXT:
 {raw_text[:8000]}  # Limit to avoid token overflow
 
 Return ONLY the JSON output, no explanations."""
 
-        # Call LLM
-        raw_response = call_azure(system_prompt, user_prompt, max_tokens=2000, temperature=0.0)
-        
-        # Parse JSON
-        parsed = parse_json_output(raw_response)
-        
+        # Call LLM, parsing and validating fields as they stream in
+        check = FieldCheck()
+        stream = JSONStream(on_field=check)
+        raw_response = call_azure(system_prompt, build_user_prompt(schema), max_tokens=2000, temperature=0.0,
+                                  on_delta=stream.feed)
+        try:
+            parsed = stream.close()
+        except ValueError:
+            raise ValueError(f"Could not parse JSON from model output. Raw: {raw_response[:500]}")
+        if stream.dropped:
+            logger.warning(f"Dropped {len(stream.dropped)} malformed field(s) from LLM output: {stream.dropped}")
+
+        if stream.truncated:
+            missing = {name: prop for name, prop in schema.get("properties", {}).items() if name not in stream.fields}
+            outcome = "repaired"
+            if missing and LLM_RESUME_TRUNCATED:
+                # Ask again for what is missing only (the field being written included)
+                rest_schema = {**schema, "properties": missing}
+                if "required" in schema:
+                    rest_schema["required"] = [name for name in schema["required"] if name in missing]
+                rest = JSONStream(on_field=check)
+                try:
+                    call_azure(system_prompt, build_user_prompt(rest_schema), max_tokens=2000, temperature=0.0,
+                               on_delta=rest.feed)
+                    parsed.update(rest.close())
+                    outcome = "resumed"
+                except (RuntimeError, ValueError) as e:
+                    logger.warning(f"Could not resume truncated LLM output: {e}")
+            still_missing = sorted(set(missing) - set(parsed))
+            if not parsed:
+                outcome = "failed"
+            metrics.LLM_TRUNCATED.labels(outcome=outcome).inc()
+            logger.warning(
+                f"LLM output truncated after {len(stream.fields)} complete field(s); "
+                f"{outcome}, missing {still_missing}"
+            )
+            if not parsed:
+                raise ValueError(f"LLM output truncated before any field was complete. Raw: {raw_response[:500]}")
+            if report is not None:
+                report["llm_truncated"] = {"outcome": outcome, "missing_fields": still_missing}
+
         return parsed
 
 
@@ -1,70 +1,69 @@
 # app/json_schema.py
-# JSON Schema used to instruct the LLM. Keep in sync with pydantic models above.
+"""
+JSON Schema used to instruct the LLM, generated from the pydantic models.
 
-JSON_SCHEMA = {
-  "type": "object",
-  "properties": {
-    "document_meta": {
-      "type": "object",
-      "properties": {
-        "title": {"type": ["string", "null"]},
-        "date": {"type": ["string", "null"], "format": "date"},
-        "pages": {"type": ["integer", "null"]}
-      },
-      "required": ["title"]
-    },
-    "referral": {
-      "type": "object",
-      "properties": {
-        "referral_to": {"type": ["string", "null"]},
-        "referral_focal_point": {"type": ["string", "null"]},
-        "referral_phone": {"type": ["string", "null"]},
-        "referral_location": {"type": ["string", "null"]},
-        "referral_email": {"type": ["string", "null"]},
-        "referring_from": {"type": ["string", "null"]},
-        "referring_focal_point": {"type": ["string", "null"]},
-        "referring_phone": {"type": ["string", "null"]},
-        "referring_location": {"type": ["string", "null"]},
-        "referring_email": {"type": ["string", "null"]}
-      }
-    },
-    "patient": {
-      "type": "object",
-      "properties": {
-        "full_name": {"type": ["string", "null"]},
-        "phone": {"type": ["string", "null"]},
-        "date_of_birth": {"type": ["string", "null"], "format": "date"},
-        "gender": {"type": ["string", "null"]},
-        "address": {"type": ["string", "null"]},
-        "accompanied_by_care_provider": {"type": ["boolean", "null"]}
-      }
-    },
-    "diagnoses": {
-      "type": "object",
-      "properties": {
-        "primary_diagnoses": {"type": "array", "items": {"type": "string"}},
-        "other_diagnoses": {"type": "array", "items": {"type": "string"}}
-      }
-    },
-    "treatments": {"type": "array", "items": {"type": "string"}},
-    "reason_for_referral": {"type": ["string", "null"]},
-    "transportation_needs": {"type": "array", "items": {"type": "string"}},
-    "follow_up_requirements": {"type": "array", "items": {"type": "string"}},
-    "functional_status": {
-      "type": "object",
-      "properties": {
-        "mobility": {"type": ["string", "null"]},
-        "precautions": {"type": ["string", "null"]},
-        "self_care": {"type": ["string", "null"]},
-        "cognitive_impairment": {"type": ["string", "null"]},
-        "assistive_devices_provided": {"type": "array", "items": {"type": "string"}},
-        "assistive_devices_required": {"type": "array", "items": {"type": "string"}}
-      }
-    },
-    "compiled_by": {"type": ["string", "null"]},
-    "signature": {"type": ["string", "null"]},
-    "position": {"type": ["string", "null"]},
-    "file_number": {"type": ["string", "null"]}
-  },
-  "required": ["document_meta", "referral", "patient"]
-}
+ReferralExtraction (app/schemas.py) is the single definition of the output:
+its JSON Schema is generated once when this module is imported, reduced to
+what the model needs (references inlined; titles, defaults and the model
+docstring dropped; Optional[X] written as {"type": [X, "null"]}, except
+for fields defaulting to a list or object, which the model should return
+empty instead of null) and minified for the prompt.
+
+SCHEMA_VERSION is a short hash of the minified schema. It changes exactly
+when the schema the LLM sees changes, so every cache keyed on LLM output
+includes it (LLM fixture keys, see app/llm_fixtures.py) and /upload
+reports it with each result.
+"""
+import hashlib
+import json
+from typing import Any, Dict
+
+from .schemas import ReferralExtraction
+
+_DROP_KEYS = {"title", "default"}
+
+
+def _llm_schema(node: Any, defs: Dict[str, Any]) -> Any:
+    if isinstance(node, list):
+        return [_llm_schema(item, defs) for item in node]
+    if not isinstance(node, dict):
+        return node
+    if "$ref" in node:
+        return _llm_schema(defs[node["$ref"].rsplit("/", 1)[-1]], defs)
+
+    out = {}
+    any_of = node.get("anyOf")
+    if any_of and {"type": "null"} in any_of and len(any_of) == 2:
+        # Optional[X]: X, nullable only when the field defaults to None
+        inner = _llm_schema(next(s for s in any_of if s != {"type": "null"}), defs)
+        out.update(inner)
+        if node.get("default", None) is None:
+            out["type"] = [inner["type"], "null"]
+    for key, value in node.items():
+        if key in _DROP_KEYS or key == "anyOf" and "type" in out:
+            continue
+        if key == "properties":
+            out[key] = {name: _llm_schema(prop, defs) for name, prop in value.items()}
+        else:
+            out[key] = _llm_schema(value, defs)
+    return out
+
+
+def build_llm_schema(model=ReferralExtraction) -> Dict[str, Any]:
+    schema = model.model_json_schema()
+    defs = schema.pop("$defs", {})
+    schema.pop("description", None)
+    return _llm_schema(schema, defs)
+
+
+JSON_SCHEMA: Dict[str, Any] = build_llm_schema()
+# What goes into the prompt, once per process instead of once per call
+JSON_SCHEMA_TEXT = json.dumps(JSON_SCHEMA, separators=(",", ":"), ensure_ascii=False)
+SCHEMA_VERSION = hashlib.sha256(JSON_SCHEMA_TEXT.encode("utf-8")).hexdigest()[:12]
+
+
+def schema_text(schema: Dict[str, Any]) -> str:
+    """Minified `schema` for a prompt (precomputed for JSON_SCHEMA)."""
+    if schema is JSON_SCHEMA:
+        return JSON_SCHEMA_TEXT
+    return json.dumps(schema, separators=(",", ":"), ensure_ascii=False)
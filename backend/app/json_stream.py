@@ -0,0 +1,215 @@
+# app/json_stream.py
+"""
+Incremental parsing of the LLM's JSON answer.
+
+The answer used to be parsed once complete: json.loads, then a greedy
+regex for the outermost {...} (an alternation per character that runs to
+the end of the text and backtracks to the last "}", slow on long output),
+then one for [...]. A response cut off at max_tokens failed the upload.
+
+JSONStream is fed the response while it streams in and looks at each
+character once:
+
+- text before the first "{" (a ```json fence, a sentence) and after the
+  root object closes is skipped;
+- each top-level member ("patient": {...}) is decoded as soon as its value
+  ends and passed to `on_field`, so fields can be validated while the rest
+  is still being generated;
+- it keeps the last position where the text is a valid prefix ending in a
+  complete value, so a truncated answer can be repaired: the unfinished
+  tail (half a string or number, a key without its value) is dropped and
+  the open objects and arrays are closed.
+
+parse_json_output(raw) is the one-shot form for a complete response.
+"""
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+# Inside a string: the next quote or escape
+_STRING_SPECIAL = re.compile(r'["\\]')
+# After a number / true / false / null: where it ends
+_SCALAR_END = re.compile(r'[\s,\]}]')
+_WHITESPACE = " \t\r\n"
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class JSONStream:
+    """Parser for one JSON object arriving in chunks (see module docstring)."""
+
+    def __init__(self, on_field: Optional[Callable[[str, Any], None]] = None):
+        self.on_field = on_field
+        # Complete top-level members, in the order they arrived
+        self.fields: Dict[str, Any] = {}
+        # Top-level members that were complete but not valid JSON
+        self.dropped: List[str] = []
+        self.started = False
+        self.complete = False
+        self.truncated = False
+        self.length = 0
+        # Text not yet decoded: starts at absolute offset self._base
+        self._chunks: List[str] = []
+        self._base = 0
+        self._stack: List[str] = []
+        self._expect_key = False
+        self._in_string = False
+        self._string_is_key = False
+        self._escape = False
+        self._in_scalar = False
+        self._member_start: Optional[int] = None
+        # Last repairable prefix: end offset and the containers open there
+        self._safe = 0
+        self._safe_stack = ""
+
+    # -------------------------
+    # Scanning
+    # -------------------------
+    def feed(self, chunk: str):
+        if not chunk or self.complete:
+            return
+        offset = self.length
+        self.length += len(chunk)
+        if not self.started:
+            start = chunk.find("{")
+            if start == -1:
+                return
+            self.started = True
+            self._base = offset + start
+            chunk, offset = chunk[start:], offset + start
+        self._chunks.append(chunk)
+        self._scan(chunk, offset)
+
+    def _scan(self, s: str, offset: int):
+        i, n = 0, len(s)
+        if self._escape:
+            self._escape = False
+            i = 1
+        while i < n:
+            if self._in_string:
+                m = _STRING_SPECIAL.search(s, i)
+                if m is None:
+                    return
+                j = m.end()
+                if s[m.start()] == "\\":
+                    if j == n:
+                        self._escape = True
+                        return
+                    i = j + 1
+                    continue
+                self._in_string = False
+                i = j
+                if not self._string_is_key:
+                    self._value_end(offset + i)
+                continue
+            if self._in_scalar:
+                m = _SCALAR_END.search(s, i)
+                if m is None:
+                    return
+                self._in_scalar = False
+                i = m.start()
+                self._value_end(offset + i)
+                continue
+
+            c = s[i]
+            if c in _WHITESPACE:
+                pass
+            elif c == '"':
+                self._in_string = True
+                self._string_is_key = self._expect_key and self._stack[-1] == "{"
+                if self._string_is_key and len(self._stack) == 1:
+                    self._member_start = offset + i
+            elif c == "{" or c == "[":
+                self._stack.append(c)
+                self._expect_key = c == "{"
+                self._mark_safe(offset + i + 1)
+            elif c == "}" or c == "]":
+                if self._stack:
+                    self._stack.pop()
+                self._value_end(offset + i + 1)
+                if self.complete:
+                    return
+            elif c == ":":
+                self._expect_key = False
+            elif c == ",":
+                self._expect_key = bool(self._stack) and self._stack[-1] == "{"
+            else:
+                self._in_scalar = True
+            i += 1
+
+    def _mark_safe(self, end: int):
+        self._safe = end
+        self._safe_stack = "".join(self._stack)
+
+    def _value_end(self, end: int):
+        depth = len(self._stack)
+        if depth == 0:
+            self.complete = True
+            self._chunks = []
+        elif depth == 1 and self._member_start is not None:
+            self._decode_member(end)
+        else:
+            self._mark_safe(end)
+
+    def _text(self, start: int, end: int) -> str:
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0][start - self._base:end - self._base]
+
+    def _decode_member(self, end: int):
+        text = self._text(self._member_start, end)
+        try:
+            member = json.loads("{" + text + "}")
+        except ValueError:
+            self.dropped.append(text[:80])
+        else:
+            for name, value in member.items():
+                self.fields[name] = value
+                if self.on_field is not None:
+                    self.on_field(name, value)
+        # Decoded text is not needed again
+        self._chunks = [self._chunks[0][end - self._base:]]
+        self._base = end
+        self._member_start = None
+        self._mark_safe(end)
+
+    # -------------------------
+    # Result
+    # -------------------------
+    def close(self) -> Dict[str, Any]:
+        """The parsed object, repaired if the text ended before it closed.
+
+        Raises ValueError if the text held no JSON object at all.
+        """
+        if not self.started:
+            raise ValueError("No JSON object in model output")
+        if self.complete:
+            return dict(self.fields)
+        self.truncated = True
+        result = dict(self.fields)
+        if self._member_start is not None and self._safe > self._member_start:
+            closers = "".join(_CLOSERS[c] for c in reversed(self._safe_stack[1:]))
+            try:
+                result.update(json.loads("{" + self._text(self._member_start, self._safe) + closers + "}"))
+            except ValueError:
+                pass
+        return result
+
+
+def parse_json_output(raw: str) -> Dict[str, Any]:
+    """Parse the JSON object in a complete LLM response (see JSONStream)."""
+    # A complete object, possibly fenced or wrapped in prose: one linear slice
+    start, end = raw.find("{"), raw.rfind("}")
+    if 0 <= start < end:
+        try:
+            value = json.loads(raw[start:end + 1])
+        except ValueError:
+            pass
+        else:
+            if isinstance(value, dict):
+                return value
+    stream = JSONStream()
+    stream.feed(raw)
+    try:
+        return stream.close()
+    except ValueError:
+        raise ValueError(f"Could not parse JSON from model output. Raw: {raw[:500]}")
@@ -0,0 +1,274 @@
+# app/llm_fixtures.py
+"""
+Recorded LLM responses: captured from Azure OpenAI (LLM_MODE=record) and
+replayed in place of it (LLM_MODE=replay), so benchmarks and CI exercise the
+real parsing and validation paths without network.
+
+A fixture is one JSON file in LLM_FIXTURE_DIR named after the request key,
+the SHA-256 of the request: model, LLM schema version, max_tokens,
+temperature, the response format when JSON mode is on (see LLM_JSON_MODE),
+and what the answer was asked about. With LLM_FIXTURE_KEY=document (the
+default) that is the uploaded document, by content hash (set per upload
+with set_document), and the number of the call for it (a truncated answer
+is resumed with a second call). The same recording then replays for every
+pipeline configuration, whatever text OCR produced. With
+LLM_FIXTURE_KEY=prompt, or for a call made outside an upload, it is the
+system and user prompt:
+
+    {
+      "key": "<sha256>",
+      "label": "referral_01.txt",        # optional: what the prompt was built from
+      "response": "<message content>",   # as the model returned it, PHI scrubbed
+      "usage": {"prompt_tokens": 1234, "completion_tokens": 456},
+      "latency_ms": 2310.4,              # measured when recording
+      "schema_version": "5f3d72977846",  # app/json_schema.py SCHEMA_VERSION
+      "scrubbed": 12,                    # values replaced by placeholders
+      "seeded": true                     # written from a golden file, not by a model
+    }
+
+A change to the schema or the document (or, keyed by prompt, to any
+prompt text) changes the key, so a replayed run never silently reuses a
+response recorded for different input; it fails with FixtureNotFound
+instead. Prompts themselves are never written to disk, only their hash.
+
+Recording replaces PHI in the response (patient and contact names, phone
+numbers, e-mail addresses, addresses, dates, file numbers) with stable
+placeholders such as [NAME-3fa2c1], unless LLM_RECORD_SCRUB_PHI=false (for
+synthetic documents whose values should be scored against golden output).
+
+Replay can add latency (LLM_REPLAY_LATENCY: milliseconds, or "recorded")
+and fail a share of calls (LLM_REPLAY_FAILURE_RATE) the way a failed Azure
+request does, reproducibly with LLM_REPLAY_SEED. A streamed replay
+(stream_response) yields the response in token-sized chunks with that
+latency spread over them, so incremental parsing sees what it would live.
+"""
+import contextvars
+import hashlib
+import json
+import math
+import random
+import re
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from .json_schema import SCHEMA_VERSION
+from .config import (
+    AZURE_OPENAI_DEPLOYMENT,
+    LLM_FIXTURE_DIR,
+    LLM_FIXTURE_KEY,
+    LLM_JSON_MODE,
+    LLM_RECORD_SCRUB_PHI,
+    LLM_REPLAY_FAILURE_RATE,
+    LLM_REPLAY_LATENCY,
+    LLM_REPLAY_SEED,
+)
+from app.log import logger
+
+
+class FixtureNotFound(RuntimeError):
+    """No recorded response for this request."""
+
+
+class InjectedFailure(RuntimeError):
+    """A replayed call failed on purpose (LLM_REPLAY_FAILURE_RATE)."""
+
+
+# response_format of requests made in JSON mode
+JSON_RESPONSE_FORMAT = "json_object"
+
+
+def request_key(system_prompt: str, user_prompt: str, max_tokens: int, temperature: float,
+                model: str = AZURE_OPENAI_DEPLOYMENT, schema_version: str = SCHEMA_VERSION,
+                response_format: Optional[str] = JSON_RESPONSE_FORMAT if LLM_JSON_MODE else None) -> str:
+    """Stable hash of everything that determines the model's answer."""
+    request = [model or "", schema_version, system_prompt, user_prompt, max_tokens, temperature]
+    if response_format:
+        request.append(response_format)
+    payload = json.dumps(request, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# [content SHA-256, calls made] of the upload being extracted in this context
+_document: "contextvars.ContextVar[Optional[list]]" = contextvars.ContextVar("llm_fixture_document", default=None)
+
+
+def set_document(content_sha256: Optional[str]):
+    """Key this context's following LLM calls on the uploaded document."""
+    _document.set([content_sha256, 0] if content_sha256 else None)
+
+
+def call_key(system_prompt: str, user_prompt: str, max_tokens: int, temperature: float) -> str:
+    """Key of the LLM call being made now (see LLM_FIXTURE_KEY); call once per call."""
+    slot = _document.get()
+    if LLM_FIXTURE_KEY != "document" or slot is None:
+        return request_key(system_prompt, user_prompt, max_tokens, temperature)
+    slot[1] += 1
+    return request_key("", f"document:{slot[0]}#{slot[1]}", max_tokens, temperature)
+
+
+def fixture_path(key: str, fixture_dir: Optional[Path] = None) -> Path:
+    return Path(fixture_dir or LLM_FIXTURE_DIR) / f"{key}.json"
+
+
+def load_fixture(key: str, fixture_dir: Optional[Path] = None) -> Dict[str, Any]:
+    path = fixture_path(key, fixture_dir)
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise FixtureNotFound(
+            f"No recorded LLM response for request {key} (schema {SCHEMA_VERSION}) in {path.parent}"
+        )
+
+
+def save_fixture(key: str, response: str, usage: Optional[Dict[str, int]] = None,
+                 label: Optional[str] = None, fixture_dir: Optional[Path] = None,
+                 **extra: Any) -> Path:
+    path = fixture_path(key, fixture_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fixture = {"key": key, "label": label, "response": response, "usage": usage or {}, **extra}
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(fixture, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    tmp_path.replace(path)
+    return path
+
+
+# -------------------------
+# Recording
+# -------------------------
+# Response fields holding PHI, by placeholder kind
+PHI_FIELDS = {
+    ("patient", "full_name"): "name",
+    ("patient", "phone"): "phone",
+    ("patient", "date_of_birth"): "date",
+    ("patient", "address"): "address",
+    ("referral", "referral_focal_point"): "name",
+    ("referral", "referring_focal_point"): "name",
+    ("referral", "referral_phone"): "phone",
+    ("referral", "referring_phone"): "phone",
+    ("referral", "referral_email"): "email",
+    ("referral", "referring_email"): "email",
+    ("compiled_by",): "name",
+    ("signature",): "name",
+    ("file_number",): "id",
+}
+# Anything of these shapes anywhere in the response
+PHI_PATTERNS = (
+    ("email", re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")),
+    ("date", re.compile(r"\b\d{4}-\d{2}-\d{2}\b|\b\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}\b")),
+    ("phone", re.compile(r"\+?\d[\d\s().-]{7,}\d")),
+)
+MIN_SUBSTRING_SCRUB = 4
+
+
+def _placeholder(kind: str, value: str) -> str:
+    return f"[{kind.upper()}-{hashlib.sha256(value.encode('utf-8')).hexdigest()[:6]}]"
+
+
+def _response_json(response: str) -> Optional[Dict[str, Any]]:
+    start, end = response.find("{"), response.rfind("}")
+    if start == -1 or end <= start:
+        return None
+    try:
+        data = json.loads(response[start:end + 1])
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def scrub_phi(response: str) -> Tuple[str, int]:
+    """Replace PHI in a raw model response with stable placeholders.
+
+    Works on the raw text (fences, spacing and key order are kept), so a
+    replayed response goes through the same parsing as the original.
+    Returns the scrubbed text and the number of distinct values replaced.
+    """
+    replacements: Dict[str, str] = {}
+    data = _response_json(response)
+    if data is not None:
+        for path, kind in PHI_FIELDS.items():
+            value: Any = data
+            for key in path:
+                value = value.get(key) if isinstance(value, dict) else None
+            if isinstance(value, str) and value.strip():
+                replacements[value] = _placeholder(kind, value)
+    for kind, pattern in PHI_PATTERNS:
+        for match in pattern.findall(response):
+            replacements.setdefault(match, _placeholder(kind, match))
+
+    # Longest first, so a value is not broken up by a shorter one inside it.
+    # Very short values (a file number like "7") only as whole JSON strings.
+    for value in sorted(replacements, key=len, reverse=True):
+        encoded = json.dumps(value, ensure_ascii=False)
+        if len(value) < MIN_SUBSTRING_SCRUB:
+            response = response.replace(encoded, f'"{replacements[value]}"')
+        else:
+            for form in {value, encoded[1:-1]}:
+                response = response.replace(form, replacements[value])
+    return response, len(replacements)
+
+
+def record(system_prompt: str, user_prompt: str, max_tokens: int, temperature: float,
+           response: str, usage: Optional[Dict[str, int]], latency_ms: float) -> Optional[Path]:
+    """Save a live response as a fixture (LLM_MODE=record); never fails the call."""
+    key = call_key(system_prompt, user_prompt, max_tokens, temperature)
+    try:
+        scrubbed = 0
+        if LLM_RECORD_SCRUB_PHI:
+            response, scrubbed = scrub_phi(response)
+        path = save_fixture(
+            key, response, usage,
+            model=AZURE_OPENAI_DEPLOYMENT,
+            schema_version=SCHEMA_VERSION,
+            latency_ms=round(latency_ms, 1),
+            scrubbed=scrubbed,
+            recorded_at=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        )
+    except Exception as e:
+        logger.warning(f"Failed to record LLM fixture {key}: {e}")
+        return None
+    logger.info(f"Recorded LLM fixture {key} ({scrubbed} values scrubbed)")
+    return path
+
+
+# -------------------------
+# Replay
+# -------------------------
+_rng = random.Random(LLM_REPLAY_SEED)
+# Characters per streamed chunk, about one token
+STREAM_CHUNK_CHARS = 4
+
+
+def replay_delay(fixture: Dict[str, Any]) -> float:
+    """Seconds a replayed call should take."""
+    if LLM_REPLAY_LATENCY == "recorded":
+        return (fixture.get("latency_ms") or 0) / 1000
+    return float(LLM_REPLAY_LATENCY or 0) / 1000
+
+
+def simulate_call(fixture: Dict[str, Any]):
+    """Apply the configured replay latency, then fail the call if it is drawn to."""
+    delay = replay_delay(fixture)
+    if delay > 0:
+        time.sleep(delay)
+    if LLM_REPLAY_FAILURE_RATE > 0 and _rng.random() < LLM_REPLAY_FAILURE_RATE:
+        raise InjectedFailure(f"Azure OpenAI request failed: injected failure (fixture {fixture.get('key')})")
+
+
+def stream_response(fixture: Dict[str, Any], chunk_chars: int = STREAM_CHUNK_CHARS) -> Iterator[str]:
+    """The response in chunks, as a streamed call delivers it.
+
+    Fails up front when drawn to (like simulate_call); the replay latency is
+    spread evenly over the chunks.
+    """
+    response = fixture["response"]
+    if LLM_REPLAY_FAILURE_RATE > 0 and _rng.random() < LLM_REPLAY_FAILURE_RATE:
+        raise InjectedFailure(f"Azure OpenAI request failed: injected failure (fixture {fixture.get('key')})")
+    chunks = max(1, math.ceil(len(response) / chunk_chars))
+    pause = replay_delay(fixture) / chunks
+    for start in range(0, len(response), chunk_chars):
+        if pause > 0:
+            time.sleep(pause)
+        yield response[start:start + chunk_chars]
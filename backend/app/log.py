@@ -1,48 +1,133 @@
 # app/log.py
-import os
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from datetime import datetime
 from pathlib import Path
 
+from .config import LOG_LEVEL
+
 # -------------------------
 # Log directory & file setup
 # -------------------------
 ROOT = Path(__file__).resolve().parents[1]   # backend/
 LOG_DIR = ROOT / "logs"
-LOG_DIR.mkdir(exist_ok=True)
 
 log_filename = LOG_DIR / f"app_{datetime.now().strftime('%Y-%m-%d')}.log"
 
 # -------------------------
-# Logger configuration
+# Output handlers (run on the listener thread)
 # -------------------------
-logger = logging.getLogger("FaxRefBackend")
-logger.setLevel(logging.DEBUG)   # Change to INFO in production
-
 formatter = logging.Formatter(
     "%(asctime)s | %(levelname)s | %(name)s | %(message)s",
     datefmt="%Y-%m-%d %H:%M:%S"
 )
 
+class LazyRotatingFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler that creates its directory and opens the file when
+    the first record is written (on the listener thread), not at import.
+    """
+
+    def __init__(self, filename, **kwargs):
+        super().__init__(filename, delay=True, **kwargs)
+
+    def _open(self):
+        Path(self.baseFilename).parent.mkdir(parents=True, exist_ok=True)
+        return super()._open()
+
+
 # Console output
 console_handler = logging.StreamHandler()
 console_handler.setFormatter(formatter)
-logger.addHandler(console_handler)
 
 # Rotating log file (5MB per file, 5 backups)
-file_handler = RotatingFileHandler(
+file_handler = LazyRotatingFileHandler(
     log_filename,
     maxBytes=5 * 1024 * 1024,
     backupCount=5,
     encoding="utf-8"
 )
 file_handler.setFormatter(formatter)
-logger.addHandler(file_handler)
+
+
+# Argument types that cannot change between logging and formatting
+IMMUTABLE_ARG_TYPES = (str, int, float, bytes, type(None))
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread when it is safe.
+
+    The stock handler merges msg % args (and renders tracebacks) in the
+    calling thread so records can be pickled; our queue is in-process, so a
+    record whose message and arguments are immutable is queued as-is and the
+    request thread only pays for the put. Anything else (a dict or list that
+    the caller may mutate after logging it) is merged now, so the log shows
+    the value as it was when logged.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        deferrable = isinstance(record.msg, str) and (
+            not args
+            or isinstance(args, tuple) and all(isinstance(arg, IMMUTABLE_ARG_TYPES) for arg in args)
+        )
+        if not deferrable:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+# -------------------------
+# Logger configuration
+# -------------------------
+# Callers only enqueue records; a background listener thread formats them
+# and does the console/file I/O, so disk stalls and rotation never block a request.
+log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+
+logger = logging.getLogger("FaxRefBackend")
+logger.setLevel(LOG_LEVEL.upper())
+queue_handler = DeferredQueueHandler(log_queue)
+logger.addHandler(queue_handler)
+
+listener.start()
+
+
+def _restart_after_fork():
+    """
+    Give a forked child (a gunicorn worker forked from a preloading master)
+    its own queue and listener: the parent's listener thread does not exist
+    in the child, so records would pile up in the queue unwritten.
+    """
+    global log_queue, listener
+    if listener is None:
+        return
+    log_queue = queue.SimpleQueue()
+    queue_handler.queue = log_queue
+    listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+    listener.start()
+
+
+os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread."""
+    global listener
+    if listener is not None:
+        listener.stop()
+        listener = None
+
+
+atexit.register(stop_logging)
 
 # Optional: silence noisy loggers
 logging.getLogger("uvicorn.access").disabled = False
 logging.getLogger("PIL").setLevel(logging.WARNING)
 logging.getLogger("pdf2image").setLevel(logging.WARNING)
 
-logger.info("Logging system initialized.")
+logger.info("Logging system initialized (level %s).", logging.getLevelName(logger.level))
@@ -0,0 +1,196 @@
+# app/metrics.py
+"""
+Prometheus metrics for the extraction pipeline, served at /metrics.
+
+With several uvicorn/gunicorn workers, set PROMETHEUS_MULTIPROC_DIR to an
+empty directory shared by the workers (wipe it on each deploy) before the
+app starts; each worker then writes its samples to mmap'd files there and
+/metrics aggregates all of them. Without it, /metrics reports this process
+only.
+
+Instruments are plain module-level prometheus_client objects; recording a
+sample is a lock plus an add, cheap enough for the per-page OCR path.
+"""
+import os
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+OCR_PAGE_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30)
+
+# -------------------------
+# Latency
+# -------------------------
+STAGE_SECONDS = Histogram(
+    "referral_stage_duration_seconds",
+    "Time spent in each stage of /upload processing",
+    ["stage", "file_type"],
+    buckets=STAGE_BUCKETS,
+)
+OCR_PAGE_SECONDS = Histogram(
+    "referral_ocr_page_duration_seconds",
+    "Tesseract time per OCR'd page",
+    buckets=OCR_PAGE_BUCKETS,
+)
+OCR_POOL_WAIT_SECONDS = Histogram(
+    "referral_ocr_pool_wait_seconds",
+    "Time a page waited for a slot in the shared OCR pool",
+    buckets=STAGE_BUCKETS,
+)
+ADMISSION_WAIT_SECONDS = Histogram(
+    "referral_admission_wait_seconds",
+    "Time an upload waited in the admission queue",
+    ["priority"],
+    buckets=STAGE_BUCKETS,
+)
+ADMISSION_STAGE_WAIT_SECONDS = Histogram(
+    "referral_admission_stage_wait_seconds",
+    "Time an admitted upload waited for a slot of a limited stage",
+    ["stage", "priority"],
+    buckets=STAGE_BUCKETS,
+)
+LLM_FIRST_FIELD_SECONDS = Histogram(
+    "referral_llm_first_field_seconds",
+    "Time from sending the LLM request to the first complete, parsed field",
+    buckets=STAGE_BUCKETS,
+)
+UPLOAD_SECONDS = Histogram(
+    "referral_upload_duration_seconds",
+    "/upload latency including admission wait, by priority class",
+    ["priority"],
+    buckets=STAGE_BUCKETS,
+)
+
+# -------------------------
+# Counters
+# -------------------------
+UPLOADS = Counter(
+    "referral_uploads_total",
+    "Finished /upload requests by HTTP status",
+    ["status"],
+)
+ERRORS = Counter(
+    "referral_stage_errors_total",
+    "Exceptions raised by a processing stage",
+    ["stage"],
+)
+CACHE_EVENTS = Counter(
+    "referral_cache_events_total",
+    "Cache / deduplication lookups",
+    ["cache", "result"],
+)
+LLM_TOKENS = Counter(
+    "referral_llm_tokens_total",
+    "Azure OpenAI tokens used",
+    ["kind"],
+)
+LLM_INVALID_FIELDS = Counter(
+    "referral_llm_invalid_fields_total",
+    "Top-level fields of the LLM answer that failed validation on arrival",
+    ["field"],
+)
+LLM_TRUNCATED = Counter(
+    "referral_llm_truncated_total",
+    "LLM answers cut off before the JSON closed, by how they were completed",
+    ["outcome"],
+)
+ADMISSION_REJECTIONS = Counter(
+    "referral_admission_rejections_total",
+    "Uploads turned away by admission control",
+    ["reason", "priority"],
+)
+RETRIES = Counter(
+    "referral_retries_total",
+    "Retried operations",
+    ["operation"],
+)
+PAGES = Counter(
+    "referral_pages_total",
+    "Pages seen by OCR extraction, by outcome",
+    ["outcome"],
+)
+
+# -------------------------
+# Gauges (summed over live workers in multiprocess mode)
+# -------------------------
+JOBS_IN_FLIGHT = Gauge(
+    "referral_jobs_in_flight",
+    "/upload requests currently being processed",
+    multiprocess_mode="livesum",
+)
+EXECUTOR_PENDING = Gauge(
+    "referral_executor_pending_tasks",
+    "Tasks submitted to a worker pool and not yet finished",
+    ["executor"],
+    multiprocess_mode="livesum",
+)
+ADMISSION_ACTIVE = Gauge(
+    "referral_admission_active",
+    "Admitted uploads being processed",
+    multiprocess_mode="livesum",
+)
+ADMISSION_QUEUED = Gauge(
+    "referral_admission_queue_depth",
+    "Uploads waiting in the admission queue",
+    ["priority"],
+    multiprocess_mode="livesum",
+)
+ADMISSION_STAGE_ACTIVE = Gauge(
+    "referral_admission_stage_active",
+    "Admitted uploads inside a limited stage",
+    ["stage"],
+    multiprocess_mode="livesum",
+)
+ADMISSION_STAGE_WAITING = Gauge(
+    "referral_admission_stage_waiting",
+    "Admitted uploads waiting for a slot of a limited stage",
+    ["stage"],
+    multiprocess_mode="livesum",
+)
+
+
+@contextmanager
+def time_stage(stage: str, file_type: str = "unknown"):
+    """Observe the duration of a block as `stage`; count it as an error if it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        ERRORS.labels(stage=stage).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(stage=stage, file_type=file_type).observe(time.perf_counter() - start)
+
+
+def track_task(executor: str, future: Future) -> Future:
+    """Count `future` as pending on `executor` until it finishes or is cancelled."""
+    gauge = EXECUTOR_PENDING.labels(executor=executor)
+    gauge.inc()
+    future.add_done_callback(lambda _: gauge.dec())
+    return future
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Exposition payload and content type for /metrics."""
+    if MULTIPROCESS:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
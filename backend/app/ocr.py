@@ -2,8 +2,6 @@
 import os
 from collections import defaultdict
 from typing import List
-from datetime import datetime
-import logging
 
 from pdf2image import convert_from_path
 from PIL import Image
@@ -11,31 +9,7 @@ import pytesseract
 
 from app.schemas import OCRDocument, PageOCR, Block, Line, Word
 from app.log import logger   # main logger
-
-
-# -------------------------------------------------------------------------
-# CREATE A UNIQUE LOG FILE FOR EVERY OCR RUN
-# -------------------------------------------------------------------------
-def create_run_logger():
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    log_dir = "logs/ocr_runs"
-    os.makedirs(log_dir, exist_ok=True)
-
-    file_path = f"{log_dir}/ocr_run_{timestamp}.log"
-
-    run_logger = logging.getLogger(f"OCR_RUN_{timestamp}")
-    run_logger.setLevel(logging.DEBUG)
-
-    file_handler = logging.FileHandler(file_path)
-    formatter = logging.Formatter("%(asctime)s | %(levelname)s | %(message)s")
-    file_handler.setFormatter(formatter)
-
-    run_logger.addHandler(file_handler)
-
-    run_logger.info("=== NEW OCR RUN STARTED ===")
-    run_logger.info(f"Log file: {file_path}")
-
-    return run_logger
+from app.run_trace import RunTrace
 
 
 # Optional: tesseract cmd from config
@@ -59,6 +33,7 @@ else:
 # PDF TO IMAGE
 # -------------------------------------------------------------------------
 def pdf_to_images(pdf_path: str, dpi: int = 300, run_logger=None) -> List[Image.Image]:
+    run_logger = run_logger or logger
     run_logger.info(f"Starting PDF → image conversion: {pdf_path}")
     try:
         images = convert_from_path(pdf_path, dpi=dpi)
@@ -122,6 +97,7 @@ def pdf_to_images(pdf_path: str, dpi: int = 300, run_logger=None) -> List[Image.
 #     run_logger.info(f"Page {page_num} OCR complete. Blocks: {len(blocks)}")
 #     return PageOCR(page_number=page_num, blocks=blocks)
 def image_to_ocr_structure(img: Image.Image, page_num: int, run_logger=None) -> PageOCR:
+    run_logger = run_logger or logger
     run_logger.info(f"Running OCR on page {page_num}...")
 
     try:
@@ -183,27 +159,27 @@ def image_to_ocr_structure(img: Image.Image, page_num: int, run_logger=None) ->
 # -------------------------------------------------------------------------
 def pdf_to_ocr(pdf_path: str, max_pages: int = 8) -> OCRDocument:
     """
-    Converts PDF → OCRDocument and generates a separate log file for every run.
+    Converts PDF → OCRDocument, tracing the run in the shared OCR run log
+    (logs/ocr_runs.log, tagged with the run_id).
     """
 
-    run_logger = create_run_logger()  
-    run_logger.info(f"Starting OCR pipeline for: {pdf_path}")
+    with RunTrace("pdf_to_ocr") as run_logger:
+        run_logger.info("Starting OCR pipeline for: %s", pdf_path)
 
-    images = pdf_to_images(pdf_path, run_logger=run_logger)
-    pages = []
+        images = pdf_to_images(pdf_path, run_logger=run_logger)
+        pages = []
 
-    total_pages = min(len(images), max_pages)
+        total_pages = min(len(images), max_pages)
 
-    for i, img in enumerate(images[:max_pages], start=1):
-        run_logger.info(f"OCR processing page {i}/{total_pages}")
-        try:
-            page_ocr = image_to_ocr_structure(img, page_num=i, run_logger=run_logger)
-            pages.append(page_ocr)
-        except Exception as e:
-            run_logger.exception(f"OCR failed on page {i}: {e}")
-            raise
-
-    run_logger.info("=== OCR RUN COMPLETED SUCCESSFULLY ===")
-    run_logger.info(f"Total pages processed: {len(pages)}")
+        for i, img in enumerate(images[:max_pages], start=1):
+            run_logger.info("OCR processing page %s/%s", i, total_pages)
+            try:
+                page_ocr = image_to_ocr_structure(img, page_num=i, run_logger=run_logger)
+                pages.append(page_ocr)
+            except Exception as e:
+                run_logger.exception("OCR failed on page %s: %s", i, e)
+                raise
+
+        run_logger.info("Total pages processed: %s", len(pages))
 
     return OCRDocument(pages=pages)
@@ -0,0 +1,114 @@
+# app/ocr_pool.py
+"""
+Machine-wide OCR pool shared by every worker process.
+
+pytesseract already runs each page in its own Tesseract process, so the
+CPU-heavy part of OCR is a pool of child processes; what one worker cannot
+see is how many the other workers have running. With several web workers,
+each with OCR_WORKERS page threads, a fax burst would start workers x
+OCR_WORKERS Tesseract processes on a machine with far fewer cores.
+
+The pool is OCR_POOL_SIZE slots (default: one per core), each a lock file
+in OCR_POOL_DIR. A page holds an flock on a free slot while Tesseract runs
+and waits for one otherwise, so the cores are shared by all workers of the
+machine (or container) without a broker process, and a slot held by a
+crashed worker is released by the kernel. Tesseract's own OpenMP threading
+is limited to one thread per process (OMP_THREAD_LIMIT=1 unless set), so a
+slot is one core.
+
+OCR_POOL_SIZE=0 disables the shared limit (only OCR_WORKERS applies).
+"""
+import fcntl
+import os
+import random
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from .config import OCR_POOL_DIR, OCR_POOL_SIZE
+from . import metrics
+from app.log import logger
+
+# Back-off while every slot is busy (seconds); a page takes ~1 s of Tesseract
+POLL_MIN = 0.002
+POLL_MAX = 0.05
+
+
+class OcrPool:
+
+    def __init__(self, size: int, root: Path):
+        self.size = size
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._slot_paths = [self.root / f"slot-{i}.lock" for i in range(size)]
+
+    def _try_acquire(self):
+        start = random.randrange(self.size)
+        for i in range(self.size):
+            path = self._slot_paths[(start + i) % self.size]
+            slot_file = open(path, "a")
+            try:
+                fcntl.flock(slot_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                slot_file.close()
+                continue
+            return slot_file
+        return None
+
+    @contextmanager
+    def slot(self):
+        """Hold one OCR slot for the duration of the block."""
+        start = time.perf_counter()
+        delay = POLL_MIN
+        slot_file = self._try_acquire()
+        while slot_file is None:
+            time.sleep(delay)
+            delay = min(delay * 2, POLL_MAX)
+            slot_file = self._try_acquire()
+        metrics.OCR_POOL_WAIT_SECONDS.observe(time.perf_counter() - start)
+        try:
+            yield
+        finally:
+            fcntl.flock(slot_file, fcntl.LOCK_UN)
+            slot_file.close()
+
+    def busy(self) -> int:
+        """Slots currently held by any process."""
+        busy = 0
+        for path in self._slot_paths:
+            with open(path, "a") as slot_file:
+                try:
+                    fcntl.flock(slot_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    busy += 1
+                else:
+                    fcntl.flock(slot_file, fcntl.LOCK_UN)
+        return busy
+
+
+# -------------------------
+# Shared instance
+# -------------------------
+_pool: Optional[OcrPool] = None
+
+
+def get_ocr_pool() -> Optional[OcrPool]:
+    """The shared pool, or None if OCR_POOL_SIZE is 0."""
+    global _pool
+    if _pool is None and OCR_POOL_SIZE > 0:
+        os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+        _pool = OcrPool(OCR_POOL_SIZE, OCR_POOL_DIR)
+        logger.info(f"OCR pool: {OCR_POOL_SIZE} slots in {OCR_POOL_DIR}")
+    return _pool
+
+
+@contextmanager
+def ocr_slot():
+    """Run the block (one Tesseract call) in a slot of the shared pool."""
+    pool = get_ocr_pool()
+    if pool is None:
+        yield
+        return
+    with pool.slot():
+        yield
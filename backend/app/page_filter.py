@@ -0,0 +1,183 @@
+# app/page_filter.py
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from app.log import logger
+from .config import (
+    BLANK_PAGE_INK_THRESHOLD,
+    DUPLICATE_PAGE_FILTER_ENABLED,
+    DUPLICATE_PAGE_MAX_BLOCK_DIFF,
+    DUPLICATE_PAGE_MAX_DISTANCE,
+    PAGE_FILTER_ENABLED,
+)
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# Fax machines stamp a transmission header/footer ("From ... Page 3/7") on
+# every page, including blank separators, so the outer bands are ignored.
+MARGIN_RATIO = 0.06
+
+# Thumbnail width used for ink statistics. Box downsampling averages away
+# isolated fax speckle (a dot barely greys an 8x8 cell), while a cell with
+# even small print in it comes out clearly grey, so it counts as ink.
+THUMBNAIL_WIDTH = 200
+INK_LEVEL = 200
+
+# dHash of HASH_SIZE x HASH_SIZE bits: finds candidate duplicates only.
+# A one-word change moves it by fewer bits than fax speckle does, so
+# candidates are confirmed on the pixels (block_difference).
+HASH_SIZE = 32
+# Duplicate confirmation: pages binarized at half resolution, compared in
+# blocks of DIFF_BLOCK x DIFF_BLOCK pixels (32 px of the original page)
+DIFF_SCALE = 2
+DIFF_BLOCK = 16
+
+
+def _content_area(img: "Image.Image") -> "Image.Image":
+    """Grayscale crop of the page without the fax header/footer bands."""
+    gray = img.convert("L")
+    margin = int(gray.height * MARGIN_RATIO)
+    if margin and gray.height > 2 * margin:
+        gray = gray.crop((0, margin, gray.width, gray.height - margin))
+    return gray
+
+
+def ink_density(img: "Image.Image") -> float:
+    """
+    Fraction of dark pixels on a downsampled copy of the page.
+
+    Args:
+        img: Rasterized page
+
+    Returns:
+        Value between 0.0 (blank) and 1.0 (solid black)
+    """
+    from PIL import Image
+
+    area = _content_area(img)
+    height = max(1, int(area.height * THUMBNAIL_WIDTH / max(1, area.width)))
+    thumb = area.resize((THUMBNAIL_WIDTH, height), Image.BOX)
+    histogram = thumb.histogram()
+    total = sum(histogram) or 1
+    return sum(histogram[:INK_LEVEL]) / total
+
+
+def page_hash(img: "Image.Image", hash_size: int = HASH_SIZE) -> int:
+    """
+    Difference hash (dHash) of the page content.
+
+    The page is box-downsampled to (hash_size + 1) x hash_size and each bit
+    records whether a cell is darker than its left neighbour. Unlike an
+    average hash, dense text pages with the same margins do not collapse
+    to the same value; different pages differ in about 40% of the bits.
+    """
+    from PIL import Image
+
+    thumb = _content_area(img).resize((hash_size + 1, hash_size), Image.BOX)
+    pixels = thumb.tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col + 1] < pixels[offset + col])
+    return value
+
+
+def page_signature(img: "Image.Image") -> "Image.Image":
+    """Page content binarized at 1/DIFF_SCALE resolution (1 bit per pixel).
+
+    Box downsampling before the threshold drops isolated speckle while
+    keeping text strokes.
+    """
+    from PIL import Image
+
+    area = _content_area(img)
+    small = area.resize((max(1, area.width // DIFF_SCALE), max(1, area.height // DIFF_SCALE)), Image.BOX)
+    return small.point(lambda v: 255 if v < INK_LEVEL else 0).convert("1")
+
+
+def block_difference(a: "Image.Image", b: "Image.Image", block: int = DIFF_BLOCK) -> float:
+    """Largest share of differing pixels in any block of two page signatures."""
+    from PIL import Image, ImageChops
+
+    if a.size != b.size:
+        return 1.0
+    diff = ImageChops.logical_xor(a, b).convert("L")
+    blocks = diff.resize((max(1, diff.width // block), max(1, diff.height // block)), Image.BOX)
+    return blocks.getextrema()[1] / 255
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two page hashes."""
+    return bin(a ^ b).count("1")
+
+
+class PageFilter:
+    """
+    Incremental blank / duplicate page detector for a single document.
+
+    Pages are fed in order through `check`, which returns None for pages that
+    should be OCR'd and a skip record (also kept in `skipped`) otherwise.
+    Duplicate detection (`skip_duplicates`) is opt-in: a page is only
+    skipped when its hash is close to an earlier page's and the pixels
+    confirm it.
+    """
+
+    def __init__(
+        self,
+        ink_threshold: float = BLANK_PAGE_INK_THRESHOLD,
+        max_distance: int = DUPLICATE_PAGE_MAX_DISTANCE,
+        max_block_diff: float = DUPLICATE_PAGE_MAX_BLOCK_DIFF,
+        enabled: bool = PAGE_FILTER_ENABLED,
+        skip_duplicates: bool = DUPLICATE_PAGE_FILTER_ENABLED,
+    ):
+        self.ink_threshold = ink_threshold
+        self.max_distance = max_distance
+        self.max_block_diff = max_block_diff
+        self.enabled = enabled
+        self.skip_duplicates = skip_duplicates
+        self.skipped: List[Dict] = []
+        self._seen: List[Tuple[int, int, "Image.Image"]] = []
+
+    def check(self, img: "Image.Image", page_num: int) -> Optional[Dict]:
+        """Return a skip record for blank or duplicate pages, else None."""
+        if not self.enabled:
+            return None
+
+        density = ink_density(img)
+        if density < self.ink_threshold:
+            record = {
+                "page": page_num,
+                "reason": "blank",
+                "ink_density": round(density, 5),
+            }
+            self.skipped.append(record)
+            logger.info(f"Skipping blank page {page_num} (ink density {density:.5f})")
+            return record
+
+        if not self.skip_duplicates:
+            return None
+
+        digest = page_hash(img)
+        signature = page_signature(img)
+        for seen_page, seen_digest, seen_signature in self._seen:
+            distance = hamming_distance(digest, seen_digest)
+            if distance > self.max_distance:
+                continue
+            difference = block_difference(signature, seen_signature)
+            if difference <= self.max_block_diff:
+                record = {
+                    "page": page_num,
+                    "reason": "duplicate",
+                    "duplicate_of": seen_page,
+                    "distance": distance,
+                    "block_diff": round(difference, 4),
+                }
+                self.skipped.append(record)
+                logger.info(
+                    f"Skipping page {page_num}: duplicate of page {seen_page} "
+                    f"(distance {distance}, block diff {difference:.4f})"
+                )
+                return record
+
+        self._seen.append((page_num, digest, signature))
+        return None
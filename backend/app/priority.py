@@ -0,0 +1,86 @@
+# app/priority.py
+"""
+Priority classes for /upload.
+
+Every upload runs as one of three classes, most important first:
+
+- urgent: marked URGENT/STAT, by the sender or in the document
+- interactive: a person waiting on the result (the default)
+- bulk: backfills and batch imports
+
+The class comes from the `X-Priority` request header (urgent/stat/high,
+interactive/normal, bulk/batch/low/backfill; anything else gets
+PRIORITY_DEFAULT) when the upload is admitted. The header is client input,
+so it may only pick a class in PRIORITY_HEADER_CLASSES (by default not
+urgent), unless the request also carries the PRIORITY_HEADER_TOKEN set on
+a trusted gateway. Once the text is extracted, a document the classifier
+marks urgent is escalated to urgent for the remaining stages (LLM).
+
+The class of the current upload is a context variable, so the admission
+queue and stage limits (app/admission.py), which share capacity between
+classes by PRIORITY_WEIGHTS, see it on whatever thread the stage runs. It
+holds a per-upload slot rather than the name: the handler runs in copies
+of the admitting middleware's context (call_next, the worker thread), and
+an escalation there must still be seen by the middleware when it records
+the upload's latency.
+"""
+import contextvars
+import hmac
+from typing import List, Mapping, Optional
+
+from .config import PRIORITY_DEFAULT, PRIORITY_HEADER_CLASSES, PRIORITY_HEADER_TOKEN, PRIORITY_WEIGHTS
+from app.log import logger
+
+PRIORITY_CLASSES = ("urgent", "interactive", "bulk")
+PRIORITY_HEADER = "x-priority"
+PRIORITY_TOKEN_HEADER = "x-priority-token"
+
+_ALIASES = {
+    "urgent": "urgent", "stat": "urgent", "high": "urgent",
+    "interactive": "interactive", "normal": "interactive",
+    "bulk": "bulk", "batch": "bulk", "low": "bulk", "backfill": "bulk",
+}
+
+DEFAULT_PRIORITY = PRIORITY_DEFAULT if PRIORITY_DEFAULT in PRIORITY_CLASSES else "interactive"
+# Share of contended capacity per class; classes left out of PRIORITY_WEIGHTS get 1
+WEIGHTS = {name: PRIORITY_WEIGHTS.get(name, 1.0) for name in PRIORITY_CLASSES}
+
+# [class name] of the current upload, shared by the contexts copied from it
+_current: "contextvars.ContextVar[Optional[List[str]]]" = contextvars.ContextVar("upload_priority", default=None)
+
+
+def _trusted(headers: Mapping[str, str]) -> bool:
+    token = headers.get(PRIORITY_TOKEN_HEADER) or ""
+    return bool(PRIORITY_HEADER_TOKEN) and hmac.compare_digest(token.encode(), PRIORITY_HEADER_TOKEN.encode())
+
+
+def priority_from_headers(headers: Mapping[str, str]) -> str:
+    value = (headers.get(PRIORITY_HEADER) or "").strip().lower()
+    priority = _ALIASES.get(value, DEFAULT_PRIORITY)
+    if priority not in PRIORITY_HEADER_CLASSES and priority != DEFAULT_PRIORITY and not _trusted(headers):
+        logger.debug(f"X-Priority {value!r} not allowed from clients; using {DEFAULT_PRIORITY}")
+        return DEFAULT_PRIORITY
+    return priority
+
+
+def get_priority() -> str:
+    """Class of the upload being processed in this context."""
+    slot = _current.get()
+    return slot[0] if slot else DEFAULT_PRIORITY
+
+
+def set_priority(priority: str):
+    """Start a new upload in this context with class `priority`."""
+    _current.set([priority])
+
+
+def escalate(classification: Optional[dict]) -> str:
+    """Move the current upload to urgent if the classifier marked it so."""
+    if classification and classification.get("urgent") and get_priority() != "urgent":
+        logger.info(f"Document marked urgent; escalating from {get_priority()}")
+        slot = _current.get()
+        if slot:
+            slot[0] = "urgent"
+        else:
+            set_priority("urgent")
+    return get_priority()
@@ -0,0 +1,110 @@
+# app/profiling.py
+"""
+Opt-in profiling of the /upload pipeline.
+
+With PROFILING_ENABLED=true, a request is profiled when it carries the
+`X-Profile: 1` header, or at random with probability PROFILING_SAMPLE_RATE.
+The request handler runs under cProfile. Work handed to the OCR thread pool
+shows up as time spent waiting on its futures. The artifacts are written to
+PROFILE_DIR under the job_id:
+
+- <job_id>.prof: pstats data (open with `python -m pstats`, snakeviz, ...)
+- <job_id>.txt: the top functions by cumulative time
+
+When profiling is disabled the per-request cost is a single flag check.
+"""
+import cProfile
+import io
+import pstats
+import random
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .config import (
+    PROFILING_ENABLED,
+    PROFILING_SAMPLE_RATE,
+    PROFILE_DIR,
+    PROFILE_MAX_FILES,
+)
+from app.log import logger
+
+PROFILE_HEADER = "x-profile"
+_JOB_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def should_profile(headers) -> bool:
+    """Decide whether to profile a request (header opt-in or sampling)."""
+    if not PROFILING_ENABLED:
+        return False
+    if headers.get(PROFILE_HEADER, "").lower() in ("1", "true", "yes"):
+        return True
+    return PROFILING_SAMPLE_RATE > 0 and random.random() < PROFILING_SAMPLE_RATE
+
+
+class RequestProfile:
+    """cProfile session for one request; saved under the job_id once known."""
+
+    def __init__(self):
+        self.job_id: Optional[str] = None
+        self._profiler = cProfile.Profile()
+
+    def __enter__(self) -> "RequestProfile":
+        self._profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._profiler.disable()
+        return False
+
+    def save(self, top: int = 40) -> Optional[Path]:
+        """Write the .prof and .txt artifacts; returns the .prof path."""
+        if not self.job_id:
+            logger.warning("Profile discarded: request produced no job_id")
+            return None
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        prof_path = PROFILE_DIR / f"{self.job_id}.prof"
+        self._profiler.dump_stats(str(prof_path))
+
+        summary = io.StringIO()
+        stats = pstats.Stats(self._profiler, stream=summary)
+        stats.strip_dirs().sort_stats("cumulative").print_stats(top)
+        (PROFILE_DIR / f"{self.job_id}.txt").write_text(summary.getvalue(), encoding="utf-8")
+
+        logger.info(f"Saved profile for job {self.job_id}: {prof_path}")
+        _prune()
+        return prof_path
+
+
+def _prune():
+    """Keep only the newest PROFILE_MAX_FILES profiles."""
+    profiles = sorted(PROFILE_DIR.glob("*.prof"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for old in profiles[PROFILE_MAX_FILES:]:
+        for path in (old, old.with_suffix(".txt")):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Stored profiles, newest first."""
+    if not PROFILE_DIR.exists():
+        return []
+    profiles = []
+    for path in PROFILE_DIR.glob("*.prof"):
+        stat = path.stat()
+        profiles.append({
+            "job_id": path.stem,
+            "created_at": stat.st_mtime,
+            "size_bytes": stat.st_size,
+        })
+    return sorted(profiles, key=lambda p: p["created_at"], reverse=True)
+
+
+def profile_path(job_id: str, fmt: str = "prof") -> Optional[Path]:
+    """Path of a stored profile artifact (fmt "prof" or "text"), or None."""
+    if not _JOB_ID_RE.match(job_id) or fmt not in ("prof", "text"):
+        return None
+    path = PROFILE_DIR / f"{job_id}.{'prof' if fmt == 'prof' else 'txt'}"
+    return path if path.exists() else None
@@ -0,0 +1,159 @@
+# app/run_trace.py
+"""
+Run-scoped tracing for OCR jobs.
+
+Each OCR run gets a RunTrace, a LoggerAdapter that tags its records with a
+run_id. Records go to one shared rotating file (logs/ocr_runs.log) through a
+background queue listener. The run's events are also kept in a bounded deque.
+Finished runs are summarised in a bounded "recent runs" buffer. A run creates
+no logger, handler or file of its own, so nothing accumulates in a
+long-running worker.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from logging.handlers import QueueListener
+from typing import Any, Deque, Dict, List
+
+from .config import RUN_TRACE_MAX_EVENTS, RUN_TRACE_MAX_RUNS
+from .log import IMMUTABLE_ARG_TYPES, LOG_DIR, DeferredQueueHandler, LazyRotatingFileHandler
+
+# -------------------------
+# Shared OCR run log
+# -------------------------
+run_file_handler = LazyRotatingFileHandler(
+    LOG_DIR / "ocr_runs.log",
+    maxBytes=5 * 1024 * 1024,
+    backupCount=5,
+    encoding="utf-8",
+)
+run_file_handler.setFormatter(
+    logging.Formatter("%(asctime)s | %(levelname)s | run=%(run_id)s | %(message)s")
+)
+
+run_log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+run_listener = QueueListener(run_log_queue, run_file_handler)
+
+run_logger = logging.getLogger("FaxRefBackend.ocr_runs")
+run_logger.setLevel(logging.DEBUG)
+run_queue_handler = DeferredQueueHandler(run_log_queue)
+run_logger.addHandler(run_queue_handler)
+# Keep per-page OCR chatter out of the main application log
+run_logger.propagate = False
+
+run_listener.start()
+
+
+def _restart_after_fork():
+    """New queue and listener thread in a forked child (see app/log.py)."""
+    global run_log_queue, run_listener
+    if run_listener is None:
+        return
+    run_log_queue = queue.SimpleQueue()
+    run_queue_handler.queue = run_log_queue
+    run_listener = QueueListener(run_log_queue, run_file_handler)
+    run_listener.start()
+
+
+os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def stop_run_logging():
+    """Flush queued run records and stop the listener thread."""
+    global run_listener
+    if run_listener is not None:
+        run_listener.stop()
+        run_listener = None
+
+
+atexit.register(stop_run_logging)
+
+_recent_runs: Deque[Dict[str, Any]] = deque(maxlen=RUN_TRACE_MAX_RUNS)
+_recent_lock = threading.Lock()
+
+
+class RunTrace(logging.LoggerAdapter):
+    """
+    Logger for a single OCR run.
+
+    Drop-in for the `run_logger` argument of the OCR helpers (info, warning,
+    exception, ...). Use as a context manager so the run is closed and
+    summarised even when OCR fails.
+    """
+
+    def __init__(self, name: str = "ocr", max_events: int = RUN_TRACE_MAX_EVENTS):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.run_name = name
+        self.started = time.time()
+        self.status = "running"
+        self.dropped = 0
+        # (seconds since start, level, msg, args); formatted only when read
+        self._events: Deque[tuple] = deque(maxlen=max_events)
+        super().__init__(run_logger, {"run_id": self.run_id})
+
+    def log(self, level, msg, *args, **kwargs):
+        if len(self._events) == self._events.maxlen:
+            self.dropped += 1
+        event_msg, event_args = msg, args
+        if not all(isinstance(arg, IMMUTABLE_ARG_TYPES) for arg in args):
+            # Snapshot arguments the caller may still mutate (see DeferredQueueHandler)
+            try:
+                event_msg, event_args = msg % args, ()
+            except Exception:
+                event_msg, event_args = f"{msg} {args}", ()
+        self._events.append((time.time() - self.started, level, event_msg, event_args))
+        super().log(level, msg, *args, **kwargs)
+
+    def events(self) -> List[Dict[str, Any]]:
+        """The run's most recent events, oldest first."""
+        events = []
+        for elapsed, level, msg, args in list(self._events):
+            try:
+                message = msg % args if args else str(msg)
+            except Exception:
+                message = f"{msg} {args}"
+            events.append({
+                "t": round(elapsed, 3),
+                "level": logging.getLevelName(level),
+                "message": message,
+            })
+        return events
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "name": self.run_name,
+            "status": self.status,
+            "started": self.started,
+            "duration_seconds": round(time.time() - self.started, 3),
+            "dropped_events": self.dropped,
+            "events": self.events(),
+        }
+
+    def close(self, status: str = "completed"):
+        """Finish the run and move its summary into the recent-runs buffer."""
+        if self.status != "running":
+            return
+        self.info("=== OCR RUN %s ===", status.upper())
+        self.status = status
+        with _recent_lock:
+            _recent_runs.append(self.summary())
+
+    def __enter__(self) -> "RunTrace":
+        self.info("=== NEW OCR RUN STARTED (%s) ===", self.run_name)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close("failed" if exc_type else "completed")
+        return False
+
+
+def recent_runs() -> List[Dict[str, Any]]:
+    """Summaries of the last RUN_TRACE_MAX_RUNS finished runs, oldest first."""
+    with _recent_lock:
+        return list(_recent_runs)
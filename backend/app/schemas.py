@@ -1,6 +1,6 @@
 # app/schemas.py
-from pydantic import BaseModel, Field, validator
-from typing import List, Optional, Any
+from pydantic import BaseModel, Field, ValidationError, field_validator, model_validator
+from typing import List, Optional, Any, Dict
 
 
 class Word(BaseModel):
@@ -34,7 +34,7 @@ class OCRDocument(BaseModel):
 
 class DocumentMeta(BaseModel):
     title: Optional[str] = Field(None, description="Document title (best guess)")
-    date: Optional[str] = Field(None, description="Document date (ISO if available)")
+    date: Optional[str] = Field(None, description="Document date (ISO if available)", json_schema_extra={"format": "date"})
     pages: Optional[int] = Field(None, description="Number of pages detected")
 
 
@@ -55,7 +55,7 @@ class ReferralInfo(BaseModel):
 class PatientInfo(BaseModel):
     full_name: Optional[str] = None
     phone: Optional[str] = None
-    date_of_birth: Optional[str] = None
+    date_of_birth: Optional[str] = Field(None, json_schema_extra={"format": "date"})
     gender: Optional[str] = None
     address: Optional[str] = None
     accompanied_by_care_provider: Optional[bool] = None
@@ -76,6 +76,14 @@ class Diagnoses(BaseModel):
 
 
 class ReferralExtraction(BaseModel):
+    """
+    Structured referral as returned by /upload.
+
+    Validating it is the whole normalize step for LLM / form-template output:
+    missing or malformed sections validate as empty (every field at its
+    default), null lists become empty lists, and types are coerced by the
+    compiled pydantic-core validator in a single pass.
+    """
     document_meta: DocumentMeta
     referral: ReferralInfo
     patient: PatientInfo
@@ -90,17 +98,63 @@ class ReferralExtraction(BaseModel):
     position: Optional[str] = None
     file_number: Optional[str] = None
 
-    @validator("treatments", pre=True, always=True)
-    def ensure_treatments_list(cls, v):
+    @model_validator(mode="before")
+    @classmethod
+    def ensure_sections(cls, data: Any) -> Dict[str, Any]:
+        if not isinstance(data, dict):
+            return {section: {} for section in REQUIRED_SECTIONS}
+        missing = [s for s in REQUIRED_SECTIONS if not isinstance(data.get(s), dict)]
+        if missing:
+            data = {**data, **{section: {} for section in missing}}
+        return data
+
+    @field_validator("treatments", "transportation_needs", "follow_up_requirements", mode="before")
+    @classmethod
+    def ensure_list(cls, v):
         return v or []
 
-    @validator("transportation_needs", pre=True, always=True)
-    def ensure_transport_list(cls, v):
-        return v or []
 
-    @validator("follow_up_requirements", pre=True, always=True)
-    def ensure_followup_list(cls, v):
-        return v or []
+# Sections always present in the output, validated from {} when the model
+# left them out or returned something other than an object
+REQUIRED_SECTIONS = ("document_meta", "referral", "patient", "diagnoses")
+
+
+def with_defaults(data: Any, model: type = ReferralExtraction) -> Dict[str, Any]:
+    """
+    `data` with every field of `model` present (defaults for missing ones),
+    without validating values. For returning partial output when
+    validation fails.
+    """
+    data = dict(data) if isinstance(data, dict) else {}
+    for name, field in model.model_fields.items():
+        annotation = field.annotation
+        # Optional[Section] -> Section
+        for arg in getattr(annotation, "__args__", ()):
+            if isinstance(arg, type) and issubclass(arg, BaseModel):
+                annotation = arg
+        is_section = isinstance(annotation, type) and issubclass(annotation, BaseModel)
+        if is_section and (name in REQUIRED_SECTIONS or isinstance(data.get(name), dict)):
+            data[name] = with_defaults(data.get(name), annotation)
+        elif name not in data:
+            data[name] = field.get_default(call_default_factory=True)
+            if isinstance(data[name], BaseModel):
+                data[name] = data[name].model_dump()
+    return data
+
+
+def field_error(name: str, value: Any, model: type = ReferralExtraction) -> Optional[str]:
+    """
+    Why top-level field `name` of `model` would fail validation with `value`,
+    or None if it validates (or is not a field). Same rules as validating
+    the whole model, so fields can be checked one at a time as they arrive.
+    """
+    if name not in model.model_fields:
+        return None
+    try:
+        model.model_validate({name: value})
+    except ValidationError as e:
+        return "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+    return None
 
 
 class StructuredResult(BaseModel):
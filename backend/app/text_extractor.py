@@ -1,67 +1,331 @@
 # app/text_extractor.py
+import contextvars
+import io
 import os
-from typing import List, Dict, Any
+import time
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Iterable, Iterator, Callable, Union, BinaryIO, Tuple
 from pathlib import Path
-from PIL import Image
-import pytesseract
-from pdf2image import convert_from_path
-import docx
 from app.log import logger
+from .config import (
+    OCR_WORKERS,
+    EARLY_EXIT_ENABLED,
+    EARLY_EXIT_MIN_PAGES,
+    EARLY_EXIT_MAX_PAGES,
+    EARLY_EXIT_MIN_COVERAGE,
+    EARLY_EXIT_PREFETCH,
+)
+from .classifier import is_referral_captured
+from .page_filter import PageFilter
+from .ocr_pool import ocr_slot
+from . import metrics
+from .tracing import tracer
 
-def extract_text_from_pdf(pdf_path: str, dpi: int = 300) -> str:
-    """Extract text from PDF using OCR."""
-    logger.info(f"Extracting text from PDF: {pdf_path}")
+# PIL, pytesseract, pdf2image and python-docx are imported by the functions
+# that need them, so importing the app does not pay for every file type
+# (see app/warmup.py to preload them at startup instead).
+if TYPE_CHECKING:
+    from PIL import Image
+
+# A document given as a path or as in-memory content
+DocumentSource = Union[str, Path, bytes, bytearray, memoryview, BinaryIO]
+
+# Shared OCR thread pool (lazy initialization). Tesseract runs as a
+# subprocess, so threads give real page-level parallelism; each call takes a
+# slot of the machine-wide OCR pool (app/ocr_pool.py) shared with the other
+# worker processes.
+_ocr_executor = None
+
+def get_ocr_executor() -> ThreadPoolExecutor:
+    """Get or create the shared page OCR executor."""
+    global _ocr_executor
+    if _ocr_executor is None:
+        _ocr_executor = ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix="ocr")
+        logger.info(f"OCR executor initialized with {OCR_WORKERS} workers")
+    return _ocr_executor
+
+def shutdown_ocr_executor(wait: bool = True):
+    """Let queued pages finish and stop the OCR executor if it was started."""
+    global _ocr_executor
+    if _ocr_executor is not None:
+        _ocr_executor.shutdown(wait=wait)
+        _ocr_executor = None
+
+def ocr_page(img: "Image.Image", page_num: int = 0) -> Tuple[str, float]:
+    """OCR a single page image; returns (text, Tesseract seconds)."""
+    import pytesseract
+
+    with tracer.start_as_current_span("ocr_page", attributes={"page": page_num}), ocr_slot():
+        start = time.perf_counter()
+        try:
+            return pytesseract.image_to_string(img), time.perf_counter() - start
+        finally:
+            metrics.OCR_PAGE_SECONDS.observe(time.perf_counter() - start)
+
+def ocr_pages(
+    pages: Iterable["Image.Image"],
+    page_report: Optional[Dict[str, Any]] = None,
+    stop_when: Optional[Callable[[str, int], bool]] = None,
+) -> str:
+    """
+    OCR a sequence of page images in parallel and join the page texts.
+
+    Pages are consumed lazily: each one is checked by the blank/duplicate
+    filter and handed to the OCR executor, with at most 2 x OCR_WORKERS
+    pages decoded and waiting at any time. Page order is preserved.
+
+    If `stop_when(text_so_far, ocr_page_count)` is given it is called after
+    each page is collected (in page order); once it returns True no further
+    pages are read and queued pages that have not started are cancelled.
+    Only EARLY_EXIT_PREFETCH pages are then read ahead of the page being
+    checked, so a stop wastes at most that many rasterized and OCR'd pages.
+
+    If `page_report` is given it is filled with the page counts, the list
+    of skipped pages and the OCR time of each page (`page_timings`).
+    `ocr_pages` counts every page Tesseract ran on, including the ones
+    already running when an early exit fired (`ocr_pages_discarded`).
+    """
+    page_filter = PageFilter()
+    executor = get_ocr_executor()
+    max_in_flight = OCR_WORKERS * 2 if stop_when is None else 1 + EARLY_EXIT_PREFETCH
+    pending = deque()
+    all_text: List[str] = []
+    page_timings: List[Dict[str, Any]] = []
+    total_pages = 0
+    stopped_at = None
+
+    def collect_oldest() -> bool:
+        nonlocal stopped_at
+        page_num, future = pending.popleft()
+        text, seconds = future.result()
+        all_text.append(f"--- Page {page_num} ---\n{text}")
+        page_timings.append({"page": page_num, "ocr_ms": round(seconds * 1000, 1)})
+        if stop_when and stop_when("\n\n".join(all_text), len(all_text)):
+            stopped_at = page_num
+            return True
+        return False
+
+    def collect_ready() -> bool:
+        while pending and (pending[0][1].done() or len(pending) >= max_in_flight):
+            if collect_oldest():
+                return True
+        return False
+
+    for i, img in enumerate(pages, start=1):
+        total_pages = i
+        skip = page_filter.check(img, i)
+        if skip:
+            metrics.PAGES.labels(outcome=skip["reason"]).inc()
+            continue
+        logger.info(f"Queueing page {i} for OCR")
+        # Run in a copy of this context so the page span nests under the request's
+        ctx = contextvars.copy_context()
+        pending.append((i, metrics.track_task("ocr", executor.submit(ctx.run, ocr_page, img, i))))
+        if collect_ready():
+            break
+
+    while pending and stopped_at is None:
+        collect_oldest()
+
+    # Pages Tesseract had already started (or finished) when the stop fired
+    # cannot be cancelled: that work was done, its text is just not used
+    discarded = sum(1 for _, future in pending if not future.cancel())
+    metrics.PAGES.labels(outcome="ocr").inc(len(all_text))
+    if discarded:
+        metrics.PAGES.labels(outcome="ocr_discarded").inc(discarded)
+
+    if page_report is not None:
+        page_report.update({
+            "total_pages": total_pages,
+            "ocr_pages": len(all_text) + discarded,
+            "ocr_pages_discarded": discarded,
+            "skipped_pages": page_filter.skipped,
+            "page_timings": page_timings,
+        })
+        if stopped_at is not None:
+            page_report["early_exit"] = {"stopped_after_page": stopped_at}
+
+    logger.info(
+        f"OCR complete: {len(all_text)} of {total_pages} pages used "
+        f"({discarded} OCR'd after the stop and discarded, {len(page_filter.skipped)} skipped)"
+    )
+    return "\n\n".join(all_text)
+
+def referral_stop_condition(
+    min_pages: int = EARLY_EXIT_MIN_PAGES,
+    min_coverage: float = EARLY_EXIT_MIN_COVERAGE,
+) -> Callable[[str, int], bool]:
+    """
+    Build a `stop_when` callback for `ocr_pages` that stops once at least
+    `min_pages` pages have been OCR'd and the text so far is classified as a
+    referral with enough of the core fields present.
+    """
+    def stop_when(text: str, ocr_page_count: int) -> bool:
+        if ocr_page_count < min_pages:
+            return False
+        captured = is_referral_captured(text, min_coverage)
+        if captured:
+            logger.info(f"Referral captured after {ocr_page_count} OCR'd pages; stopping early")
+        return captured
+    return stop_when
+
+def iter_pdf_pages(pdf_path: str, dpi: int = 300, max_pages: Optional[int] = None) -> Iterator["Image.Image"]:
+    """
+    Rasterize a PDF one page at a time, so pages after an early exit are
+    never rendered.
+    """
+    from pdf2image import convert_from_path, pdfinfo_from_path
+
+    page_count = int(pdfinfo_from_path(pdf_path).get("Pages", 0))
+    if max_pages:
+        page_count = min(page_count, max_pages)
+    for page_num in range(1, page_count + 1):
+        yield from convert_from_path(pdf_path, dpi=dpi, first_page=page_num, last_page=page_num)
+
+def extract_text_from_pdf(
+    pdf_path: str,
+    dpi: int = 300,
+    page_report: Optional[Dict[str, Any]] = None,
+    early_exit: Optional[bool] = None,
+) -> str:
+    """
+    Extract text from PDF using OCR.
+
+    Blank separator pages and repeated pages are detected on the rasterized
+    page and skipped before Tesseract runs (see `ocr_pages`).
+
+    In early-exit mode (EARLY_EXIT_ENABLED, or `early_exit=True`) pages are
+    rasterized and OCR'd in order, at most EARLY_EXIT_MAX_PAGES of them, and
+    extraction stops once the referral form has been captured.
+    """
+    if early_exit is None:
+        early_exit = EARLY_EXIT_ENABLED
+    logger.info(f"Extracting text from PDF: {pdf_path} (early_exit={early_exit})")
     try:
-        images = convert_from_path(pdf_path, dpi=dpi)
-        all_text = []
-        
-        for i, img in enumerate(images, start=1):
-            logger.info(f"Processing page {i}/{len(images)}")
-            text = pytesseract.image_to_string(img)
-            all_text.append(f"--- Page {i} ---\n{text}")
-        
-        full_text = "\n\n".join(all_text)
+        if early_exit:
+            full_text = ocr_pages(
+                iter_pdf_pages(pdf_path, dpi=dpi, max_pages=EARLY_EXIT_MAX_PAGES),
+                page_report=page_report,
+                stop_when=referral_stop_condition(),
+            )
+        else:
+            from pdf2image import convert_from_path
+
+            images = convert_from_path(pdf_path, dpi=dpi)
+            full_text = ocr_pages(images, page_report=page_report)
         logger.info(f"PDF extraction complete. Total characters: {len(full_text)}")
         return full_text
     except Exception as e:
         logger.exception(f"PDF extraction failed: {e}")
         raise
 
-def extract_text_from_image(image_path: str) -> str:
-    """Extract text from image using OCR."""
-    logger.info(f"Extracting text from image: {image_path}")
+def iter_tiff_frames(tiff_path: str) -> Iterator["Image.Image"]:
+    """
+    Yield the frames of a (multi-page) TIFF one at a time.
+
+    Only the current frame is decoded; each yielded image is an independent
+    copy so it can be OCR'd on another thread while the next frame decodes.
+    """
+    from PIL import Image
+
+    with Image.open(tiff_path) as tiff:
+        for index in range(getattr(tiff, "n_frames", 1)):
+            tiff.seek(index)
+            yield tiff.copy()
+
+def extract_text_from_tiff(
+    tiff_path: str,
+    page_report: Optional[Dict[str, Any]] = None,
+    early_exit: Optional[bool] = None,
+) -> str:
+    """
+    Extract text from a multi-page TIFF fax (G3/G4) using OCR.
+
+    Supports the same early-exit mode as `extract_text_from_pdf`.
+    """
+    if early_exit is None:
+        early_exit = EARLY_EXIT_ENABLED
+    logger.info(f"Extracting text from TIFF: {tiff_path} (early_exit={early_exit})")
     try:
-        img = Image.open(image_path)
-        text = pytesseract.image_to_string(img)
+        frames = iter_tiff_frames(tiff_path)
+        if early_exit:
+            frames = itertools.islice(frames, EARLY_EXIT_MAX_PAGES)
+        full_text = ocr_pages(
+            frames,
+            page_report=page_report,
+            stop_when=referral_stop_condition() if early_exit else None,
+        )
+        logger.info(f"TIFF extraction complete. Total characters: {len(full_text)}")
+        return full_text
+    except Exception as e:
+        logger.exception(f"TIFF extraction failed: {e}")
+        raise
+
+def _as_stream(source: DocumentSource) -> Union[str, BinaryIO]:
+    """Return a path string or a readable binary stream for any DocumentSource."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    if isinstance(source, (str, Path)):
+        return str(source)
+    return source
+
+def _describe(source: DocumentSource) -> str:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return f"<in-memory {len(source)} bytes>"
+    return str(source) if isinstance(source, (str, Path)) else "<stream>"
+
+def extract_text_from_image(image_path: DocumentSource) -> str:
+    """
+    Extract text from image using OCR (path, bytes or file-like).
+
+    Runs through `ocr_page` like PDF/TIFF pages: in a slot of the shared
+    OCR pool, timed and traced per page.
+    """
+    logger.info(f"Extracting text from image: {_describe(image_path)}")
+    try:
+        from PIL import Image
+
+        img = Image.open(_as_stream(image_path))
+        text, _ = ocr_page(img, 1)
+        metrics.PAGES.labels(outcome="ocr").inc()
         logger.info(f"Image extraction complete. Total characters: {len(text)}")
         return text
     except Exception as e:
         logger.exception(f"Image extraction failed: {e}")
         raise
 
-def extract_text_from_txt(txt_path: str) -> str:
-    """Extract text from TXT file."""
-    logger.info(f"Reading text file: {txt_path}")
+def extract_text_from_txt(txt_path: DocumentSource) -> str:
+    """Extract text from TXT file (path, bytes or file-like)."""
+    logger.info(f"Reading text file: {_describe(txt_path)}")
+    try:
+        stream = _as_stream(txt_path)
+        if isinstance(stream, str):
+            with open(stream, 'rb') as f:
+                data = f.read()
+        else:
+            data = stream.read()
+    except Exception as e:
+        logger.exception(f"Text file reading failed: {e}")
+        raise
     try:
-        with open(txt_path, 'r', encoding='utf-8') as f:
-            text = f.read()
+        text = data.decode('utf-8')
         logger.info(f"Text file read complete. Total characters: {len(text)}")
-        return text
     except UnicodeDecodeError:
         # Try with different encoding
-        with open(txt_path, 'r', encoding='latin-1') as f:
-            text = f.read()
+        text = data.decode('latin-1')
         logger.info(f"Text file read complete (latin-1). Total characters: {len(text)}")
-        return text
-    except Exception as e:
-        logger.exception(f"Text file reading failed: {e}")
-        raise
+    # Match text-mode reading: universal newlines
+    return text.replace('\r\n', '\n').replace('\r', '\n')
 
-def extract_text_from_docx(docx_path: str) -> str:
-    """Extract text from Word document (.docx)."""
-    logger.info(f"Extracting text from Word document: {docx_path}")
+def extract_text_from_docx(docx_path: DocumentSource) -> str:
+    """Extract text from Word document (.docx) (path, bytes or file-like)."""
+    logger.info(f"Extracting text from Word document: {_describe(docx_path)}")
     try:
-        doc = docx.Document(docx_path)
+        import docx
+
+        doc = docx.Document(_as_stream(docx_path))
         
         # Extract paragraphs
         paragraphs = [para.text for para in doc.paragraphs if para.text.strip()]
@@ -85,49 +349,72 @@ def extract_text_from_docx(docx_path: str) -> str:
         logger.exception(f"Word document extraction failed: {e}")
         raise
 
-def extract_text_from_file(file_path: str) -> str:
+def extract_text_from_file(
+    file_path: DocumentSource,
+    page_report: Optional[Dict[str, Any]] = None,
+    file_ext: Optional[str] = None,
+) -> str:
     """
     Universal text extractor - detects file type and extracts text.
     
     Supported formats:
     - PDF: OCR-based extraction
+    - TIFF (TIF, TIFF): multi-page OCR-based extraction
     - Images (JPG, PNG, JPEG): OCR-based extraction
     - TXT: Direct text reading
     - DOCX: Word document text extraction
+
+    `file_path` may also be in-memory content (bytes, memoryview or a binary
+    file-like object) for TXT, DOCX and images, in which case `file_ext`
+    (e.g. ".txt") gives the type. PDF and TIFF need a path.
+
+    `page_report` is passed through to the OCR extractors that report pages.
     """
-    file_path = Path(file_path)
-    ext = file_path.suffix.lower()
+    in_memory = not isinstance(file_path, (str, Path))
+    ext = (file_ext or Path(file_path).suffix).lower()
     
-    logger.info(f"Starting text extraction for: {file_path} (type: {ext})")
+    logger.info(f"Starting text extraction for: {_describe(file_path)} (type: {ext})")
+    
+    if in_memory and ext in ['.pdf', '.tif', '.tiff']:
+        raise ValueError(f"{ext} extraction requires a file path")
     
     if ext == '.pdf':
-        return extract_text_from_pdf(str(file_path))
-    elif ext in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff']:
-        return extract_text_from_image(str(file_path))
+        return extract_text_from_pdf(str(file_path), page_report=page_report)
+    elif ext in ['.tif', '.tiff']:
+        return extract_text_from_tiff(str(file_path), page_report=page_report)
+    elif ext in ['.jpg', '.jpeg', '.png', '.bmp']:
+        return extract_text_from_image(file_path)
     elif ext == '.txt':
-        return extract_text_from_txt(str(file_path))
+        return extract_text_from_txt(file_path)
     elif ext == '.docx':
-        return extract_text_from_docx(str(file_path))
+        return extract_text_from_docx(file_path)
     else:
         raise ValueError(f"Unsupported file type: {ext}")
 
-def extract_text_with_metadata(file_path: str) -> Dict[str, Any]:
+def extract_text_with_metadata(file_path: DocumentSource, file_ext: Optional[str] = None) -> Dict[str, Any]:
     """
     Extract text along with metadata.
+
+    Accepts a path or in-memory content (see `extract_text_from_file`).
     
     Returns:
         {
             "raw_text": str,
             "file_type": str,
             "character_count": int,
-            "word_count": int
+            "word_count": int,
+            "pages": dict  # only for paged formats (PDF, TIFF)
         }
     """
-    text = extract_text_from_file(file_path)
+    page_report: Dict[str, Any] = {}
+    text = extract_text_from_file(file_path, page_report=page_report, file_ext=file_ext)
     
-    return {
+    metadata = {
         "raw_text": text,
-        "file_type": Path(file_path).suffix.lower(),
+        "file_type": (file_ext or Path(file_path).suffix).lower(),
         "character_count": len(text),
         "word_count": len(text.split())
-    }
\ No newline at end of file
+    }
+    if page_report:
+        metadata["pages"] = page_report
+    return metadata
@@ -0,0 +1,155 @@
+# app/timings.py
+"""
+Per-job timing breakdown for /upload.
+
+A JobTimings collects wall-clock milliseconds for each pipeline stage (and
+each OCR'd page). upload_file returns it as `timings`, logs it, and saves it
+to a small SQLite store keyed by job_id, so a slow job can be looked up
+afterwards (GET /jobs/{job_id}/timings, GET /timings).
+"""
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .config import TIMINGS_DB_PATH, TIMINGS_MAX_ROWS
+from app.log import logger
+from . import metrics
+from .tracing import tracer
+
+
+class JobTimings:
+    """Stage and page timings for one /upload job."""
+
+    def __init__(self, file_type: str = "unknown"):
+        self.file_type = file_type
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.ocr_pages: List[Dict[str, Any]] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a block as stage `name` (also a Prometheus sample and a trace span)."""
+        start = time.perf_counter()
+        try:
+            with tracer.start_as_current_span(name, attributes={"file_type": self.file_type}), \
+                    metrics.time_stage(name, self.file_type):
+                yield
+        finally:
+            self.stages[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        timings = {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "stages": dict(self.stages),
+        }
+        if self.ocr_pages:
+            timings["ocr_pages"] = list(self.ocr_pages)
+        return timings
+
+
+class TimingStore:
+    """SQLite table of job timings, keyed by job_id and capped at `max_rows`."""
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, db_path: Path, max_rows: int = TIMINGS_MAX_ROWS):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._inserts = 0
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS job_timings (
+                job_id TEXT PRIMARY KEY,
+                created_at REAL NOT NULL,
+                file_type TEXT,
+                outcome TEXT,
+                total_ms REAL,
+                timings TEXT NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_job_timings_created ON job_timings(created_at)")
+        self._conn.commit()
+
+    def record(self, job_id: str, file_type: str, outcome: str, timings: Dict[str, Any]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_timings VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, time.time(), file_type, outcome, timings.get("total_ms"), json.dumps(timings)),
+            )
+            self._inserts += 1
+            if self._inserts % self.PRUNE_EVERY == 0:
+                self._conn.execute(
+                    "DELETE FROM job_timings WHERE job_id NOT IN "
+                    "(SELECT job_id FROM job_timings ORDER BY created_at DESC LIMIT ?)",
+                    (self.max_rows,),
+                )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT job_id, created_at, file_type, outcome, timings FROM job_timings WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def query(
+        self,
+        limit: int = 50,
+        file_type: Optional[str] = None,
+        min_total_ms: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """Most recent jobs first, optionally filtered by file type / minimum total time."""
+        sql = "SELECT job_id, created_at, file_type, outcome, timings FROM job_timings WHERE 1=1"
+        params: List[Any] = []
+        if file_type:
+            sql += " AND file_type = ?"
+            params.append(file_type)
+        if min_total_ms is not None:
+            sql += " AND total_ms >= ?"
+            params.append(min_total_ms)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    @staticmethod
+    def _row_to_dict(row) -> Dict[str, Any]:
+        job_id, created_at, file_type, outcome, timings = row
+        return {
+            "job_id": job_id,
+            "created_at": created_at,
+            "file_type": file_type,
+            "outcome": outcome,
+            "timings": json.loads(timings),
+        }
+
+
+_store: Optional[TimingStore] = None
+
+
+def get_timing_store() -> TimingStore:
+    """Get or create the process-wide timing store."""
+    global _store
+    if _store is None:
+        _store = TimingStore(TIMINGS_DB_PATH)
+        logger.info(f"Job timing store at {TIMINGS_DB_PATH}")
+    return _store
+
+
+def save_job_timings(job_id: str, file_type: str, outcome: str, timings: Dict[str, Any]):
+    """Log and persist a job's timings; never fails the request."""
+    logger.info("⏱️  Job %s timings (%s): %s", job_id, outcome, timings)
+    try:
+        get_timing_store().record(job_id, file_type, outcome, timings)
+    except Exception as e:
+        logger.warning(f"Failed to store timings for job {job_id}: {e}")
@@ -0,0 +1,158 @@
+# app/tracing.py
+"""
+OpenTelemetry tracing for the extraction pipeline.
+
+Spans: `upload` (one per request, carries job_id) > one span per pipeline
+stage (save, form_template, extract_text, classify, llm, validate, see
+JobTimings.stage) > `ocr_page` for each page on the OCR pool and
+`call_azure` (with token usage) for the LLM request. Spans FastAPI emits
+for the request itself, if any, become the parents of `upload`.
+
+Tracing is off unless TRACING_ENABLED=true; the opentelemetry API then hands
+out no-op spans. Exporters (TRACING_EXPORTER):
+
+- file: one JSON span per line in TRACE_FILE (default)
+- otlp: OTLP/HTTP to OTEL_EXPORTER_OTLP_ENDPOINT (a collector, Jaeger, ...);
+  needs opentelemetry-exporter-otlp-proto-http
+- console: spans printed to stdout
+
+Render a per-job waterfall from a trace file with:
+    python -m app.tracing waterfall logs/traces.jsonl [--job-id <job_id>]
+"""
+import argparse
+import json
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from opentelemetry import trace
+
+from .config import TRACING_ENABLED, TRACING_EXPORTER, TRACE_FILE, TRACING_SERVICE_NAME
+from app.log import logger
+
+tracer = trace.get_tracer("medical-referral-extractor")
+
+_provider = None
+_trace_file = None
+
+
+def configure_tracing():
+    """Install the SDK tracer provider and exporter (no-op unless TRACING_ENABLED)."""
+    global _provider, _trace_file
+    if not TRACING_ENABLED or _provider is not None:
+        return
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+    if TRACING_EXPORTER == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            raise RuntimeError(
+                "opentelemetry-exporter-otlp-proto-http is not installed. "
+                "Install with: pip install opentelemetry-exporter-otlp-proto-http"
+            )
+        exporter = OTLPSpanExporter()
+    elif TRACING_EXPORTER == "console":
+        exporter = ConsoleSpanExporter()
+    else:
+        TRACE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        _trace_file = open(TRACE_FILE, "a", encoding="utf-8")
+        exporter = ConsoleSpanExporter(
+            out=_trace_file,
+            formatter=lambda span: span.to_json(indent=None) + "\n",
+        )
+
+    _provider = TracerProvider(resource=Resource.create({"service.name": TRACING_SERVICE_NAME}))
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(_provider)
+    logger.info(f"Tracing enabled (exporter: {TRACING_EXPORTER})")
+
+
+def shutdown_tracing():
+    """Flush pending spans and close the exporter."""
+    global _provider, _trace_file
+    if _provider is not None:
+        _provider.shutdown()
+        _provider = None
+    if _trace_file is not None:
+        _trace_file.close()
+        _trace_file = None
+
+
+# -------------------------
+# Waterfall rendering
+# -------------------------
+def load_spans(path: str) -> List[Dict[str, Any]]:
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                spans.append(json.loads(line))
+    return spans
+
+
+def _time_ns(value: str) -> int:
+    # SDK JSON timestamps look like 2026-01-02T03:04:05.123456Z
+    from datetime import datetime, timezone
+    dt = datetime.strptime(value.rstrip("Z"), "%Y-%m-%dT%H:%M:%S.%f").replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1_000_000_000)
+
+
+def render_waterfall(spans: List[Dict[str, Any]], job_id: Optional[str] = None, width: int = 60) -> str:
+    """Text waterfall (one bar per span, indented by depth) for each trace."""
+    traces = defaultdict(list)
+    for span in spans:
+        traces[span["context"]["trace_id"]].append(span)
+
+    out = []
+    for trace_id, trace_spans in traces.items():
+        root = next((s for s in trace_spans if not s.get("parent_id")), None)
+        if root is None:
+            continue
+        root_job = next(
+            (s["attributes"]["job_id"] for s in trace_spans if "job_id" in s.get("attributes", {})),
+            None,
+        )
+        if job_id and root_job != job_id:
+            continue
+        t0 = _time_ns(root["start_time"])
+        total = max(1, _time_ns(root["end_time"]) - t0)
+        children = defaultdict(list)
+        for span in trace_spans:
+            children[span.get("parent_id")].append(span)
+
+        out.append(f"trace {trace_id} job {root_job} ({total / 1e6:.1f} ms)")
+
+        def walk(span, depth):
+            start = _time_ns(span["start_time"]) - t0
+            duration = _time_ns(span["end_time"]) - _time_ns(span["start_time"])
+            offset = int(start / total * width)
+            length = max(1, int(duration / total * width))
+            label = span["name"]
+            page = span.get("attributes", {}).get("page")
+            if page is not None:
+                label += f" {page}"
+            out.append(f"  {'  ' * depth}{label:<{24 - 2 * depth}} |{' ' * offset}{'█' * length:<{width - offset}}| {duration / 1e6:8.1f} ms")
+            for child in sorted(children[span["context"]["span_id"]], key=lambda s: s["start_time"]):
+                walk(child, depth + 1)
+
+        walk(root, 0)
+        out.append("")
+    return "\n".join(out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect exported traces")
+    sub = parser.add_subparsers(dest="command", required=True)
+    waterfall = sub.add_parser("waterfall", help="Print a per-job span waterfall")
+    waterfall.add_argument("trace_file")
+    waterfall.add_argument("--job-id")
+    args = parser.parse_args(argv)
+
+    print(render_waterfall(load_spans(args.trace_file), job_id=args.job_id))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,28 @@
 import os
-import shutil
 import uuid
-import tempfile
+import hashlib
 from pathlib import Path
+from typing import Tuple, Union
 from fastapi import UploadFile, HTTPException
 from .config import (
     UPLOAD_DIR, 
     USE_BLOB_STORAGE, 
-    AZURE_STORAGE_CONNECTION_STRING,
-    AZURE_BLOB_CONTAINER
+    MAX_FILE_SIZE,
+    UPLOAD_CHUNK_SIZE,
+    IN_MEMORY_UPLOAD_MAX_BYTES
 )
 from app.log import logger
 
-# Lazy import Azure SDK (only when needed)
-_blob_service_client = None
-
-def get_blob_service_client():
-    """Get or create Azure Blob Service Client (lazy initialization)."""
-    global _blob_service_client
-    if _blob_service_client is None:
-        try:
-            from azure.storage.blob import BlobServiceClient
-            _blob_service_client = BlobServiceClient.from_connection_string(
-                AZURE_STORAGE_CONNECTION_STRING
-            )
-            logger.info("Azure Blob Service Client initialized")
-        except ImportError:
-            raise RuntimeError(
-                "azure-storage-blob is not installed. "
-                "Install with: pip install azure-storage-blob"
-            )
-        except Exception as e:
-            logger.error(f"Failed to initialize Blob Service Client: {e}")
-            raise
-    return _blob_service_client
+# Azure Blob access lives in blob_storage
+from .blob_storage import get_blob_container_client, get_blob_archiver
+from .content_store import get_content_store
+from . import metrics
 
 # Supported file extensions
 SUPPORTED_EXTENSIONS = {
     'pdf': 'pdf',
+    'tif': 'tiff',
+    'tiff': 'tiff',
     'jpg': 'image',
     'jpeg': 'image',
     'png': 'image',
@@ -46,10 +31,13 @@ SUPPORTED_EXTENSIONS = {
     'doc': 'word'
 }
 
+# File types whose extractors can read straight from memory
+IN_MEMORY_FILE_TYPES = {'text', 'word', 'image'}
+
 def get_file_type(filename: str) -> str:
     """
     Determine file type from filename.
-    Returns: 'pdf', 'image', 'text', 'word', or raises HTTPException
+    Returns: 'pdf', 'tiff', 'image', 'text', 'word', or raises HTTPException
     """
     ext = filename.lower().split('.')[-1]
     if ext not in SUPPORTED_EXTENSIONS:
@@ -60,20 +48,92 @@ def get_file_type(filename: str) -> str:
         )
     return SUPPORTED_EXTENSIONS[ext]
 
-def save_upload_tmp(upload_file: UploadFile):
+def stream_upload_to_file(upload_file: UploadFile, dest: Path) -> Tuple[int, str]:
+    """
+    Copy an upload to `dest` in UPLOAD_CHUNK_SIZE chunks, hashing as it goes.
+    
+    Only one chunk is held in memory at a time. The copy is aborted (and the
+    partial file removed) as soon as it exceeds MAX_FILE_SIZE.
+    
+    Returns:
+        tuple: (size_in_bytes, sha256_hexdigest)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(dest, 'wb') as f:
+            while True:
+                chunk = upload_file.file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_FILE_SIZE:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File too large. Maximum size is {MAX_FILE_SIZE // (1024 * 1024)} MB"
+                    )
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        cleanup_path(str(dest))
+        raise
+    return size, digest.hexdigest()
+
+def read_upload_to_memory(upload_file: UploadFile) -> Tuple[memoryview, str]:
+    """
+    Read a small upload into one buffer, hashing as it goes.
+    
+    Returns:
+        tuple: (content, sha256_hexdigest)
+    """
+    digest = hashlib.sha256()
+    buffer = bytearray()
+    while True:
+        chunk = upload_file.file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer += chunk
+        if len(buffer) > MAX_FILE_SIZE:
+            raise HTTPException(
+                status_code=413,
+                detail=f"File too large. Maximum size is {MAX_FILE_SIZE // (1024 * 1024)} MB"
+            )
+        digest.update(chunk)
+    return memoryview(buffer), digest.hexdigest()
+
+def _keep_in_memory(upload_file: UploadFile, file_type: str) -> bool:
+    """True for small uploads whose extractor can work from memory."""
+    size = getattr(upload_file, 'size', None)
+    return (
+        file_type in IN_MEMORY_FILE_TYPES
+        and size is not None
+        and size <= IN_MEMORY_UPLOAD_MAX_BYTES
+    )
+
+def save_upload_tmp(upload_file: UploadFile) -> Tuple[str, Union[str, memoryview], str, str]:
     """
     Save uploaded file (to Blob Storage in Azure, filesystem in local).
     
+    The upload is streamed to disk in chunks and rejected with 413 once it
+    exceeds MAX_FILE_SIZE, so large uploads never sit fully in memory. It is
+    then stored by SHA-256 in the content store: byte-identical uploads share
+    one local copy and one blob.
+    
+    Small TXT/DOCX/image uploads (up to IN_MEMORY_UPLOAD_MAX_BYTES) are not
+    written locally at all: their content is returned in memory and handed
+    to the extractors directly.
+    
     Returns:
-        tuple: (job_id, local_file_path, file_type)
+        tuple: (job_id, source, file_type, sha256) where source is the local
+        file path (str) or the in-memory content (memoryview)
         
     In Azure:
-        - File is uploaded to Blob Storage
-        - Local copy saved to /tmp for processing
-        - Local copy is cleaned up after processing
+        - File is streamed to the content store under UPLOAD_DIR
+        - New content is queued for background upload to Blob Storage
+        - The job's reference is released after processing
         
     In Local:
-        - File is saved directly to upload directory
+        - File is streamed to the content store under UPLOAD_DIR
     """
     if not upload_file.filename:
         logger.error("Upload file has no filename")
@@ -85,96 +145,104 @@ def save_upload_tmp(upload_file: UploadFile):
     
     # Generate unique job ID
     job_id = uuid.uuid4().hex
-    fname = f"{job_id}.{ext}"
     
-    # Read file content
+    if _keep_in_memory(upload_file, file_type):
+        try:
+            content, sha256 = read_upload_to_memory(upload_file)
+        except HTTPException:
+            logger.warning(f"Rejected upload {upload_file.filename}: larger than {MAX_FILE_SIZE} bytes")
+            raise
+        logger.info(f"Read file {upload_file.filename} into memory ({len(content)} bytes, job_id={job_id})")
+        if USE_BLOB_STORAGE:
+            _save_bytes_to_blob_storage(content, f"{sha256}.{ext}")
+        return job_id, content, file_type, sha256
+    
+    store = get_content_store()
+    tmp_path = store.root / f"{job_id}.{ext}.part"
+    
     try:
-        file_content = upload_file.file.read()
-        logger.info(f"Read file {upload_file.filename} ({len(file_content)} bytes)")
+        size, sha256 = stream_upload_to_file(upload_file, tmp_path)
+        path, is_new = store.add(tmp_path, sha256, ext, job_id)
+        metrics.CACHE_EVENTS.labels(cache="content_store", result="miss" if is_new else "hit").inc()
+        logger.info(f"Saved file {upload_file.filename} as {path.name} ({size} bytes, new={is_new}, job_id={job_id})")
+    except HTTPException:
+        logger.warning(f"Rejected upload {upload_file.filename}: larger than {MAX_FILE_SIZE} bytes")
+        raise
     except Exception as e:
-        logger.error(f"Failed to read uploaded file: {e}")
-        raise HTTPException(status_code=400, detail="Failed to read file")
+        logger.error(f"Failed to save uploaded file: {e}")
+        cleanup_path(str(tmp_path))
+        raise HTTPException(status_code=500, detail="Failed to save file")
+    
+    if USE_BLOB_STORAGE and is_new:
+        _save_to_blob_storage(path, path.name, job_id)
     
-    if USE_BLOB_STORAGE:
-        return _save_to_blob_storage(file_content, fname, job_id, file_type)
-    else:
-        return _save_to_local_filesystem(file_content, fname, job_id, file_type)
+    return job_id, str(path), file_type, sha256
 
-def _save_to_local_filesystem(file_content: bytes, fname: str, job_id: str, file_type: str):
-    """Save file to local filesystem."""
+def _save_to_blob_storage(path: Path, fname: str, job_id: str):
+    """
+    Queue a saved local file for archival to Azure Blob Storage.
+    
+    The upload runs in the background (see blob_storage.BlobArchiver), so
+    processing of the local copy starts without waiting for Azure.
+    """
     try:
-        path = UPLOAD_DIR / fname
-        with open(path, 'wb') as f:
-            f.write(file_content)
-        logger.info(f"Saved file locally: {path} (job_id={job_id})")
-        return job_id, str(path), file_type
+        get_blob_archiver().submit(path, fname)
+        logger.info(f"Queued for blob archival: {fname}")
     except Exception as e:
-        logger.error(f"Failed to save file locally: {e}")
-        raise HTTPException(status_code=500, detail="Failed to save file")
+        logger.error(f"Failed to queue blob archival for {fname}: {e}")
+        cleanup_path(str(path), job_id)
+        raise HTTPException(status_code=500, detail="Failed to archive file")
 
-def _save_to_blob_storage(file_content: bytes, fname: str, job_id: str, file_type: str):
-    """Save file to Azure Blob Storage (with local temp copy for processing)."""
+def _save_bytes_to_blob_storage(content: memoryview, fname: str):
+    """Queue in-memory content for archival to Azure Blob Storage."""
     try:
-        # Upload to Azure Blob Storage
-        blob_service_client = get_blob_service_client()
-        container_client = blob_service_client.get_container_client(AZURE_BLOB_CONTAINER)
-        
-        logger.info(f"Uploading to Azure Blob Storage: {fname}")
-        container_client.upload_blob(fname, file_content, overwrite=True)
-        logger.info(f"Successfully uploaded to blob storage: {fname}")
-        
-        # Save local temp copy for processing
-        # (Azure Blob Storage can't be accessed like a file, need local copy)
-        temp_path = Path(tempfile.gettempdir()) / fname
-        with open(temp_path, 'wb') as f:
-            f.write(file_content)
-        logger.info(f"Saved temp copy for processing: {temp_path}")
-        
-        return job_id, str(temp_path), file_type
-        
-    except ImportError as e:
-        logger.error("azure-storage-blob package not installed")
-        raise HTTPException(
-            status_code=500,
-            detail="Azure Blob Storage is not properly configured"
-        )
+        get_blob_archiver().submit_bytes(content, fname)
+        logger.info(f"Queued for blob archival: {fname}")
     except Exception as e:
-        logger.error(f"Failed to save to Azure Blob Storage: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail=f"Failed to upload file: {str(e)}"
-        )
+        logger.error(f"Failed to queue blob archival for {fname}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to archive file")
 
-def cleanup_path(path: str):
+def cleanup_path(path: str, job_id: str = None):
     """
     Clean up temporary files.
     
-    In Azure: Deletes temp file (blob storage file remains)
-    In Local: Deletes upload file
+    For content-store objects, releases `job_id`'s reference; the object
+    is deleted once no job references it (its blob remains).
+    Other paths are deleted directly.
     """
     try:
-        if path and os.path.exists(path):
+        store = get_content_store()
+        if path and job_id and store.contains(path):
+            if store.release(Path(path), job_id):
+                logger.debug(f"Cleaned up file: {path}")
+        elif path and os.path.exists(path):
             os.remove(path)
             logger.debug(f"Cleaned up file: {path}")
     except Exception as e:
         logger.warning(f"Failed to cleanup {path}: {e}")
 
 def cleanup_blob_storage(blob_name: str):
-    """Delete file from Azure Blob Storage (optional cleanup)."""
+    """
+    Delete file from Azure Blob Storage (optional cleanup).
+    
+    Blobs are named by content hash and shared by identical uploads, so the
+    blob is kept while any job still references that content.
+    """
     if not USE_BLOB_STORAGE:
         return
     
+    if get_content_store().references(blob_name):
+        logger.debug(f"Blob {blob_name} still referenced; not deleting")
+        return
+    
     try:
-        blob_service_client = get_blob_service_client()
-        container_client = blob_service_client.get_container_client(AZURE_BLOB_CONTAINER)
-        container_client.delete_blob(blob_name)
+        get_blob_container_client().delete_blob(blob_name)
         logger.info(f"Deleted blob from storage: {blob_name}")
     except Exception as e:
         logger.warning(f"Failed to delete blob {blob_name}: {e}")
 
 ##----------------------DEV---------------------------
 # import os
-# import shutil
 # import uuid
 # from pathlib import Path
 # from fastapi import UploadFile, HTTPException
@@ -220,10 +288,6 @@ def cleanup_blob_storage(blob_name: str):
 #     fname = f"{job_id}.{ext}"
 #     path = UPLOAD_DIR / fname
     
-#     # Save file
-#     with open(path, 'wb') as f:
-#         shutil.copyfileobj(upload_file.file, f)
-    
 #     return job_id, str(path), file_type
 
 # def cleanup_path(path):
@@ -0,0 +1,86 @@
+# app/warmup.py
+"""
+Optional warm-up of the processing stages at startup.
+
+Importing the app loads only what every request needs. The OCR stack
+(pytesseract, pdf2image, PIL), python-docx and the openai SDK are imported
+by the stage that first uses them, so a cold instance starts quickly but
+its first request of each file type pays that import. WARMUP moves the cost
+back to startup for the stages a deployment actually serves, e.g.
+
+    WARMUP=pdf,llm      # fax/PDF service with a live LLM
+    WARMUP=all
+
+Each target is timed and logged; a target that fails to load is logged and
+skipped, so warm-up never keeps the app from starting.
+"""
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+from .config import WARMUP
+from app.log import logger
+
+
+def _warm_ocr():
+    import pytesseract  # noqa: F401
+    from PIL import Image  # noqa: F401
+
+    from .text_extractor import get_ocr_executor
+
+    get_ocr_executor()
+
+
+def _warm_pdf():
+    import pdf2image  # noqa: F401
+
+    _warm_ocr()
+
+
+def _warm_docx():
+    import docx  # noqa: F401
+
+
+def _warm_llm():
+    from . import gpt_client
+
+    if hasattr(gpt_client, "get_client"):
+        gpt_client.get_client()
+
+
+def _warm_templates():
+    from .form_templates import load_templates
+
+    load_templates()
+
+
+TARGETS: Dict[str, Callable[[], None]] = {
+    "pdf": _warm_pdf,
+    "tiff": _warm_ocr,
+    "image": _warm_ocr,
+    "docx": _warm_docx,
+    "llm": _warm_llm,
+    "templates": _warm_templates,
+}
+
+
+def warm_up(targets: Optional[Iterable[str]] = None) -> Dict[str, float]:
+    """Load the given stages (default: WARMUP); returns milliseconds per target."""
+    targets = list(WARMUP if targets is None else targets)
+    if "all" in targets:
+        targets = list(TARGETS)
+    timings = {}
+    for target in targets:
+        warm = TARGETS.get(target)
+        if warm is None:
+            logger.warning("Unknown warm-up target %r (known: %s)", target, ", ".join(TARGETS))
+            continue
+        start = time.perf_counter()
+        try:
+            warm()
+        except Exception as e:
+            logger.warning("Warm-up of %s failed: %s", target, e)
+            continue
+        timings[target] = round((time.perf_counter() - start) * 1000, 1)
+    if timings:
+        logger.info("Warm-up done: %s", ", ".join(f"{t} {ms} ms" for t, ms in timings.items()))
+    return timings
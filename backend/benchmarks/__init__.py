@@ -0,0 +1 @@
+"""Benchmark scripts for the extraction pipeline (run from backend/ with python -m)."""
@@ -0,0 +1,335 @@
+# benchmarks/accuracy_suite.py
+"""
+Accuracy + latency regression suite: golden extractions for "Test Files", per pipeline config.
+
+benchmarks/golden/<file>.json holds the expected ReferralExtraction for each
+test document. Every document with a golden file is posted to /upload
+in-process and its `extracted` result is scored field by field:
+
+- each non-null scalar (patient.full_name, referral.referral_phone, ...) and
+  each list item (treatments[], diagnoses.primary_diagnoses[], ...) is one
+  field; values are compared case- and whitespace-insensitively, dates in
+  any common format
+- precision = correct / fields extracted, recall = correct / golden fields
+- document_meta.title, document_meta.pages and signature are not scored
+
+Each configuration (a set of env overrides, see CONFIGS or --config) runs in
+its own process, because the pipeline reads its settings at import. The
+report puts precision/recall/F1 next to latency p50/p95 and LLM tokens per
+configuration, plus the fields most often missed.
+
+The LLM is replayed from benchmarks/llm_fixtures (LLM_MODE=replay, see
+app/llm_fixtures.py), so the suite runs offline and deterministically.
+Fixtures are keyed on the uploaded document and the schema version, not on
+the prompt, so one recording replays under every configuration even where
+OCR settings change the text the model would have seen. A document without
+a fixture is scored as a failure (nothing extracted) and reported as a
+fixture miss. Record real responses with LLM_MODE=record and
+LLM_FIXTURE_DIR=benchmarks/llm_fixtures (LLM_RECORD_SCRUB_PHI=false for
+these synthetic documents, so values can be scored). --llm live calls
+Azure OpenAI instead.
+
+--seed-fixtures writes a fixture from the golden file for every document
+that has none. That is a perfect model, so it scores F1 1.0 by
+construction and measures only the pipeline around the LLM. Seeded
+fixtures are marked as such, and the report counts recorded, seeded and
+missing fixtures per configuration, so a seeded score is not mistaken for
+model accuracy.
+
+PDFs need tesseract and poppler; without them they are skipped.
+
+Usage (from backend/):
+    python -m benchmarks.accuracy_suite [--config default] [--config fast=MAX_PAGES=2,EARLY_EXIT_ENABLED=true]
+        [--llm replay|live] [--min-f1 0.95] [--output report.json] [--seed-fixtures]
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+TEST_FILES_DIR = BACKEND_DIR.parent / "Test Files"
+GOLDEN_DIR = Path(__file__).resolve().parent / "golden"
+FIXTURE_DIR = Path(__file__).resolve().parent / "llm_fixtures"
+OCR_EXTENSIONS = {".pdf", ".tif", ".tiff", ".jpg", ".jpeg", ".png"}
+
+CONFIGS = {
+    "default": {},
+    "no_page_filter": {"PAGE_FILTER_ENABLED": "false"},
+    "no_form_templates": {"FORM_TEMPLATES_ENABLED": "false"},
+    "early_exit": {"EARLY_EXIT_ENABLED": "true"},
+}
+UNSCORED_FIELDS = {"document_meta.title", "document_meta.pages", "signature"}
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%d %B %Y", "%d %b %Y", "%B %d, %Y")
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+# -------------------------
+# Scoring
+# -------------------------
+def normalize(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    text = re.sub(r"\s+", " ", str(value)).strip().rstrip(".").casefold()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return text
+
+
+def flatten(data, prefix=""):
+    """Counter of (field, normalized value) for every non-empty leaf."""
+    fields = Counter()
+    if isinstance(data, dict):
+        for key, value in data.items():
+            fields.update(flatten(value, f"{prefix}{key}."))
+    elif isinstance(data, list):
+        for item in data:
+            if item not in (None, ""):
+                fields[(prefix.rstrip(".") + "[]", normalize(item))] += 1
+    elif data not in (None, ""):
+        fields[(prefix.rstrip("."), normalize(data))] += 1
+    return Counter({k: v for k, v in fields.items() if k[0].replace("[]", "") not in UNSCORED_FIELDS})
+
+
+def score(golden, extracted):
+    expected, actual = flatten(golden), flatten(extracted or {})
+    correct = sum((expected & actual).values())
+    missed = Counter()
+    for (field, _), count in (expected - actual).items():
+        missed[field] += count
+    return {
+        "expected": sum(expected.values()),
+        "extracted": sum(actual.values()),
+        "correct": correct,
+        "missed_fields": dict(missed),
+    }
+
+
+def prf(correct, extracted, expected):
+    precision = correct / extracted if extracted else 0.0
+    recall = correct / expected if expected else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": round(precision, 4), "recall": round(recall, 4), "f1": round(f1, 4)}
+
+
+# -------------------------
+# Worker: one configuration, in its own process
+# -------------------------
+def run_documents(documents, seed_fixtures):
+    import logging
+    from fastapi.testclient import TestClient
+    from prometheus_client import REGISTRY
+    from app import llm_fixtures
+    from app.config import LLM_JSON_MODE
+    from app.main import app
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    def tokens(kind):
+        return REGISTRY.get_sample_value("referral_llm_tokens_total", {"kind": kind}) or 0
+
+    current = {}
+    load_fixture = llm_fixtures.load_fixture
+
+    def load_tracked(key, fixture_dir=None):
+        """load_fixture, noting per document whether it was recorded, seeded or missing."""
+        try:
+            fixture = load_fixture(key, fixture_dir)
+        except llm_fixtures.FixtureNotFound:
+            if not seed_fixtures:
+                current["fixtures"].append("missing")
+                raise
+            response = json.dumps(current["golden"], indent=2, ensure_ascii=False)
+            if not LLM_JSON_MODE:
+                # Without JSON mode the model fences its answer
+                response = "```json\n" + response + "\n```"
+            llm_fixtures.save_fixture(key, response, label=current["name"], fixture_dir=fixture_dir,
+                                      schema_version=llm_fixtures.SCHEMA_VERSION, seeded=True)
+            fixture = load_fixture(key, fixture_dir)
+        current["fixtures"].append("seeded" if fixture.get("seeded") else "recorded")
+        return fixture
+
+    llm_fixtures.load_fixture = load_tracked
+
+    # A failing upload is scored, not raised
+    client = TestClient(app, raise_server_exceptions=False)
+    results = []
+    for name in documents:
+        current.update(name=name, golden=json.loads((GOLDEN_DIR / f"{name}.json").read_text(encoding="utf-8")),
+                       fixtures=[])
+        before = tokens("prompt"), tokens("completion")
+        start = time.perf_counter()
+        response = client.post("/upload", files={"file": (name, (TEST_FILES_DIR / name).read_bytes())})
+        latency_ms = (time.perf_counter() - start) * 1000
+        try:
+            body = response.json()
+        except ValueError:
+            body = {"error": response.text[:200]}
+        fixture = "missing" if "missing" in current["fixtures"] else (current["fixtures"] or [None])[0]
+        error = body.get("error") or body.get("detail") or body.get("validation_warning")
+        if fixture == "missing":
+            error = f"No recorded LLM response (fixture miss): {error}"
+        results.append({
+            "document": name,
+            "status": response.status_code,
+            "error": error,
+            "fixture": fixture,
+            "latency_ms": round(latency_ms, 1),
+            "stages_ms": body.get("timings", {}).get("stages", {}),
+            "prompt_tokens": tokens("prompt") - before[0],
+            "completion_tokens": tokens("completion") - before[1],
+            "extracted": body.get("extracted"),
+        })
+    return results
+
+
+def run_config(name, overrides, documents, llm_mode, seed_fixtures):
+    """Run the documents under one configuration in a fresh interpreter."""
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            LLM_MODE=llm_mode,
+            LLM_FIXTURE_DIR=str(FIXTURE_DIR),
+            UPLOAD_DIR=str(Path(tmp) / "uploads"),
+            TIMINGS_DB_PATH=str(Path(tmp) / "timings.db"),
+            LOG_LEVEL="WARNING",
+        )
+        if llm_mode == "replay":
+            env.setdefault("AZURE_OPENAI_API_KEY", "skip")
+        env.update(overrides)
+        request = json.dumps({"documents": documents, "seed_fixtures": seed_fixtures})
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.accuracy_suite", "--worker"],
+            input=request, capture_output=True, text=True, cwd=BACKEND_DIR, env=env,
+        )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Config {name} failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout)
+
+
+# -------------------------
+# Report
+# -------------------------
+def summarize(name, overrides, results):
+    totals = Counter()
+    missed = Counter()
+    documents = []
+    for result in results:
+        golden = json.loads((GOLDEN_DIR / f"{result['document']}.json").read_text(encoding="utf-8"))
+        ok = result["status"] == 200 and result["extracted"] is not None
+        scored = score(golden, result["extracted"] if ok else {})
+        totals.update({k: scored[k] for k in ("expected", "extracted", "correct")})
+        missed.update(scored["missed_fields"])
+        documents.append({
+            "document": result["document"],
+            "status": result["status"],
+            "error": result["error"],
+            "fixture": result["fixture"],
+            "latency_ms": result["latency_ms"],
+            "tokens": result["prompt_tokens"] + result["completion_tokens"],
+            **prf(scored["correct"], scored["extracted"], scored["expected"]),
+        })
+
+    latencies = [r["latency_ms"] for r in results]
+    llm_ms = [r["stages_ms"]["llm"] for r in results if "llm" in r["stages_ms"]]
+    return {
+        "config": name,
+        "overrides": overrides,
+        "documents": len(results),
+        "errors": sum(1 for d in documents if d["status"] != 200 or d["error"]),
+        # LLM answers replayed from real recordings / from golden files; missing ones scored as failures
+        "fixtures": dict(Counter(d["fixture"] for d in documents if d["fixture"])),
+        **prf(totals["correct"], totals["extracted"], totals["expected"]),
+        "latency_ms": {"p50": round(percentile(latencies, 50), 1), "p95": round(percentile(latencies, 95), 1)},
+        "llm_ms": {"p50": round(percentile(llm_ms, 50), 1), "p95": round(percentile(llm_ms, 95), 1)} if llm_ms else None,
+        "tokens": {
+            "prompt": sum(r["prompt_tokens"] for r in results),
+            "completion": sum(r["completion_tokens"] for r in results),
+        },
+        "most_missed_fields": dict(missed.most_common(10)),
+        "per_document": documents,
+    }
+
+
+def select_documents(require_ocr):
+    can_ocr = bool(shutil.which("tesseract") and shutil.which("pdftoppm"))
+    documents, skipped = [], []
+    for golden in sorted(GOLDEN_DIR.glob("*.json")):
+        name = golden.stem
+        if not (TEST_FILES_DIR / name).exists():
+            skipped.append({"document": name, "reason": "not in Test Files"})
+        elif Path(name).suffix.lower() in OCR_EXTENSIONS and not can_ocr:
+            if require_ocr:
+                raise SystemExit(f"{name} needs OCR but tesseract/pdftoppm are not installed")
+            skipped.append({"document": name, "reason": "tesseract/pdftoppm not installed"})
+        else:
+            documents.append(name)
+    return documents, skipped
+
+
+def parse_config(spec):
+    if spec in CONFIGS:
+        return spec, CONFIGS[spec]
+    name, _, assignments = spec.partition("=")
+    overrides = dict(a.split("=", 1) for a in assignments.split(",") if a)
+    return name, overrides
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--config", action="append",
+                        help=f"a named config ({', '.join(CONFIGS)}) or NAME=VAR=VALUE,...; repeatable (default: all named)")
+    parser.add_argument("--llm", choices=("replay", "live"), default="replay")
+    parser.add_argument("--require-ocr", action="store_true", help="fail instead of skipping PDFs")
+    parser.add_argument("--min-f1", type=float, help="exit 1 if any config scores below this F1")
+    parser.add_argument("--seed-fixtures", action="store_true", help="write missing fixtures from the golden files")
+    parser.add_argument("--output", help="also write the JSON report here")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        sys.path.insert(0, str(BACKEND_DIR))
+        request = json.load(sys.stdin)
+        print(json.dumps(run_documents(request["documents"], request["seed_fixtures"])))
+        return
+
+    documents, skipped = select_documents(args.require_ocr)
+    configs = [parse_config(spec) for spec in (args.config or CONFIGS)]
+    reports = []
+    for name, overrides in configs:
+        results = run_config(name, overrides, documents, args.llm, args.seed_fixtures)
+        reports.append(summarize(name, overrides, results))
+        summary = reports[-1]
+        print(f"{name}: P={summary['precision']} R={summary['recall']} F1={summary['f1']} "
+              f"p95={summary['latency_ms']['p95']} ms errors={summary['errors']} fixtures={summary['fixtures']}",
+              file=sys.stderr)
+        if summary["fixtures"].get("seeded"):
+            print(f"{name}: {summary['fixtures']['seeded']} answers replayed from seeded fixtures "
+                  f"(golden output, not a model): their score is the pipeline's, not the LLM's", file=sys.stderr)
+
+    report = {"llm": args.llm, "documents": documents, "skipped": skipped, "configs": reports}
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    if args.min_f1 is not None and any(r["f1"] < args.min_f1 for r in reports):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
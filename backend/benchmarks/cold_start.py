@@ -0,0 +1,145 @@
+# benchmarks/cold_start.py
+"""
+Cold-start benchmark: import time, startup and first request of a fresh backend process.
+
+Each run starts a new interpreter with `python -X importtime`, imports
+app.main, runs the startup hooks (including the WARMUP targets) and posts
+one document to /upload in-process (LLM stubbed). Reported per scenario
+(median over --runs):
+
+- import_ms: `import app.main`
+- startup_ms: startup hooks, i.e. warm-up
+- first_request_ms: the first /upload, which pays any import left lazy
+- time_to_first_response_ms: the sum, what a scaled-out instance's first
+  caller waits on top of interpreter start
+
+Scenarios are one per --warmup value (default: none and all) plus "eager",
+which imports the OCR stack, python-docx and openai up front the way the
+app used to. The report also lists the slowest modules from -X importtime
+and which heavy packages `import app.main` alone loads.
+
+Usage (from backend/):
+    python -m benchmarks.cold_start [--runs 5] [--warmup "" --warmup all] [--document referral_01.txt] [--top 15]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+TEST_FILES_DIR = BACKEND_DIR.parent / "Test Files"
+HEAVY_MODULES = ("pytesseract", "pdf2image", "PIL", "docx", "numpy", "openai")
+
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+if {eager}:
+    for name in {heavy}:
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+import app.main
+t1 = time.perf_counter()
+loaded = sorted(m for m in {heavy} if m in sys.modules)
+from fastapi.testclient import TestClient
+with TestClient(app.main.app) as client:
+    t2 = time.perf_counter()
+    with open({document!r}, "rb") as f:
+        response = client.post("/upload", files={{"file": ({name!r}, f.read())}})
+    t3 = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (t1 - t0) * 1000,
+    "startup_ms": (t2 - t1) * 1000,
+    "first_request_ms": (t3 - t2) * 1000,
+    "status": response.status_code,
+    "loaded_after_import": loaded,
+}}))
+"""
+
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us)] from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((module.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def run_once(document, warmup, eager, env):
+    code = CHILD.format(eager=eager, heavy=HEAVY_MODULES, document=str(document), name=document.name)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_DIR, env=dict(env, WARMUP=warmup), capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    return json.loads(proc.stdout.strip().splitlines()[-1]), parse_importtime(proc.stderr)
+
+
+def median(runs, key):
+    return round(statistics.median(r[key] for r in runs), 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warmup", action="append", help='WARMUP value per scenario (repeatable; default "" and "all")')
+    parser.add_argument("--document", default="referral_01.txt", help="file in Test Files for the first request")
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to list")
+    args = parser.parse_args(argv)
+
+    document = TEST_FILES_DIR / args.document
+    tmp = tempfile.TemporaryDirectory()
+    env = dict(
+        os.environ,
+        AZURE_OPENAI_API_KEY="skip",
+        UPLOAD_DIR=str(Path(tmp.name) / "uploads"),
+        TIMINGS_DB_PATH=str(Path(tmp.name) / "timings.db"),
+        LOG_LEVEL="WARNING",
+    )
+
+    scenarios = [(f"warmup={w or 'none'}", w, False) for w in (args.warmup or ["", "all"])]
+    scenarios.append(("eager", "", True))
+
+    report = {"document": args.document, "runs": args.runs, "scenarios": []}
+    for name, warmup, eager in scenarios:
+        runs, modules = [], None
+        for _ in range(args.runs):
+            result, imports = run_once(document, warmup, eager, env)
+            runs.append(result)
+            modules = modules or imports
+        for run in runs:
+            run["total_ms"] = run["import_ms"] + run["startup_ms"] + run["first_request_ms"]
+        report["scenarios"].append({
+            "scenario": name,
+            "import_ms": median(runs, "import_ms"),
+            "startup_ms": median(runs, "startup_ms"),
+            "first_request_ms": median(runs, "first_request_ms"),
+            "time_to_first_response_ms": median(runs, "total_ms"),
+            "status": sorted({r["status"] for r in runs}),
+            "loaded_after_import": runs[0]["loaded_after_import"],
+        })
+        if name == scenarios[0][0]:
+            slowest = sorted(modules, key=lambda m: m[1], reverse=True)[:args.top]
+            report["slowest_imports_self_ms"] = [
+                {"module": m, "self_ms": round(s / 1000, 1), "cumulative_ms": round(c / 1000, 1)}
+                for m, s, c in slowest
+            ]
+            report["app_modules_cumulative_ms"] = {
+                m: round(c / 1000, 1) for m, s, c in modules if m == "app" or m.startswith("app.")
+            }
+
+    print(json.dumps(report, indent=2))
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+# benchmarks/e2e_pipeline.py
+"""
+End-to-end benchmark: every document in "Test Files" through the real /upload pipeline.
+
+Documents go through the app in-process: save, form templates, text
+extraction / OCR, classification, validation. The LLM is the local stub
+(AZURE_OPENAI_API_KEY=skip) with a fixed delay of --llm-latency-ms in
+place of the Azure round trip, so runs are repeatable. With --llm replay
+the recorded responses in benchmarks/llm_fixtures are replayed instead
+(same delay), so parsing and validation see realistic model output. PDFs need tesseract
+and poppler; without them they are listed under "skipped" (or the run fails
+with --require-ocr).
+
+For each concurrency level the whole corpus is posted --rounds times from
+that many client threads. Reported per level:
+- latency p50/p95 (client side) and per-stage p50/p95 (the response `timings`)
+- throughput (requests/s) and OCR throughput (pages/s)
+- peak RSS of this process (reset per level where the kernel allows) and of
+  OCR subprocesses (tesseract, pdftoppm)
+
+Save a run with --output and compare a later run against it with --baseline:
+a level whose p95 latency rose, or whose throughput fell, by more than
+--tolerance is reported as a regression and the exit status is 1.
+
+Usage (from backend/):
+    python -m benchmarks.e2e_pipeline [--concurrency 1,2,4] [--rounds 3] [--llm stub|replay] [--llm-latency-ms 800]
+        [--output run.json] [--baseline previous.json] [--tolerance 0.15]
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+FIXTURE_DIR = Path(__file__).resolve().parent / "llm_fixtures"
+TEST_FILES_DIR = BACKEND_DIR.parent / "Test Files"
+OCR_EXTENSIONS = {".pdf", ".tif", ".tiff", ".jpg", ".jpeg", ".png"}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(values):
+    return {"p50": round(percentile(values, 50), 1), "p95": round(percentile(values, 95), 1)}
+
+
+def ocr_available() -> bool:
+    return bool(shutil.which("tesseract") and shutil.which("pdftoppm"))
+
+
+def load_documents(supported, require_ocr):
+    documents, skipped = [], []
+    can_ocr = ocr_available()
+    for path in sorted(TEST_FILES_DIR.iterdir()):
+        ext = path.suffix.lower()
+        if not path.is_file() or ext not in supported:
+            continue
+        if ext in OCR_EXTENSIONS and not can_ocr:
+            if require_ocr:
+                raise SystemExit(f"{path.name} needs OCR but tesseract/pdftoppm are not installed")
+            skipped.append({"file": path.name, "reason": "tesseract/pdftoppm not installed"})
+            continue
+        documents.append((path.name, path.read_bytes()))
+    return documents, skipped
+
+
+def reset_peak_rss() -> bool:
+    """Reset this process's VmHWM (Linux >= 4.0); False if not possible."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def pages_processed(body) -> int:
+    """Pages OCR'd for paged formats; one per document otherwise."""
+    pages = body.get("text_stats", {}).get("pages")
+    if pages:
+        return pages.get("ocr_pages", 0)
+    return 1
+
+
+def post(client, name, data):
+    start = time.perf_counter()
+    response = client.post("/upload", files={"file": (name, data)})
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    body = response.json() if response.headers.get("content-type", "").startswith("application/json") else {}
+    return name, response.status_code, elapsed_ms, body
+
+
+def run_level(client, documents, concurrency, rounds):
+    exact_peak = reset_peak_rss()
+    jobs = [doc for _ in range(rounds) for doc in documents]
+    latencies, stages, errors = [], defaultdict(list), defaultdict(int)
+    pages = 0
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda doc: post(client, *doc), jobs))
+    wall = time.perf_counter() - start
+
+    for name, status, elapsed_ms, body in results:
+        latencies.append(elapsed_ms)
+        if status != 200:
+            errors[f"{name}: HTTP {status}"] += 1
+            continue
+        pages += pages_processed(body)
+        for stage, ms in body.get("timings", {}).get("stages", {}).items():
+            stages[stage].append(ms)
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "errors": dict(errors),
+        "wall_s": round(wall, 2),
+        "throughput_rps": round(len(results) / wall, 2),
+        "pages": pages,
+        "pages_per_sec": round(pages / wall, 2),
+        "latency_ms": summarize(latencies),
+        "stages_ms": {stage: summarize(values) for stage, values in sorted(stages.items())},
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_rss_is_per_level": exact_peak,
+        "peak_child_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Regressions of `current` against `baseline`, matched by concurrency level."""
+    previous = {level["concurrency"]: level for level in baseline.get("levels", [])}
+    regressions = []
+    for level in current["levels"]:
+        before = previous.get(level["concurrency"])
+        if not before:
+            continue
+        p95, p95_before = level["latency_ms"]["p95"], before["latency_ms"]["p95"]
+        if p95 > p95_before * (1 + tolerance):
+            regressions.append(f"c={level['concurrency']}: p95 {p95_before} -> {p95} ms")
+        rps, rps_before = level["throughput_rps"], before["throughput_rps"]
+        if rps < rps_before * (1 - tolerance):
+            regressions.append(f"c={level['concurrency']}: throughput {rps_before} -> {rps} req/s")
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", default="1,2,4", help="comma-separated client thread counts")
+    parser.add_argument("--rounds", type=int, default=3, help="passes over the corpus per level")
+    parser.add_argument("--llm", choices=("stub", "replay"), default="stub")
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0, help="stub LLM delay per call")
+    parser.add_argument("--require-ocr", action="store_true", help="fail instead of skipping PDFs/images")
+    parser.add_argument("--output", help="also write the JSON report here")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression")
+    args = parser.parse_args(argv)
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+
+    revision = git_revision()  # before the app is imported: a forked child inherits our peak RSS
+    tmp = tempfile.TemporaryDirectory()
+    os.environ.update(
+        AZURE_OPENAI_API_KEY="skip",
+        LLM_MODE=args.llm,
+        LLM_STUB_LATENCY_MS=str(args.llm_latency_ms),
+        LLM_REPLAY_LATENCY=str(args.llm_latency_ms),
+        LLM_FIXTURE_DIR=str(FIXTURE_DIR),
+        UPLOAD_DIR=str(Path(tmp.name) / "uploads"),
+        TIMINGS_DB_PATH=str(Path(tmp.name) / "timings.db"),
+        LOG_LEVEL="WARNING",
+    )
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    import logging
+    from fastapi.testclient import TestClient
+    from app import config
+    from app.main import app, SUPPORTED_EXTENSIONS
+
+    logging.getLogger().setLevel(logging.WARNING)
+    documents, skipped = load_documents(SUPPORTED_EXTENSIONS, args.require_ocr)
+    if not documents:
+        raise SystemExit(f"No processable documents in {TEST_FILES_DIR}")
+
+    client = TestClient(app)
+    for name, data in documents[:2]:  # warm-up: imports, classifier, thread pools
+        post(client, name, data)
+
+    report = {
+        "revision": revision,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "config": {
+            "llm": args.llm,
+            "llm_latency_ms": args.llm_latency_ms,
+            "rounds": args.rounds,
+            "ocr_workers": config.OCR_WORKERS,
+            "max_pages": config.MAX_PAGES,
+            "early_exit": config.EARLY_EXIT_ENABLED,
+            "page_filter": config.PAGE_FILTER_ENABLED,
+            "form_templates": config.FORM_TEMPLATES_ENABLED,
+        },
+        "documents": [name for name, _ in documents],
+        "skipped": skipped,
+        "levels": [run_level(client, documents, c, args.rounds) for c in levels],
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["regressions"] = compare(report, json.load(f), args.tolerance)
+        exit_code = 1 if report["regressions"] else 0
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    tmp.cleanup()
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
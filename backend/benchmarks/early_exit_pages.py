@@ -0,0 +1,50 @@
+# benchmarks/early_exit_pages.py
+"""
+Average pages OCR'd per document with and without early-exit OCR.
+
+Usage (from backend/):
+    python -m benchmarks.early_exit_pages ["../Test Files"]
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+from app.text_extractor import extract_text_from_pdf, extract_text_from_tiff
+
+CORPUS_DIR = Path(__file__).resolve().parents[2] / "Test Files"
+EXTRACTORS = {
+    ".pdf": extract_text_from_pdf,
+    ".tif": extract_text_from_tiff,
+    ".tiff": extract_text_from_tiff,
+}
+
+
+def run(corpus_dir: Path) -> dict:
+    files = sorted(p for p in corpus_dir.iterdir() if p.suffix.lower() in EXTRACTORS)
+    summary = {}
+    for early_exit in (False, True):
+        mode = "early_exit" if early_exit else "full"
+        per_file = {}
+        for path in files:
+            report = {}
+            start = time.perf_counter()
+            EXTRACTORS[path.suffix.lower()](str(path), page_report=report, early_exit=early_exit)
+            per_file[path.name] = {
+                "ocr_pages": report.get("ocr_pages", 0),
+                "total_pages": report.get("total_pages", 0),
+                "seconds": round(time.perf_counter() - start, 3),
+            }
+        count = len(per_file) or 1
+        summary[mode] = {
+            "documents": len(per_file),
+            "avg_ocr_pages": round(sum(f["ocr_pages"] for f in per_file.values()) / count, 2),
+            "avg_seconds": round(sum(f["seconds"] for f in per_file.values()) / count, 3),
+            "files": per_file,
+        }
+    return summary
+
+
+if __name__ == "__main__":
+    corpus = Path(sys.argv[1]) if len(sys.argv) > 1 else CORPUS_DIR
+    print(json.dumps(run(corpus), indent=2))
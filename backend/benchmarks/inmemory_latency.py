@@ -0,0 +1,133 @@
+# benchmarks/inmemory_latency.py
+"""
+Compare /upload latency for small documents handed over in memory vs. via disk.
+
+Posts the TXT referrals from "Test Files" (and DOCX copies of them) through
+the app in-process (LLM stubbed), once with IN_MEMORY_UPLOAD_MAX_BYTES=0
+(every upload written to UPLOAD_DIR first) and once with the in-memory
+handoff. A slow disk is either a real mount (--upload-dir) or simulated by
+adding a delay to every write/fsync/replace under UPLOAD_DIR (--disk-latency-ms).
+
+Usage (from backend/):
+    python -m benchmarks.inmemory_latency [--rounds 20] [--disk-latency-ms 5] [--upload-dir /mnt/slow]
+"""
+import argparse
+import builtins
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+TEST_FILES_DIR = BACKEND_DIR.parent / "Test Files"
+
+
+def load_documents():
+    import docx
+
+    documents = []
+    for path in sorted(TEST_FILES_DIR.glob("*.txt")):
+        data = path.read_bytes()
+        documents.append((path.name, data))
+        doc = docx.Document()
+        for line in data.decode("utf-8", errors="replace").splitlines():
+            doc.add_paragraph(line)
+        buf = io.BytesIO()
+        doc.save(buf)
+        documents.append((path.with_suffix(".docx").name, buf.getvalue()))
+    return documents
+
+
+def slow_disk(root: Path, latency: float):
+    """Delay file writes and renames under `root` to mimic a slow disk."""
+    real_open, real_replace, real_remove = builtins.open, os.replace, os.remove
+    root = str(root)
+
+    def delayed(path):
+        if str(path).startswith(root):
+            time.sleep(latency)
+
+    def slow_open(file, mode="r", *args, **kwargs):
+        if any(m in mode for m in "wax+"):
+            delayed(file)
+        return real_open(file, mode, *args, **kwargs)
+
+    def slow_replace(src, dst, *args, **kwargs):
+        delayed(dst)
+        return real_replace(src, dst, *args, **kwargs)
+
+    def slow_remove(path, *args, **kwargs):
+        delayed(path)
+        return real_remove(path, *args, **kwargs)
+
+    builtins.open, os.replace, os.remove = slow_open, slow_replace, slow_remove
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(client, documents, rounds):
+    latencies = []
+    for _ in range(rounds):
+        for name, data in documents:
+            start = time.perf_counter()
+            response = client.post("/upload", files={"file": (name, data)})
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                raise RuntimeError(f"{name}: HTTP {response.status_code} {response.text[:200]}")
+    return {
+        "requests": len(latencies),
+        "mean_ms": round(statistics.mean(latencies), 2),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--disk-latency-ms", type=float, default=5.0,
+                        help="simulated delay per write/rename under UPLOAD_DIR (0 = none)")
+    parser.add_argument("--upload-dir", help="UPLOAD_DIR to use (e.g. a slow mount); default: a temp dir")
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.TemporaryDirectory()
+    upload_dir = Path(args.upload_dir or tmp.name).resolve()
+    os.environ.update(AZURE_OPENAI_API_KEY="skip", UPLOAD_DIR=str(upload_dir), LOG_LEVEL="WARNING")
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    import logging
+    from fastapi.testclient import TestClient
+    from app import utils
+    from app.main import app
+
+    logging.getLogger().setLevel(logging.WARNING)
+    documents = load_documents()
+    if args.disk_latency_ms:
+        slow_disk(upload_dir, args.disk_latency_ms / 1000)
+
+    client = TestClient(app)
+    in_memory_limit = utils.IN_MEMORY_UPLOAD_MAX_BYTES
+    results = {}
+    for mode, limit in (("disk", 0), ("in_memory", in_memory_limit)):
+        utils.IN_MEMORY_UPLOAD_MAX_BYTES = limit
+        run(client, documents[:2], 1)  # warm-up
+        results[mode] = run(client, documents, args.rounds)
+
+    print(json.dumps({
+        "documents": len(documents),
+        "upload_dir": str(upload_dir),
+        "disk_latency_ms": args.disk_latency_ms,
+        "results": results,
+    }, indent=2))
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# benchmarks/llm_stream.py
+"""
+Parsing the LLM answer: time to first field and failure rate, legacy
+parse_json_output vs streamed incremental parsing (app/json_stream.py).
+
+Inputs are the recorded responses in benchmarks/llm_fixtures. Reported:
+
+- time_to_first_field / time_to_all_fields: with the answer streamed at
+  --tokens-per-s (about 4 characters a token), when the first / last
+  top-level field is available. The legacy parser needs the whole answer
+  before it can return anything, so both equal the full generation time
+  plus parse time; the stream has a field as soon as its value closes.
+- truncation: every response cut at 5%, 10%, ... 95% of its length (what
+  a max_tokens cut-off leaves). failure_rate is the share of cuts that
+  produce no object (an exception, or a list the regex fallback found
+  inside); fields_recovered the share of top-level fields that come out
+  exactly as in the complete answer.
+- parse_us: CPU per complete response (mean, microseconds): legacy, the
+  stream fed in token-sized chunks, and the one-shot parse_json_output.
+- large_truncated: parse time of one --large-kb answer cut off before its
+  end, which the legacy parser only gets through by its regex fallbacks.
+
+Usage (from backend/):
+    python -m benchmarks.llm_stream [--tokens-per-s 50] [--large-kb 64] [--iterations 200]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+FIXTURE_DIR = BACKEND_DIR / "benchmarks" / "llm_fixtures"
+CHARS_PER_TOKEN = 4
+CUTS = [pct / 100 for pct in range(5, 100, 5)]
+
+
+def legacy_parse_json_output(raw):
+    """parse_json_output as app/gpt_client.py had it."""
+    raw = raw.strip()
+    try:
+        return json.loads(raw)
+    except Exception:
+        pass
+    m = re.search(r"\{(?:.|\n)*\}", raw)
+    if m:
+        try:
+            return json.loads(m.group(0))
+        except Exception:
+            pass
+    m = re.search(r"\[(?:.|\n)*\]", raw)
+    if m:
+        try:
+            return json.loads(m.group(0))
+        except Exception:
+            pass
+    raise ValueError(f"Could not parse JSON from model output. Raw: {raw[:500]}")
+
+
+def stream_offsets(JSONStream, response):
+    """Characters received when the first and the last field became available."""
+    offsets = []
+    stream = JSONStream()
+    stream.on_field = lambda name, value: offsets.append(stream.length)
+    for start in range(0, len(response), CHARS_PER_TOKEN):
+        stream.feed(response[start:start + CHARS_PER_TOKEN])
+    stream.close()
+    return offsets[0], offsets[-1]
+
+
+def mean_us(fn, inputs, iterations):
+    samples = []
+    for i in range(iterations):
+        raw = inputs[i % len(inputs)]
+        start = time.perf_counter()
+        fn(raw)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return round(statistics.mean(samples), 1)
+
+
+def fields_recovered(result, full):
+    if not isinstance(result, dict):
+        return 0
+    return sum(1 for name, value in full.items() if result.get(name) == value)
+
+
+def truncation(parse, responses, fulls):
+    failures = recovered = total = cuts = 0
+    for response, full in zip(responses, fulls):
+        for cut in CUTS:
+            cuts += 1
+            total += len(full)
+            try:
+                result = parse(response[:int(len(response) * cut)])
+            except ValueError:
+                failures += 1
+                continue
+            if not isinstance(result, dict):
+                failures += 1
+                continue
+            recovered += fields_recovered(result, full)
+    return {"failure_rate": round(failures / cuts, 3), "fields_recovered": round(recovered / total, 3)}
+
+
+def large_answer(size_kb):
+    items = []
+    while sum(len(item) + 4 for item in items) < size_kb * 1024:
+        items.append(f"Physiotherapy session {len(items)}: gait training, {{left}} knee, 30 min")
+    return json.dumps({
+        "document_meta": {"title": "Patient Referral Form", "date": None, "pages": 40},
+        "patient": {"full_name": "[NAME-000000]"},
+        "treatments": items,
+        "reason_for_referral": "Continued rehabilitation",
+    }, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tokens-per-s", type=float, default=50, help="simulated generation speed")
+    parser.add_argument("--large-kb", type=int, default=64, help="size of the large truncated answer")
+    parser.add_argument("--iterations", type=int, default=200, help="parses per CPU measurement")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("AZURE_OPENAI_API_KEY", "skip")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    sys.path.insert(0, str(BACKEND_DIR))
+    from app.json_stream import JSONStream, parse_json_output
+
+    responses = [json.loads(p.read_text(encoding="utf-8"))["response"] for p in sorted(FIXTURE_DIR.glob("*.json"))]
+    if not responses:
+        raise SystemExit(f"No fixtures in {FIXTURE_DIR}")
+    # As the model answered without JSON mode: fenced
+    fenced = ["```json\n" + response + "\n```" for response in responses]
+    fulls = [legacy_parse_json_output(response) for response in responses]
+
+    def streamed(raw):
+        stream = JSONStream()
+        for start in range(0, len(raw), CHARS_PER_TOKEN):
+            stream.feed(raw[start:start + CHARS_PER_TOKEN])
+        return stream.close()
+
+    chars_per_s = args.tokens_per_s * CHARS_PER_TOKEN
+    legacy_us = mean_us(legacy_parse_json_output, fenced, args.iterations)
+    streamed_us = mean_us(streamed, fenced, args.iterations)
+    first, last = zip(*(stream_offsets(JSONStream, response) for response in fenced))
+    full_ms = statistics.mean(len(response) for response in fenced) / chars_per_s * 1000
+
+    large = large_answer(args.large_kb)
+    large_cut = large[:int(len(large) * 0.9)]
+    large_ms = {}
+    for name, parse in (("legacy", legacy_parse_json_output), ("stream", parse_json_output)):
+        start = time.perf_counter()
+        try:
+            parse(large_cut)
+        except ValueError:
+            pass
+        large_ms[name] = round((time.perf_counter() - start) * 1000, 2)
+
+    report = {
+        "responses": len(responses),
+        "tokens_per_s": args.tokens_per_s,
+        "time_to_first_field_ms": {
+            "legacy": round(full_ms + legacy_us / 1000, 1),
+            "stream": round(statistics.mean(first) / chars_per_s * 1000, 1),
+        },
+        "time_to_all_fields_ms": {
+            "legacy": round(full_ms + legacy_us / 1000, 1),
+            "stream": round(statistics.mean(last) / chars_per_s * 1000, 1),
+        },
+        "truncation": {
+            "cuts": len(CUTS) * len(responses),
+            "legacy": truncation(legacy_parse_json_output, fenced, fulls),
+            "stream": truncation(parse_json_output, fenced, fulls),
+        },
+        "parse_us": {
+            "legacy": legacy_us,
+            "stream_chunked": streamed_us,
+            "one_shot": mean_us(parse_json_output, fenced, args.iterations),
+        },
+        "large_truncated": {"kb": round(len(large_cut) / 1024), "ms": large_ms},
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
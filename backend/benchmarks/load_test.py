@@ -0,0 +1,306 @@
+# benchmarks/load_test.py
+"""
+HTTP load test: drive /upload at target request rates and find the saturation point.
+
+For each worker count a local backend is started with
+`uvicorn app.main:app --workers N` (LLM stubbed, temporary upload/timings
+directories, shared PROMETHEUS_MULTIPROC_DIR), then loaded at each target
+rate for --duration seconds. Arrivals are open-loop: requests go out on
+schedule whether or not earlier ones have finished, so a slow server shows
+up as latency and errors instead of a lower send rate.
+
+Documents are drawn from "Test Files" by file-type weight (--mix), e.g.
+`txt=8,pdf=1,docx=1`; DOCX uploads are generated from the TXT referrals.
+PDFs need tesseract and poppler on the server side. With --follow-jobs each
+successful upload is followed by GET /jobs/{job_id}/timings.
+
+Per rate the report has latency p50/p90/p95/p99/max, achieved throughput and
+errors by cause. A rate is sustained when the achieved throughput is within
+10% of the target, p95 latency is under --slo-ms and the error rate is under
+--max-error-rate; the highest sustained rate is the worker count's
+saturation point. Rates above the first unsustained one are skipped unless
+--keep-going is given.
+
+With --server gunicorn the backend runs the production configuration
+(gunicorn.conf.py) instead. Use --url to load an already running backend
+(worker count "external").
+
+Usage (from backend/):
+    python -m benchmarks.load_test [--workers 1,2,4] [--rates 1,2,4,8] [--duration 20]
+        [--mix txt=8,pdf=1,docx=1] [--llm-latency-ms 800] [--slo-ms 5000] [--url http://host:port]
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+TEST_FILES_DIR = BACKEND_DIR.parent / "Test Files"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(","):
+        ext, _, weight = part.partition("=")
+        mix[ext.strip().lstrip(".").lower()] = float(weight or 1)
+    return mix
+
+
+def load_corpus(mix):
+    """Documents per file type in the mix: {"txt": [(name, bytes), ...], ...}."""
+    corpus = defaultdict(list)
+    for path in sorted(TEST_FILES_DIR.iterdir()):
+        ext = path.suffix.lstrip(".").lower()
+        if path.is_file() and ext in mix:
+            corpus[ext].append((path.name, path.read_bytes()))
+    if "docx" in mix and not corpus["docx"]:
+        import docx
+
+        for path in sorted(TEST_FILES_DIR.glob("*.txt")):
+            document = docx.Document()
+            for line in path.read_text(encoding="utf-8", errors="replace").splitlines():
+                document.add_paragraph(line)
+            buf = io.BytesIO()
+            document.save(buf)
+            corpus["docx"].append((path.with_suffix(".docx").name, buf.getvalue()))
+    missing = [ext for ext in mix if not corpus[ext]]
+    if missing:
+        raise SystemExit(f"No documents for file type(s) {', '.join(missing)} in {TEST_FILES_DIR}")
+    return corpus
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Backend:
+    """A uvicorn (or gunicorn, see gunicorn.conf.py) process serving app.main:app with the LLM stubbed."""
+
+    def __init__(self, workers, llm_latency_ms, startup_timeout=120, server="uvicorn"):
+        self.workers = workers
+        self.server = server
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.startup_timeout = startup_timeout
+        self._tmp = tempfile.TemporaryDirectory()
+        tmp = Path(self._tmp.name)
+        (tmp / "prometheus").mkdir()
+        self.env = dict(
+            os.environ,
+            AZURE_OPENAI_API_KEY="skip",
+            LLM_STUB_LATENCY_MS=str(llm_latency_ms),
+            UPLOAD_DIR=str(tmp / "uploads"),
+            TIMINGS_DB_PATH=str(tmp / "timings.db"),
+            PROMETHEUS_MULTIPROC_DIR=str(tmp / "prometheus"),
+            OCR_POOL_DIR=str(tmp / "ocr_pool"),
+            LOG_LEVEL="WARNING",
+        )
+        self.process = None
+
+    def command(self):
+        if self.server == "gunicorn":
+            return [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app",
+                    "--bind", f"127.0.0.1:{self.port}", "--workers", str(self.workers)]
+        return [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+                "--port", str(self.port), "--workers", str(self.workers), "--log-level", "warning"]
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            self.command(),
+            cwd=BACKEND_DIR, env=self.env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.time() + self.startup_timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Backend exited during startup (code {self.process.returncode})")
+            try:
+                if httpx.get(f"{self.url}/health", timeout=1).status_code == 200:
+                    return self
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.25)
+        self.__exit__(None, None, None)
+        raise RuntimeError(f"Backend not healthy after {self.startup_timeout}s")
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.process and self.process.poll() is None:
+            self.process.send_signal(signal.SIGTERM)
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self._tmp.cleanup()
+        return False
+
+
+async def run_rate(url, corpus, mix, rate, duration, timeout, follow_jobs, max_outstanding, seed):
+    """Open-loop load at `rate` req/s for `duration` seconds."""
+    rng = random.Random(seed)
+    types, weights = list(mix), list(mix.values())
+    latencies, by_type = [], defaultdict(list)
+    errors = defaultdict(int)
+    outstanding = 0
+    total = max(1, int(rate * duration))
+
+    async def one(client, file_type, name, data):
+        nonlocal outstanding
+        start = time.perf_counter()
+        try:
+            response = await client.post("/upload", files={"file": (name, data)})
+            elapsed = (time.perf_counter() - start) * 1000
+            if response.status_code != 200:
+                errors[f"HTTP {response.status_code}"] += 1
+                return
+            latencies.append(elapsed)
+            by_type[file_type].append(elapsed)
+            if follow_jobs:
+                job = await client.get(f"/jobs/{response.json()['job_id']}/timings")
+                if job.status_code != 200:
+                    errors[f"jobs HTTP {job.status_code}"] += 1
+        except httpx.TimeoutException:
+            errors["timeout"] += 1
+        except httpx.HTTPError as e:
+            errors[type(e).__name__] += 1
+        finally:
+            outstanding -= 1
+
+    limits = httpx.Limits(max_connections=max_outstanding, max_keepalive_connections=max_outstanding)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        tasks = []
+        start = time.perf_counter()
+        for i in range(total):
+            delay = start + i / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if outstanding >= max_outstanding:
+                errors["client_backlog"] += 1
+                continue
+            file_type = rng.choices(types, weights)[0]
+            name, data = rng.choice(corpus[file_type])
+            outstanding += 1
+            tasks.append(asyncio.create_task(one(client, file_type, name, data)))
+        await asyncio.gather(*tasks)
+        wall = time.perf_counter() - start
+
+    failed = sum(errors.values())
+    result = {
+        "target_rps": rate,
+        "sent": total,
+        "ok": len(latencies),
+        "errors": dict(errors),
+        "error_rate": round(failed / total, 4),
+        "achieved_rps": round(len(latencies) / wall, 2),
+    }
+    if latencies:
+        result["latency_ms"] = {
+            "p50": round(percentile(latencies, 50), 1),
+            "p90": round(percentile(latencies, 90), 1),
+            "p95": round(percentile(latencies, 95), 1),
+            "p99": round(percentile(latencies, 99), 1),
+            "max": round(max(latencies), 1),
+        }
+        result["p95_by_type_ms"] = {t: round(percentile(v, 95), 1) for t, v in sorted(by_type.items())}
+    return result
+
+
+def sustained(result, slo_ms, max_error_rate):
+    return (
+        result["achieved_rps"] >= 0.9 * result["target_rps"]
+        and result["error_rate"] <= max_error_rate
+        and result.get("latency_ms", {}).get("p95", float("inf")) <= slo_ms
+    )
+
+
+def load_workers(url, label, args, corpus, mix):
+    results, saturation = [], None
+    for rate in args.rates:
+        result = asyncio.run(run_rate(
+            url, corpus, mix, rate, args.duration, args.timeout,
+            args.follow_jobs, args.max_outstanding, args.seed,
+        ))
+        result["sustained"] = sustained(result, args.slo_ms, args.max_error_rate)
+        results.append(result)
+        print(f"workers={label} rate={rate}/s -> {result['achieved_rps']}/s "
+              f"p95={result.get('latency_ms', {}).get('p95')} ms errors={result['error_rate']:.1%}",
+              file=sys.stderr)
+        if result["sustained"]:
+            saturation = rate
+        elif not args.keep_going:
+            break
+    return {"workers": label, "saturation_rps": saturation, "rates": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--server", choices=["uvicorn", "gunicorn"], default="uvicorn",
+                        help="uvicorn --workers, or gunicorn with gunicorn.conf.py")
+    parser.add_argument("--rates", default="1,2,4,8,16", help="comma-separated target req/s")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per rate")
+    parser.add_argument("--mix", default="txt=8,pdf=1,docx=1", help="file-type weights")
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0, help="stub LLM delay per call")
+    parser.add_argument("--slo-ms", type=float, default=5000.0, help="p95 latency a sustained rate must meet")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout (s)")
+    parser.add_argument("--max-outstanding", type=int, default=256, help="client-side cap on open requests")
+    parser.add_argument("--follow-jobs", action="store_true", help="GET /jobs/{job_id}/timings after each upload")
+    parser.add_argument("--keep-going", action="store_true", help="keep raising the rate past saturation")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--url", help="load this running backend instead of starting one")
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args(argv)
+    args.rates = [float(r) for r in args.rates.split(",") if r.strip()]
+
+    mix = parse_mix(args.mix)
+    corpus = load_corpus(mix)
+
+    runs = []
+    if args.url:
+        runs.append(load_workers(args.url.rstrip("/"), "external", args, corpus, mix))
+    else:
+        for workers in (int(w) for w in args.workers.split(",") if w.strip()):
+            with Backend(workers, args.llm_latency_ms, server=args.server) as backend:
+                runs.append(load_workers(backend.url, workers, args, corpus, mix))
+
+    report = {
+        "cpus": os.cpu_count(),
+        "config": {
+            "server": None if args.url else args.server,
+            "mix": mix,
+            "duration_s": args.duration,
+            "llm_latency_ms": None if args.url else args.llm_latency_ms,
+            "slo_p95_ms": args.slo_ms,
+            "max_error_rate": args.max_error_rate,
+        },
+        "corpus": {ext: len(docs) for ext, docs in sorted(corpus.items())},
+        "runs": runs,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# benchmarks/logging_throughput.py
+"""
+Measure /upload throughput with logging off, queued (app.log) and synchronous.
+
+Posts a small TXT referral through the app in-process (LLM stubbed) from
+several client threads. "sync" attaches the console/file handlers directly
+to the logger, as app.log used to; "queued" is the QueueHandler/QueueListener
+setup; "off" disables the logger. A slow log disk is simulated by adding a
+delay to every file write (--write-latency-ms).
+
+Usage (from backend/):
+    python -m benchmarks.logging_throughput [--requests 300] [--concurrency 4] [--write-latency-ms 2] [--level DEBUG]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+SAMPLE = BACKEND_DIR.parent / "Test Files" / "referral_01.txt"
+
+
+def slow_writes(handler: logging.Handler, latency: float):
+    """Delay every emit of `handler` to mimic a slow or fsyncing disk."""
+    emit = handler.emit
+
+    def delayed_emit(record):
+        time.sleep(latency)
+        emit(record)
+
+    handler.emit = delayed_emit
+
+
+def use_mode(mode: str):
+    from app import log
+
+    logger = log.logger
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.disabled = mode == "off"
+    if mode == "queued":
+        logger.addHandler(log.DeferredQueueHandler(log.log_queue))
+    elif mode == "sync":
+        logger.addHandler(log.console_handler)
+        logger.addHandler(log.file_handler)
+
+
+def run(client, data: bytes, total: int, concurrency: int) -> dict:
+    def post(_):
+        response = client.post("/upload", files={"file": ("referral.txt", data)})
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(post, range(total)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": total,
+        "seconds": round(elapsed, 3),
+        "requests_per_sec": round(total / elapsed, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--write-latency-ms", type=float, default=2.0)
+    parser.add_argument("--level", default="DEBUG", help="LOG_LEVEL for the run")
+    args = parser.parse_args(argv)
+
+    os.environ.update(AZURE_OPENAI_API_KEY="skip", LOG_LEVEL=args.level)
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    from fastapi.testclient import TestClient
+    from app import log
+    from app.main import app
+
+    # Console output goes nowhere so the terminal does not skew the numbers
+    log.console_handler.setStream(open(os.devnull, "w"))
+    if args.write_latency_ms:
+        slow_writes(log.file_handler, args.write_latency_ms / 1000)
+
+    client = TestClient(app)
+    data = SAMPLE.read_bytes()
+    results = {}
+    for mode in ("off", "queued", "sync"):
+        use_mode(mode)
+        run(client, data, 10, args.concurrency)  # warm-up
+        results[mode] = run(client, data, args.requests, args.concurrency)
+        if mode == "queued":
+            # Count the drain time too: the backlog must be written eventually
+            drain_start = time.perf_counter()
+            log.listener.stop()
+            results[mode]["drain_seconds"] = round(time.perf_counter() - drain_start, 3)
+            log.listener.start()
+
+    use_mode("queued")
+    print(json.dumps({
+        "level": args.level,
+        "concurrency": args.concurrency,
+        "write_latency_ms": args.write_latency_ms,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
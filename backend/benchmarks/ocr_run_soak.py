@@ -0,0 +1,161 @@
+# benchmarks/ocr_run_soak.py
+"""
+Soak check: thousands of OCR runs must not grow open file descriptors or memory.
+
+Runs pdf_to_ocr on a small generated PDF when tesseract and poppler are
+installed; otherwise it drives RunTrace through the same event pattern as
+pdf_to_ocr (start, per-page events, close) without the OCR itself. FD count
+and RSS are sampled throughout. Exits non-zero if the FD count grows or RSS
+grows beyond the budget after warm-up.
+
+--legacy replays the old per-run logger (new named logger + FileHandler per
+run) for comparison.
+
+Usage (from backend/):
+    python -m benchmarks.ocr_run_soak [--runs 5000] [--pages 4] [--budget-mb 16] [--legacy]
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+
+def open_fds() -> int:
+    return len(os.listdir("/proc/self/fd"))
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def settle():
+    """Let the run-log writer catch up, so queued records are not counted as growth."""
+    from app import run_trace
+
+    deadline = time.time() + 30
+    while run_trace.run_log_queue.qsize() and time.time() < deadline:
+        time.sleep(0.05)
+    gc.collect()
+
+
+def ocr_available() -> bool:
+    return bool(shutil.which("tesseract") and shutil.which("pdftoppm"))
+
+
+def make_pdf(directory: Path, pages: int) -> Path:
+    from PIL import Image, ImageDraw
+
+    images = []
+    for page in range(1, pages + 1):
+        img = Image.new("L", (850, 1100), 255)
+        draw = ImageDraw.Draw(img)
+        for row in range(12):
+            draw.text((60, 80 + row * 60), f"Page {page} Patient Name: Jane Doe Referral line {row}", fill=0)
+        images.append(img)
+    path = directory / "soak.pdf"
+    images[0].save(path, save_all=True, append_images=images[1:])
+    return path
+
+
+def legacy_run(run_index: int, log_dir: Path, pages: int):
+    """The old ocr.create_run_logger pattern (kept only for comparison)."""
+    run_logger = logging.getLogger(f"OCR_RUN_{run_index}")
+    run_logger.setLevel(logging.DEBUG)
+    handler = logging.FileHandler(log_dir / f"ocr_run_{run_index}.log")
+    run_logger.addHandler(handler)
+    run_logger.propagate = False
+    run_logger.info("=== NEW OCR RUN STARTED ===")
+    for page in range(1, pages + 1):
+        run_logger.info("OCR processing page %s/%s", page, pages)
+    run_logger.info("=== OCR RUN COMPLETED SUCCESSFULLY ===")
+
+
+def traced_run(pages: int):
+    from app.run_trace import RunTrace
+
+    with RunTrace("soak") as run_logger:
+        run_logger.info("Starting OCR pipeline for: %s", "soak.pdf")
+        for page in range(1, pages + 1):
+            run_logger.info("OCR processing page %s/%s", page, pages)
+            run_logger.info("Running OCR on page %s...", page)
+            run_logger.info("Page %s OCR complete. Blocks: %s", page, 12)
+        run_logger.info("Total pages processed: %s", pages)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5000)
+    parser.add_argument("--pages", type=int, default=4)
+    parser.add_argument("--budget-mb", type=float, default=16.0)
+    parser.add_argument("--fd-slack", type=int, default=2)
+    parser.add_argument("--legacy", action="store_true", help="replay the old per-run logger instead")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("AZURE_OPENAI_API_KEY", "skip")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    sys.path.insert(0, str(BACKEND_DIR))
+    from app import run_trace
+
+    tmp = Path(tempfile.mkdtemp())
+    real_ocr = not args.legacy and ocr_available()
+    if real_ocr:
+        from app.ocr import pdf_to_ocr
+        pdf = make_pdf(tmp, args.pages)
+
+    def one_run(index: int):
+        if args.legacy:
+            legacy_run(index, tmp, args.pages)
+        elif real_ocr:
+            pdf_to_ocr(str(pdf), max_pages=args.pages)
+        else:
+            traced_run(args.pages)
+
+    warmup = max(1, min(1000, args.runs // 5))
+    for i in range(warmup):
+        one_run(i)
+    settle()
+    base_fds, base_rss = open_fds(), rss_bytes()
+
+    samples = []
+    start = time.perf_counter()
+    step = max(1, args.runs // 10)
+    for i in range(warmup, warmup + args.runs):
+        one_run(i)
+        if (i - warmup + 1) % step == 0:
+            settle()
+            samples.append({"runs": i - warmup + 1, "fds": open_fds(), "rss_mb": round(rss_bytes() / 2**20, 1)})
+    elapsed = time.perf_counter() - start
+
+    settle()
+    fd_growth = open_fds() - base_fds
+    rss_growth_mb = (rss_bytes() - base_rss) / 2**20
+    passed = fd_growth <= args.fd_slack and rss_growth_mb <= args.budget_mb
+    print(json.dumps({
+        "mode": "legacy" if args.legacy else ("pdf_to_ocr" if real_ocr else "run_trace (no tesseract/poppler)"),
+        "runs": args.runs,
+        "pages_per_run": args.pages,
+        "runs_per_sec": round(args.runs / elapsed, 1),
+        "fd_growth": fd_growth,
+        "rss_growth_mb": round(rss_growth_mb, 2),
+        "recent_runs_kept": len(run_trace.recent_runs()),
+        "samples": samples,
+        "passed": passed,
+    }, indent=2))
+    shutil.rmtree(tmp, ignore_errors=True)
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
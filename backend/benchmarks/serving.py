@@ -0,0 +1,171 @@
+# benchmarks/serving.py
+"""
+Serving-mode benchmark: single uvicorn process vs the production setup.
+
+Starts the backend once per mode (LLM stubbed with --llm-latency-ms,
+temporary upload/timings/metrics/OCR pool directories):
+
+- single: `uvicorn app.main:app`, one process, as the Dockerfile used to run
+- production: `gunicorn -c gunicorn.conf.py` with --workers web workers
+  sharing the OCR pool (--server uvicorn uses `uvicorn --workers N` instead,
+  e.g. where gunicorn is not installed)
+
+Each mode is loaded closed-loop: --concurrency clients post documents from
+"Test Files" (--mix, as in load_test) back to back for --duration seconds.
+Reported per mode: throughput, latency p50/p95/p99 and errors, plus the
+speedup of production over single.
+
+Then graceful shutdown is checked: --concurrency uploads are started, the
+server gets SIGTERM --drain-delay seconds later, and the report counts how
+many of those in-flight uploads still completed (all of them should, within
+GRACEFUL_TIMEOUT) and how long the server took to exit.
+
+Usage (from backend/):
+    python -m benchmarks.serving [--workers 4] [--concurrency 8] [--duration 20]
+        [--mix txt=8,pdf=1,docx=1] [--llm-latency-ms 800] [--server gunicorn]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+
+from benchmarks.load_test import Backend, load_corpus, parse_mix, percentile
+
+
+async def closed_loop(url, corpus, mix, concurrency, duration, timeout, seed):
+    """`concurrency` clients uploading back to back for `duration` seconds."""
+    rng = random.Random(seed)
+    types, weights = list(mix), list(mix.values())
+    latencies, errors = [], defaultdict(int)
+
+    async def client_loop(client, deadline):
+        while time.perf_counter() < deadline:
+            name, data = rng.choice(corpus[rng.choices(types, weights)[0]])
+            start = time.perf_counter()
+            try:
+                response = await client.post("/upload", files={"file": (name, data)})
+            except httpx.HTTPError as e:
+                errors[type(e).__name__] += 1
+                continue
+            if response.status_code == 200:
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                errors[f"HTTP {response.status_code}"] += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, start + duration) for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+
+    result = {
+        "ok": len(latencies),
+        "errors": dict(errors),
+        "throughput_rps": round(len(latencies) / wall, 2),
+    }
+    if latencies:
+        result["latency_ms"] = {
+            "p50": round(percentile(latencies, 50), 1),
+            "p95": round(percentile(latencies, 95), 1),
+            "p99": round(percentile(latencies, 99), 1),
+        }
+    return result
+
+
+async def drain_check(backend, corpus, mix, requests, delay, timeout, seed):
+    """Start `requests` uploads, SIGTERM the server after `delay` s, count completions."""
+    rng = random.Random(seed)
+    types, weights = list(mix), list(mix.values())
+    outcomes = defaultdict(int)
+
+    async def one(client):
+        name, data = rng.choice(corpus[rng.choices(types, weights)[0]])
+        try:
+            response = await client.post("/upload", files={"file": (name, data)})
+            outcomes["ok" if response.status_code == 200 else f"HTTP {response.status_code}"] += 1
+        except httpx.HTTPError as e:
+            outcomes[type(e).__name__] += 1
+
+    limits = httpx.Limits(max_connections=requests, max_keepalive_connections=requests)
+    async with httpx.AsyncClient(base_url=backend.url, timeout=timeout, limits=limits) as client:
+        tasks = [asyncio.create_task(one(client)) for _ in range(requests)]
+        await asyncio.sleep(delay)
+        stop = time.perf_counter()
+        backend.process.send_signal(signal.SIGTERM)
+        await asyncio.gather(*tasks)
+    exit_code = await asyncio.to_thread(backend.process.wait, timeout)
+    return {
+        "in_flight": requests,
+        "completed": outcomes.pop("ok", 0),
+        "failed": dict(outcomes),
+        "exit_code": exit_code,
+        "shutdown_s": round(time.perf_counter() - stop, 2),
+    }
+
+
+def run_mode(label, server, workers, args, corpus, mix):
+    with Backend(workers, args.llm_latency_ms, server=server) as backend:
+        # One request per worker first, so lazy imports are not measured
+        for name, data in [corpus[ext][0] for ext in mix] * workers:
+            httpx.post(f"{backend.url}/upload", files={"file": (name, data)}, timeout=args.timeout)
+        result = asyncio.run(closed_loop(
+            backend.url, corpus, mix, args.concurrency, args.duration, args.timeout, args.seed,
+        ))
+        drain = asyncio.run(drain_check(
+            backend, corpus, mix, args.concurrency, args.drain_delay, args.timeout, args.seed,
+        ))
+    return {"mode": label, "server": server, "workers": workers, **result, "graceful_shutdown": drain}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1),
+                        help="web workers in production mode")
+    parser.add_argument("--server", choices=["gunicorn", "uvicorn"], default="gunicorn",
+                        help="production-mode server")
+    parser.add_argument("--concurrency", type=int, default=8, help="closed-loop clients")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of load per mode")
+    parser.add_argument("--mix", default="txt=8,pdf=1,docx=1", help="file-type weights")
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0, help="stub LLM delay per call")
+    parser.add_argument("--drain-delay", type=float, default=0.3, help="seconds between uploads and SIGTERM")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request timeout (s)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    corpus = load_corpus(mix)
+
+    modes = [
+        run_mode("single", "uvicorn", 1, args, corpus, mix),
+        run_mode("production", args.server, args.workers, args, corpus, mix),
+    ]
+    single, production = modes
+    report = {
+        "cpus": os.cpu_count(),
+        "config": {
+            "mix": mix,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "llm_latency_ms": args.llm_latency_ms,
+        },
+        "corpus": {ext: len(docs) for ext, docs in sorted(corpus.items())},
+        "modes": modes,
+        "speedup": round(production["throughput_rps"] / single["throughput_rps"], 2)
+        if single["throughput_rps"] else None,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# benchmarks/upload_memory.py
+"""
+Check that concurrent large uploads keep the server's resident memory bounded.
+
+Starts the backend with uvicorn in a subprocess (LLM stubbed), uploads many
+large files concurrently and samples the server's RSS. Exits non-zero if the
+RSS growth exceeds the budget.
+
+Usage (from backend/):
+    python -m benchmarks.upload_memory [--files 16] [--size-mb 40] [--budget-mb 32]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+
+def rss_bytes(pid: int) -> int:
+    """Current resident set size of a process (Linux)."""
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def wait_for_server(url: str, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(f"{url}/health", timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError("Backend did not start")
+
+
+def make_file(directory: Path, index: int, size: int) -> Path:
+    # Invalid .docx content: saved in full by the upload path, then rejected
+    # quickly by the extractor, so only the save path's memory is measured.
+    path = directory / f"large_{index}.docx"
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        for _ in range(size // len(block)):
+            f.write(block)
+    return path
+
+
+def upload(url: str, path: Path) -> int:
+    with open(path, "rb") as f:
+        return requests.post(f"{url}/upload", files={"file": (path.name, f)}, timeout=300).status_code
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=16)
+    parser.add_argument("--size-mb", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--budget-mb", type=int, default=32)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    url = f"http://127.0.0.1:{args.port}"
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        env = dict(os.environ, AZURE_OPENAI_API_KEY="skip", UPLOAD_DIR=str(tmp / "uploads"), LOG_LEVEL="WARNING")
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_for_server(url)
+            files = [make_file(tmp, i, args.size_mb * 1024 * 1024) for i in range(args.files)]
+            baseline = rss_bytes(server.pid)
+            peak = baseline
+            done = threading.Event()
+
+            def sample():
+                nonlocal peak
+                while not done.is_set():
+                    peak = max(peak, rss_bytes(server.pid))
+                    time.sleep(0.05)
+
+            sampler = threading.Thread(target=sample, daemon=True)
+            sampler.start()
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                statuses = list(pool.map(lambda p: upload(url, p), files))
+            elapsed = time.perf_counter() - start
+            done.set()
+            sampler.join()
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+    growth_mb = (peak - baseline) / (1024 * 1024)
+    result = {
+        "files": args.files,
+        "size_mb": args.size_mb,
+        "concurrency": args.concurrency,
+        "statuses": sorted(set(statuses)),
+        "baseline_rss_mb": round(baseline / (1024 * 1024), 1),
+        "peak_rss_mb": round(peak / (1024 * 1024), 1),
+        "growth_mb": round(growth_mb, 1),
+        "budget_mb": args.budget_mb,
+        "seconds": round(elapsed, 2),
+    }
+    print(json.dumps(result, indent=2))
+    if growth_mb > args.budget_mb:
+        print(f"FAIL: RSS grew {growth_mb:.1f} MB (budget {args.budget_mb} MB)", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+# backend/gunicorn.conf.py
+"""
+Production serving: gunicorn supervising uvicorn workers.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+WEB_CONCURRENCY workers each run the FastAPI app on their own interpreter;
+OCR from all of them shares one machine-wide pool of OCR_POOL_SIZE
+Tesseract processes (app/ocr_pool.py), so adding web workers adds request
+concurrency without oversubscribing the cores. With SERVE_PRELOAD the app
+module is imported once in the master and the workers are forked from it;
+each worker still runs its own startup hook (WARMUP, blob spool resume),
+and restarts the log listener threads, which do not survive the fork.
+
+On SIGTERM workers stop accepting connections and get GRACEFUL_TIMEOUT
+seconds to finish in-flight uploads before they are killed; the app's
+shutdown hook then drains the OCR executor and blob archive queue.
+
+Metrics from all workers are aggregated through PROMETHEUS_MULTIPROC_DIR
+(default: a fresh directory under TEMP_DIR, wiped on start).
+"""
+import os
+import shutil
+
+from app.config import (
+    GRACEFUL_TIMEOUT,
+    LOG_LEVEL,
+    SERVE_BIND,
+    SERVE_PRELOAD,
+    TEMP_DIR,
+    WEB_CONCURRENCY,
+    WORKER_TIMEOUT,
+)
+
+bind = SERVE_BIND
+workers = WEB_CONCURRENCY
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = SERVE_PRELOAD
+graceful_timeout = GRACEFUL_TIMEOUT
+timeout = WORKER_TIMEOUT
+keepalive = 5
+loglevel = LOG_LEVEL.lower()
+accesslog = None
+
+# Set and emptied before the app (and prometheus_client) is preloaded;
+# samples left by a previous master would be summed into this one's
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", str(TEMP_DIR / "prometheus"))
+shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -17,6 +17,7 @@ st.title("Medical Referral Extractor — Multi-format Support")
 with st.sidebar:
     st.header("Supported Formats")
     st.write("✅ PDF")
+    st.write("✅ TIF/TIFF (multi-page fax)")
     st.write("✅ JPG/JPEG/PNG")
     st.write("✅ TXT")
     st.write("✅ DOCX (Word)")
@@ -35,7 +36,7 @@ with st.sidebar:
 # File uploader - now supports multiple formats
 uploaded_file = st.file_uploader(
     "Upload medical referral document",
-    type=["pdf", "jpg", "jpeg", "png", "txt", "docx"],
+    type=["pdf", "tif", "tiff", "jpg", "jpeg", "png", "txt", "docx"],
     help="Supports PDF, images, text files, and Word documents"
 )
 
@@ -0,0 +1,17 @@
+# tests/conftest.py
+"""
+Runs the app as the benchmarks do: stub LLM (AZURE_OPENAI_API_KEY=skip),
+imported from backend/.
+
+Usage (from backend/):
+    python -m pytest -q tests
+"""
+import os
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "skip")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+sys.path.insert(0, str(BACKEND_DIR))
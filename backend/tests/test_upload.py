@@ -0,0 +1,62 @@
+# tests/test_upload.py
+"""/upload through the form-template path (known sender form, no OCR or LLM)."""
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+
+TEMPLATE_TEXT = "URGENT referral to Riverside Physiotherapy. Patient: Jane Doe. Reason for referral: knee pain."
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def fake_template(source):
+        return {
+            "template": "riverside_v1",
+            "extracted": {
+                "document_meta": {"title": "Riverside Referral", "date": None, "pages": 1},
+                "referral": {"referral_to": "Riverside Physiotherapy"},
+                "patient": {"full_name": "Jane Doe"},
+                "reason_for_referral": "knee pain",
+            },
+            "raw_text": TEMPLATE_TEXT,
+        }
+
+    monkeypatch.setattr(main, "extract_with_form_template", fake_template)
+    return TestClient(main.app)
+
+
+def upload(client, **headers):
+    return client.post(
+        "/upload",
+        files={"file": ("referral.pdf", b"%PDF-1.4\n%%EOF\n", "application/pdf")},
+        headers=headers,
+    )
+
+
+def test_template_match_skips_llm(client):
+    response = upload(client)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["text_stats"]["form_template"] == "riverside_v1"
+    assert body["extracted"]["patient"]["full_name"] == "Jane Doe"
+    assert "llm_truncated" not in body
+
+
+def test_urgent_template_is_escalated(client):
+    response = upload(client, **{"X-Priority": "bulk"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["classification"]["urgent"] is True
+    assert body["priority"] == "urgent"
+
+
+def test_validation_warning_keeps_response_contract(client, monkeypatch):
+    bad = {"template": "riverside_v1", "extracted": {"document_meta": {"pages": "many"}}, "raw_text": TEMPLATE_TEXT}
+    monkeypatch.setattr(main, "extract_with_form_template", lambda source: bad)
+    response = upload(client)
+    assert response.status_code == 200
+    body = response.json()
+    assert "validation_warning" in body
+    assert body["priority"] == "urgent"
+    assert body["schema_version"] == main.SCHEMA_VERSION
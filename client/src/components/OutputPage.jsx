@@ -1,9 +1,20 @@
 // src/components/OutputPage.jsx (single file version)
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
-import { Download, Edit2, Save, X, FileText, ArrowLeft, User, Building, Activity, AlertCircle, CheckCircle, Shield } from 'lucide-react';
+import { Download, Edit2, Save, X, FileText, ArrowLeft, User, Building, Activity, AlertCircle, CheckCircle, Shield, Clock } from 'lucide-react';
 import FilePreview from './FilePreview';
 
+const STAGE_LABELS = {
+  save: 'Save Upload',
+  form_template: 'Form Template',
+  extract_text: 'Text Extraction / OCR',
+  classify: 'Classification',
+  llm: 'AI Extraction',
+  validate: 'Validation',
+};
+
+const formatMs = (ms) => (ms >= 1000 ? `${(ms / 1000).toFixed(1)} s` : `${Math.round(ms)} ms`);
+
 const OutputPage = ({ result, uploadedFile }) => {
   const navigate = useNavigate();
   const [editMode, setEditMode] = useState(false);
@@ -111,6 +122,11 @@ const OutputPage = ({ result, uploadedFile }) => {
   const hasConfidence = typeof classification.confidence === 'number';
   const hasDetails = classification.details && typeof classification.details === 'object';
 
+  // Per-stage timing breakdown (may be missing for older results in history)
+  const timings = result.timings || null;
+  const stageEntries = timings?.stages ? Object.entries(timings.stages) : [];
+  const slowestStageMs = Math.max(1, ...stageEntries.map(([, ms]) => ms));
+
   return (
     <div className="min-h-screen bg-gradient-to-br from-slate-50 via-blue-50 to-slate-100 pt-24 pb-12 px-4">
       <div className="max-w-7xl mx-auto">
@@ -305,6 +321,50 @@ const OutputPage = ({ result, uploadedFile }) => {
           </div>
         </div>
 
+        {/* Processing Time Breakdown */}
+        {timings && stageEntries.length > 0 && (
+          <div className="bg-white p-8 rounded-2xl shadow-xl border border-gray-100 mb-8">
+            <div className="flex items-center justify-between mb-6">
+              <h2 className="text-2xl font-bold text-gray-800 flex items-center">
+                <div className="bg-blue-100 p-2 rounded-lg mr-3">
+                  <Clock className="h-6 w-6 text-blue-600" />
+                </div>
+                Processing Time
+              </h2>
+              <span className="text-lg font-bold text-gray-800">{formatMs(timings.total_ms)}</span>
+            </div>
+            <div className="space-y-3">
+              {stageEntries.map(([stage, ms]) => (
+                <div key={stage}>
+                  <div className="flex items-center justify-between mb-1 text-sm">
+                    <span className="font-semibold text-gray-700">{STAGE_LABELS[stage] || stage}</span>
+                    <span className="font-bold text-gray-800">{formatMs(ms)}</span>
+                  </div>
+                  <div className="w-full bg-gray-200 rounded-full h-2">
+                    <div
+                      className="h-2 rounded-full bg-gradient-to-r from-blue-500 to-blue-600"
+                      style={{ width: `${Math.max(1, (ms / slowestStageMs) * 100)}%` }}
+                    />
+                  </div>
+                </div>
+              ))}
+            </div>
+            {timings.ocr_pages?.length > 0 && (
+              <div className="mt-6">
+                <p className="text-sm font-semibold text-gray-700 mb-2">OCR time per page</p>
+                <div className="grid grid-cols-2 md:grid-cols-6 gap-3 text-sm">
+                  {timings.ocr_pages.map((page) => (
+                    <div key={page.page} className="bg-gradient-to-r from-slate-50 to-blue-50 p-3 rounded-lg border border-gray-200">
+                      <p className="text-gray-600 font-medium">Page {page.page}</p>
+                      <p className="font-bold text-gray-800">{formatMs(page.ocr_ms)}</p>
+                    </div>
+                  ))}
+                </div>
+              </div>
+            )}
+          </div>
+        )}
+
         {/* File Preview - Full Width */}
         {uploadedFile ? (
           <div className="mb-8">
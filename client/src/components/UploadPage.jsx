@@ -15,7 +15,7 @@ const UploadPage = ({ setCurrentResult, setUploadedFile }) => {
   const [uploadProgress, setUploadProgress] = useState(0);
   const [error, setError] = useState(null);
 
-  const allowedExtensions = ['.pdf', '.jpg', '.jpeg', '.png', '.txt', '.docx'];
+  const allowedExtensions = ['.pdf', '.tif', '.tiff', '.jpg', '.jpeg', '.png', '.txt', '.docx'];
 
   const handleFileSelect = (file) => {
     setError(null);
@@ -191,7 +191,7 @@ const UploadPage = ({ setCurrentResult, setUploadedFile }) => {
                 <input
                   ref={fileInputRef}
                   type="file"
-                  accept=".pdf,.jpg,.jpeg,.png,.txt,.docx,.doc"
+                  accept=".pdf,.tif,.tiff,.jpg,.jpeg,.png,.txt,.docx,.doc"
                   onChange={handleFileInputChange}
                   className="hidden"
                 />
@@ -217,7 +217,7 @@ const UploadPage = ({ setCurrentResult, setUploadedFile }) => {
                   <div className="flex items-center justify-center space-x-8 text-sm text-gray-600">
                     <div className="flex items-center space-x-2">
                       <CheckCircle className="h-5 w-5 text-green-500" />
-                      <span className="font-semibold">PDF, JPG, PNG, TXT, DOCX</span>
+                      <span className="font-semibold">PDF, TIFF, JPG, PNG, TXT, DOCX</span>
                     </div>
                     <div className="w-px h-6 bg-gray-300"></div>
                     <div className="flex items-center space-x-2">
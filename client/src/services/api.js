@@ -50,9 +50,11 @@ export const getSupportedFormats = async () => {
   } catch (error) {
     console.error('Error fetching supported formats:', error);
     return {
-      supported_formats: ['.pdf', '.jpg', '.jpeg', '.png', '.txt', '.docx'],
+      supported_formats: ['.pdf', '.tif', '.tiff', '.jpg', '.jpeg', '.png', '.txt', '.docx'],
       descriptions: {
         '.pdf': 'Portable Document Format (OCR)',
+        '.tif': 'Multi-page TIFF Fax (OCR)',
+        '.tiff': 'Multi-page TIFF Fax (OCR)',
         '.jpg': 'JPEG Image (OCR)',
         '.jpeg': 'JPEG Image (OCR)',
         '.png': 'PNG Image (OCR)',